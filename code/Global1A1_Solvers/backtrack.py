@@ -11,9 +11,23 @@ The program takes two inputs:
 
 The program can be run like this:
 $ python tsp.py problem.txt solution.txt
+
+With `--mode bnb` the search runs as a branch and bound instead: it starts from the nearest
+neighbour tour, visits the cheapest children first, skips the mirrored copy of every tour and
+cuts branches whose lower bound (every remaining city still needs its two cheapest edges) is
+not below the best tour found so far. This solves instances with 20 cities in seconds:
+$ python tsp.py problem.txt solution.txt --mode bnb
+
+`--mode parallel` splits the branch and bound into tasks, one per path prefix, and runs them on
+a pool of processes that share the best cost found so far:
+$ python tsp.py problem.txt solution.txt --mode parallel --workers 32
 """
 
-import sys
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
 
 __author__ = "Murhaf Alawir, Anas Alatasi"
 __copyright__ = "Global1A1"
@@ -40,6 +54,23 @@ def read_adjacency_matrix(file_path):
             matrix.append(row)
     return matrix
 
+def read_flat_matrix(file_path):
+    """Reads an adjacency matrix from a file into a flat array.
+
+    Args:
+        file_path (str): The path to the file containing the adjacency matrix.
+
+    Returns:
+        tuple: The number of cities and the costs as an `array` of 64-bit integers, where the cost
+        from city i to city j is at index i * n + j.
+    """
+    with open(file_path, 'r') as file:
+        costs = array('q', map(int, file.read().split()))
+    n = int(round(len(costs) ** 0.5))
+    if n * n != len(costs):
+        raise ValueError(f"{file_path} does not contain a square matrix")
+    return n, costs
+
 def write_output(file_path, min_cost, path):
     """Writes the minimum cost and path to an output file.
 
@@ -96,12 +127,345 @@ def tsp_backtracking(matrix):
     backtrack(0, 1, 0, [0])
     return min_cost, best_path
 
-def main(input_file, output_file):
+def tsp_iterative(matrix):
+    """Solves the Traveling Salesman Problem using backtracking without recursion.
+
+    Explores the same tree in the same order as `tsp_backtracking` and returns the same tour,
+    but keeps the search state in an explicit stack: the city, the path cost and the bitset of
+    children still to try at every depth, in lists of n entries allocated once. The visited cities
+    are the bits of an integer and the costs are read from a flat list, so its depth is not
+    bounded by the recursion limit.
+
+    The point is to remove the recursion, not to be faster: the search visits the same nodes and
+    the buffers are plain lists, because reading from `array` or NumPy buffers boxes a new int on
+    every access. `Utils/bench_backtrack.py` compares the speed of both engines. For larger
+    instances use the branch and bound.
+
+    Args:
+        matrix (list or tuple): A 2D list representing the adjacency matrix, or the (n, costs)
+            pair returned by `read_flat_matrix`.
+
+    Returns:
+        tuple: The minimum cost and the path corresponding to this cost.
+    """
+    if isinstance(matrix, tuple):
+        n, costs = matrix
+    else:
+        n = len(matrix)
+        costs = [c for row in matrix for c in row]
+    # Indexing a list is cheaper than indexing an array, which boxes a new int on every read
+    costs = list(costs)
+
+    # Bit i of edges[j] is set if the edge from city j to city i can be used
+    edges = [sum(1 << i for i in range(n) if costs[j * n + i] > 0) for j in range(n)]
+    home = [costs[j * n] for j in range(n)]
+    path = [0] * n
+    row = [0] * n
+    cost = [0] * n
+    children = [0] * n
+    best_path = [0] * n
+    min_cost = float('inf')
+
+    depth = 0
+    visited = 1
+    children[0] = edges[0] & ~visited
+    last = n - 1
+    while depth >= 0:
+        todo = children[depth]
+        if not todo:
+            # No child left: go back up
+            visited ^= 1 << path[depth]
+            depth -= 1
+            continue
+
+        # Take the lowest numbered child, like the for loop of `tsp_backtracking`
+        bit = todo & -todo
+        children[depth] = todo ^ bit
+        i = bit.bit_length() - 1
+        next_cost = cost[depth] + costs[row[depth] + i]
+        if depth + 1 == last:
+            # All cities visited: close the tour
+            if home[i] > 0 and next_cost + home[i] < min_cost:
+                min_cost = next_cost + home[i]
+                path[last] = i
+                best_path[:] = path
+            continue
+
+        depth += 1
+        path[depth] = i
+        row[depth] = i * n
+        cost[depth] = next_cost
+        visited |= bit
+        children[depth] = edges[i] & ~visited
+
+    if min_cost == float('inf'):
+        return min_cost, []
+    return min_cost, best_path + [0]
+
+def is_symmetric(matrix):
+    """Checks whether the cost of every edge is the same in both directions.
+
+    Args:
+        matrix (list): A 2D list representing the adjacency matrix.
+
+    Returns:
+        bool: True if the matrix is symmetric.
+    """
+    n = len(matrix)
+    return all(matrix[i][j] == matrix[j][i] for i in range(n) for j in range(i + 1, n))
+
+def nearest_neighbour_tour(matrix):
+    """Builds a tour from city 0 by always moving to the cheapest unvisited city.
+
+    Like `tsp_backtracking`, only edges with a positive cost can be used.
+
+    Args:
+        matrix (list): A 2D list representing the adjacency matrix.
+
+    Returns:
+        tuple: The cost and the path of the tour, or infinity and an empty list if the
+        greedy walk gets stuck.
+    """
+    n = len(matrix)
+    visited = [False] * n
+    visited[0] = True
+    path = [0]
+    cost = 0
+    for _ in range(n - 1):
+        curr_pos = path[-1]
+        candidates = [i for i in range(n) if not visited[i] and matrix[curr_pos][i] > 0]
+        if not candidates:
+            return float('inf'), []
+        i = min(candidates, key=lambda i: matrix[curr_pos][i])
+        visited[i] = True
+        path.append(i)
+        cost += matrix[curr_pos][i]
+    if matrix[path[-1]][0] <= 0:
+        return float('inf'), []
+    return cost + matrix[path[-1]][0], path + [0]
+
+def bound_tables(matrix):
+    """Precomputes the tables used by the branch and bound.
+
+    Args:
+        matrix (list): A 2D list representing the adjacency matrix.
+
+    Returns:
+        tuple: The neighbours of every city cheapest first, the cheapest edge leaving and the
+        cheapest edge entering every city, the cost every unvisited city adds to the lower bound
+        (counted twice), and whether the matrix is symmetric.
+    """
+    n = len(matrix)
+    inf = float('inf')
+    neighbours = [sorted((i for i in range(n) if i != j and matrix[j][i] > 0), key=lambda i: matrix[j][i])
+                  for j in range(n)]
+    first = [min((matrix[j][i] for i in range(n) if i != j and matrix[j][i] > 0), default=inf)
+             for j in range(n)]
+    last = [min((matrix[i][j] for i in range(n) if i != j and matrix[i][j] > 0), default=inf)
+            for j in range(n)]
+    symmetric = is_symmetric(matrix)
+    if symmetric:
+        # Every city still to visit needs two different edges
+        needed = [sum(sorted(matrix[j][i] for i in neighbours[j])[:2]) if len(neighbours[j]) > 1 else inf
+                  for j in range(n)]
+    else:
+        # Every city still to visit needs one edge in and one edge out
+        needed = [first[j] + last[j] for j in range(n)]
+    return neighbours, first, last, needed, symmetric
+
+def branch_and_bound(matrix, tables, prefix, min_cost, incumbent=None):
+    """Explores the tours that start with a given prefix, pruning on a lower bound.
+
+    The search visits the children of a node cheapest edge first, explores only tours where
+    city 1 comes before city 2 when the matrix is symmetric (every tour is also found in reverse),
+    and cuts a branch when its cost plus half the cost of the cheapest edges still needed (two
+    per unvisited city, one for the current city and one back to city 0) cannot beat the best tour.
+
+    Args:
+        matrix (list): A 2D list representing the adjacency matrix.
+        tables (tuple): The tables returned by `bound_tables(matrix)`.
+        prefix (list): The first cities of the tours to explore, starting with city 0.
+        min_cost (float): The cost to beat.
+        incumbent (multiprocessing.Value): The best cost shared between processes, if any.
+            It is read to prune and updated whenever a better tour is found.
+
+    Returns:
+        tuple: The minimum cost and the path corresponding to this cost, or `min_cost` and an
+        empty list if no better tour starts with the prefix.
+    """
+    n = len(matrix)
+    neighbours, first, last, needed, symmetric = tables
+    visited = [False] * n
+    for i in prefix:
+        visited[i] = True
+    best_cost, best_path = min_cost, []
+    # Reading the shared value without its lock is safe: it is only ever lowered
+    shared = incumbent.get_obj() if incumbent is not None else None
+
+    def branch(curr_pos, count, cost, path, remaining):
+        """Recursively explores the paths whose lower bound is below the best cost.
+
+        Args:
+            curr_pos (int): The current position in the path.
+            count (int): The number of nodes visited so far.
+            cost (int): The current cost of the path.
+            path (list): The current path being explored.
+            remaining (float): The sum of `needed` over the unvisited cities.
+        """
+        nonlocal min_cost, best_cost, best_path
+        if shared is not None and shared.value < min_cost:
+            min_cost = shared.value
+
+        if count == n:
+            total_cost = cost + matrix[curr_pos][0]
+            if matrix[curr_pos][0] > 0 and total_cost < min_cost:
+                if incumbent is not None:
+                    with incumbent.get_lock():
+                        if total_cost >= incumbent.value:
+                            return
+                        incumbent.value = total_cost
+                min_cost = best_cost = total_cost
+                best_path = path + [0]
+            return
+
+        if cost + (first[curr_pos] + remaining + last[0]) / 2 >= min_cost:
+            return
+
+        for i in neighbours[curr_pos]:
+            if visited[i] or (symmetric and i == 2 and not visited[1]):
+                continue
+            next_cost = cost + matrix[curr_pos][i]
+            if next_cost >= min_cost:
+                # The neighbours are sorted, so no later child is cheaper
+                break
+            visited[i] = True
+            path.append(i)
+            branch(i, count + 1, next_cost, path, remaining - needed[i])
+            visited[i] = False
+            path.pop()
+
+    cost = sum(matrix[a][b] for a, b in zip(prefix, prefix[1:]))
+    remaining = sum(needed[i] for i in range(n) if not visited[i])
+    branch(prefix[-1], len(prefix), cost, list(prefix), remaining)
+    return best_cost, best_path
+
+def tsp_branch_and_bound(matrix):
+    """Solves the Traveling Salesman Problem using branch and bound.
+
+    Finds the same minimum cost as `tsp_backtracking`, starting from the nearest neighbour
+    tour and pruning with `branch_and_bound`.
+
+    Args:
+        matrix (list): A 2D list representing the adjacency matrix.
+
+    Returns:
+        tuple: The minimum cost and the path corresponding to this cost.
+    """
+    if len(matrix) < 4:
+        return tsp_backtracking(matrix)
+    min_cost, best_path = nearest_neighbour_tour(matrix)
+    cost, path = branch_and_bound(matrix, bound_tables(matrix), [0], min_cost)
+    if path:
+        min_cost, best_path = cost, path
+    return min_cost, best_path
+
+def prefix_tasks(matrix, tables, depth):
+    """Splits the search tree into the paths of `depth` edges leaving city 0.
+
+    Args:
+        matrix (list): A 2D list representing the adjacency matrix.
+        tables (tuple): The tables returned by `bound_tables(matrix)`.
+        depth (int): The number of edges of each prefix.
+
+    Returns:
+        list: The prefixes, cheapest first, so the best tours tend to be found early.
+    """
+    neighbours, _, _, _, symmetric = tables
+    prefixes = [[0]]
+    for _ in range(depth):
+        prefixes = [path + [i] for path in prefixes for i in neighbours[path[-1]]
+                    if i not in path and not (symmetric and i == 2 and 1 not in path)]
+    return sorted(prefixes, key=lambda path: sum(matrix[a][b] for a, b in zip(path, path[1:])))
+
+# State of the worker processes of `tsp_parallel`, set once per process by `init_worker`
+worker_matrix = None
+worker_tables = None
+worker_incumbent = None
+
+def init_worker(matrix, incumbent):
+    """Stores the problem and the shared best cost in a worker process.
+
+    Args:
+        matrix (list): A 2D list representing the adjacency matrix.
+        incumbent (multiprocessing.Value): The best cost shared between processes.
+    """
+    global worker_matrix, worker_tables, worker_incumbent
+    worker_matrix = matrix
+    worker_tables = bound_tables(matrix)
+    worker_incumbent = incumbent
+
+def solve_prefix(prefix):
+    """Runs the branch and bound below one prefix in a worker process.
+
+    Args:
+        prefix (list): The first cities of the tours to explore.
+
+    Returns:
+        tuple: The best cost and path found below the prefix, the path is empty if none beat
+        the shared best cost.
+    """
+    return branch_and_bound(worker_matrix, worker_tables, prefix, worker_incumbent.value, worker_incumbent)
+
+def tsp_parallel(matrix, workers=None, depth=None):
+    """Solves the Traveling Salesman Problem with branch and bound on several processes.
+
+    The search tree is split into prefix tasks that are handed out one at a time, so idle
+    workers keep taking the next task until none are left. All workers prune against the best
+    cost found so far by any of them, which is kept in shared memory.
+
+    Args:
+        matrix (list): A 2D list representing the adjacency matrix.
+        workers (int): The number of processes. Defaults to the number of CPUs.
+        depth (int): The number of edges of each prefix. Defaults to the smallest depth giving at
+            least 8 tasks per worker.
+
+    Returns:
+        tuple: The minimum cost and the path corresponding to this cost.
+    """
+    n = len(matrix)
+    if n < 4:
+        return tsp_backtracking(matrix)
+    workers = workers or os.cpu_count()
+    tables = bound_tables(matrix)
+    if depth is None:
+        depth = 1
+        while depth < n - 3 and len(prefix_tasks(matrix, tables, depth)) < 8 * workers:
+            depth += 1
+    tasks = prefix_tasks(matrix, tables, depth)
+
+    min_cost, best_path = nearest_neighbour_tour(matrix)
+    incumbent = multiprocessing.Value('d', min_cost)
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(matrix, incumbent)) as executor:
+        for cost, path in executor.map(solve_prefix, tasks):
+            if path and cost < min_cost:
+                min_cost, best_path = cost, path
+    return min_cost, best_path
+
+MODES = {
+    "backtrack": tsp_backtracking,
+    "bnb": tsp_branch_and_bound,
+    "iterative": tsp_iterative,
+    "parallel": tsp_parallel,
+}
+
+def main(input_file, output_file, mode="backtrack", workers=None):
     """Main function to read input, solve the problem, and write the output.
 
     Args:
         input_file (str): The path to the input file containing the adjacency matrix.
         output_file (str): The path to the output file where the solution will be written.
+        mode (str): The search to run, one of `MODES`.
+        workers (int): The number of processes of the parallel search.
     """
     matrix = read_adjacency_matrix(input_file)
     for i in range(len(matrix)):
@@ -110,14 +474,17 @@ def main(input_file, output_file):
                 matrix[i][j] += matrix[j][i]
             else:
                 matrix[i][j] = matrix[j][i]
-    min_cost, best_path = tsp_backtracking(matrix)
+    if mode == "parallel":
+        min_cost, best_path = tsp_parallel(matrix, workers)
+    else:
+        min_cost, best_path = MODES[mode](matrix)
     write_output(output_file, min_cost, best_path)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python tsp.py <input_file> <output_file>")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    main(input_file, output_file)
+    parser = argparse.ArgumentParser(description="Solve a TSP instance exactly.")
+    parser.add_argument("input_file", help="file containing the pairwise costs as an adjacency matrix")
+    parser.add_argument("output_file", help="file where the solution will be written")
+    parser.add_argument("--mode", choices=sorted(MODES), default="backtrack", help="search algorithm to use")
+    parser.add_argument("--workers", type=int, help="number of processes for the parallel mode (default: all CPUs)")
+    args = parser.parse_args()
+    main(args.input_file, args.output_file, args.mode, args.workers)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+"""This module resolves broken chains of embedded QPU samples and tunes the chain strength.
+
+On the QPU every logical variable is a chain of qubits. A read where the qubits of a chain
+disagree has a broken chain, and the logical value must be chosen from it. `EmbeddingComposite`
+does this for us but only reports the fraction of broken chains per read. The composite here
+embeds the problem itself, samples the child and resolves all chains of all reads at once:
+
+- `majority` (like `dwave.embedding.majority_vote`): a chain takes the value of at least half of its qubits.
+- `energy`: broken chains start from the majority vote, then each variable with a broken chain is
+  set, in all reads at once, to the value that lowers the energy of the logical problem given the
+  other variables.
+
+It also counts how often each chain breaks. Given a target break rate, it tunes the chain strength
+in both directions: chains that break too often are made stronger, and chains that almost never
+break are made weaker, since overly strong chains flatten the logical problem on the QPU and hurt
+the quality of the samples. The strength is multiplied or divided by a factor until the break rate
+has been seen on both sides of the target, then bisected (geometrically) between the two, and the
+search stops once the break rate is within a tolerance band around the target.
+
+The functions can be used as follows:
+1. `chain_incidence(embedding, variables, qubits)` - Maps the qubit columns of a sample array to chains.
+2. `resolve_chains(samples, incidence, bqm, variables, method)` - Unembeds all reads at once.
+3. `next_chain_strength(too_weak, too_strong, factor)` - Picks the chain strength of the next tuning round.
+4. `ChainResolvingComposite(child, embedding)` - A sampler that embeds, samples and resolves chains.
+
+Example usage:
+    sampler = ChainResolvingComposite(DWaveSampler(), embedding, method="energy", target_break_rate=0.05, tolerance=0.02)
+    sampleset = sampler.sample(bqm, num_reads=1000)
+    print(sampleset.info["chain_stats"].worst(3))
+"""
+
+from dataclasses import dataclass, field
+import dimod
+import numpy as np
+from dwave.embedding import embed_bqm
+from dwave.embedding.chain_strength import scaled
+from scipy import sparse
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+METHODS = ("majority", "energy")
+
+@dataclass
+class ChainStats:
+    """How often the chains of an embedded sampleset are broken.
+
+    Attributes:
+        chain_strength (float): The chain strength of the reads.
+        variables (list): The logical variables, in the order of `break_rate`.
+        break_rate (np.array): The fraction of reads in which each chain is broken.
+        read_break_fraction (np.array): The fraction of broken chains in each read.
+        history (list): The (chain strength, mean break rate) of every round of sampling, in order.
+    """
+    chain_strength: float
+    variables: list
+    break_rate: np.ndarray
+    read_break_fraction: np.ndarray
+    history: list = field(default_factory=list)
+
+    @property
+    def mean(self):
+        """The fraction of broken chains over all reads."""
+        return float(self.read_break_fraction.mean()) if self.read_break_fraction.size else 0.0
+
+    def worst(self, count=5):
+        """Returns the chains that break most often.
+
+        Args:
+            count (int): The number of chains.
+
+        Returns:
+            list: Pairs (variable, break rate), most often broken first. Chains that never break
+            are left out.
+        """
+        order = np.argsort(-self.break_rate, kind='stable')[:count]
+        order = order[self.break_rate[order] > 0]
+        return [(self.variables[i], float(self.break_rate[i])) for i in order]
+
+def next_chain_strength(too_weak, too_strong, factor):
+    """Chooses the chain strength of the next round of tuning.
+
+    Args:
+        too_weak (float): The strongest chain strength known to break too many chains, or None.
+        too_strong (float): The weakest chain strength known to break too few chains, or None.
+        factor (float): The factor the chain strength changes by while only one side is known.
+
+    Returns:
+        float: The geometric mean of the two bounds if both are known, else the known bound
+        multiplied (too many breaks) or divided (too few breaks) by `factor`.
+    """
+    if too_weak is not None and too_strong is not None:
+        return float(np.sqrt(too_weak * too_strong))
+    if too_weak is not None:
+        return too_weak * factor
+    return too_strong / factor
+
+def chain_incidence(embedding, variables, qubits):
+    """Maps the qubit columns of a sample array to the chains of the logical variables.
+
+    Args:
+        embedding (dict): The chain of qubits of every logical variable.
+        variables (list): The logical variables, in the order of the columns of the result.
+        qubits (list): The qubits, in the order of the columns of the samples.
+
+    Returns:
+        sparse.csr_matrix: The (qubits x variables) 0/1 matrix with a 1 where a qubit is in the
+        chain of a variable.
+    """
+    column = {q: i for i, q in enumerate(qubits)}
+    rows = [column[q] for v in variables for q in embedding[v]]
+    cols = np.repeat(np.arange(len(variables)), [len(embedding[v]) for v in variables])
+    return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(qubits), len(variables)))
+
+def resolve_chains(samples, incidence, bqm, variables, method="majority"):
+    """Unembeds all reads at once.
+
+    Args:
+        samples (np.array): The (reads x qubits) binary samples of the child sampler.
+        incidence (sparse.csr_matrix): The map of `chain_incidence`.
+        bqm (dimod.BinaryQuadraticModel): The logical problem, used by the energy method.
+        variables (list): The logical variables, in the order of the columns of `incidence`.
+        method (str): "majority" or "energy".
+
+    Returns:
+        tuple: The (reads x variables) logical samples as int8 and the boolean (reads x variables)
+        mask of broken chains.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown chain resolution method: {method}")
+    # Number of qubits at 1 in each chain of each read
+    ones = (incidence.T @ np.asarray(samples, dtype=float).T).T
+    lengths = np.asarray(incidence.sum(axis=0)).ravel()
+    broken = (ones > 0) & (ones < lengths)
+    # Ties go to 1, like dwave.embedding.majority_vote on binary samples
+    x = (2 * ones >= lengths).astype(np.int8)
+
+    if method == "energy" and broken.any():
+        binary = bqm.change_vartype(dimod.BINARY, inplace=False)
+        h, (rows, cols, values), _ = binary.to_numpy_vectors(variable_order=variables)
+        m = len(variables)
+        J = sparse.csr_matrix((np.concatenate([values, values]), (np.concatenate([rows, cols]),
+                               np.concatenate([cols, rows]))), shape=(m, m))
+        # Longest chains first: they carry the most information about the neighbours
+        for v in sorted(np.flatnonzero(broken.any(axis=0)), key=lambda v: -lengths[v]):
+            reads = broken[:, v]
+            field = h[v] + x[reads] @ J[:, v].toarray().ravel()
+            x[reads, v] = field < 0
+    return x, broken
+
+class ChainResolvingComposite(dimod.Sampler):
+    """Embeds problems into a structured sampler and resolves the chains of all reads at once.
+
+    The returned sampleset is in the logical variables, with a `chain_break_fraction` field, the
+    `problem_id` of the child, an `embedding_context` like `EmbeddingComposite` and the
+    `ChainStats` of the reads under `chain_stats`.
+    """
+
+    def __init__(self, child, embedding, method="majority", target_break_rate=None, tolerance=None, max_rounds=6,
+                 factor=1.5):
+        """Creates the composite.
+
+        Args:
+            child (dimod.Structured): The sampler to embed into, e.g. `DWaveSampler()`.
+            embedding (dict): The chain of qubits of every logical variable.
+            method (str): The chain resolution method, "majority" or "energy".
+            target_break_rate (float): If given, the problem is sampled again with a stronger or
+                weaker chain coupling while the mean break rate is outside the tolerance band.
+            tolerance (float): The half width of the band around `target_break_rate` where the
+                tuning stops. Defaults to half the target.
+            max_rounds (int): The maximum number of times the problem is sampled.
+            factor (float): The factor the chain strength changes by until the target is bracketed.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown chain resolution method: {method}")
+        if tolerance is None and target_break_rate is not None:
+            tolerance = target_break_rate / 2
+        self.child = child
+        self.embedding = embedding
+        self.method = method
+        self.target_break_rate = target_break_rate
+        self.tolerance = tolerance
+        self.max_rounds = max_rounds
+        self.factor = factor
+        self.adjacency = {q: set() for q in child.nodelist}
+        for u, v in child.edgelist:
+            self.adjacency[u].add(v)
+            self.adjacency[v].add(u)
+
+    @property
+    def parameters(self):
+        parameters = dict(self.child.parameters)
+        parameters['chain_strength'] = []
+        return parameters
+
+    @property
+    def properties(self):
+        return {'child_properties': self.child.properties}
+
+    def sample(self, bqm, chain_strength=None, return_embedding=None, **parameters):
+        """Samples from a logical binary quadratic model.
+
+        Args:
+            bqm (dimod.BinaryQuadraticModel): The logical problem.
+            chain_strength (float or callable): The chain strength, or a function of (bqm,
+                embedding) like `dwave.embedding.chain_strength.scaled`, the default.
+            return_embedding (bool): Accepted like in `EmbeddingComposite`; the embedding context
+                is always returned.
+            **parameters: Passed on to the child, e.g. `num_reads`.
+
+        Returns:
+            dimod.SampleSet: The logical samples of the round that ended the tuning, or, if no
+            round reached the tolerance band, of the round whose break rate came closest to it.
+        """
+        if chain_strength is None:
+            chain_strength = scaled
+        if callable(chain_strength):
+            chain_strength = chain_strength(bqm, self.embedding)
+        variables = list(bqm.variables)
+        history = []
+        best = None
+        too_weak = too_strong = None
+        for _ in range(self.max_rounds):
+            embedded = embed_bqm(bqm, self.embedding, self.adjacency, chain_strength, smear_vartype=dimod.SPIN)
+            response = self.child.sample(embedded, **parameters)
+            raw = response.record.sample
+            if response.vartype is dimod.SPIN:
+                raw = (raw + 1) // 2
+            incidence = chain_incidence(self.embedding, variables, list(response.variables))
+            x, broken = resolve_chains(raw, incidence, bqm, variables, self.method)
+            rate = float(broken.mean()) if broken.size else 0.0
+            history.append((float(chain_strength), rate))
+            if self.target_break_rate is None:
+                best = (chain_strength, response, x, broken)
+                break
+
+            # Distance of the break rate to the tolerance band, 0 inside it
+            miss = max(rate - self.target_break_rate - self.tolerance, self.target_break_rate - self.tolerance - rate, 0.0)
+            if best is None or miss < best_miss:
+                best, best_miss = (chain_strength, response, x, broken), miss
+            if miss == 0:
+                break
+            if rate > self.target_break_rate:
+                too_weak = chain_strength if too_weak is None else max(too_weak, chain_strength)
+            else:
+                too_strong = chain_strength if too_strong is None else min(too_strong, chain_strength)
+            chain_strength = next_chain_strength(too_weak, too_strong, self.factor)
+
+        chain_strength, response, x, broken = best
+        stats = ChainStats(float(chain_strength), variables, broken.mean(axis=0), broken.mean(axis=1), history)
+        if bqm.vartype is dimod.SPIN:
+            x = 2 * x - 1
+        info = {
+            'problem_id': response.info.get('problem_id'),
+            'embedding_context': {'embedding': self.embedding, 'chain_break_method': self.method,
+                                  'chain_strength': float(chain_strength)},
+            'chain_stats': stats,
+        }
+        return dimod.SampleSet.from_samples_bqm((x, variables), bqm, info=info,
+                                                num_occurrences=response.record.num_occurrences,
+                                                chain_break_fraction=stats.read_break_fraction)
@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+"""This module decodes whole samplesets of the TSP QUBO formulations at once.
+
+The solvers used to rebuild a solution matrix, validate it and score it one sample at a time.
+The functions here work on the (reads x variables) array of `sampleset.record.sample` instead and
+compute the feasibility mask, the tour and the tour cost of every read with NumPy reshapes and
+fancy indexing.
+
+Each decoder returns a tuple `(feasible, tours, costs)`:
+- feasible (np.array): Boolean mask of the reads that pass the solver's validity check.
+- tours (np.array): One closed tour per read (the start city is repeated at the end).
+  Rows of infeasible reads are filled with -1.
+- costs (np.array): The cost of each tour, np.inf for infeasible reads.
+
+The functions can be used as follows:
+1. `sample_matrix(sampleset, variables)` - Extracts the samples as an array with columns in a given order.
+2. `decode_eqats(samples, M)` - Decodes (city, position) samples of the EQATS formulation.
+3. `decode_dwave(samples, M)` - Decodes (city, time) samples of `traveling_salesperson_qubo`.
+4. `decode_jain(samples, M)` - Decodes edge samples of the Jain formulation.
+5. `repair_eqats(samples, M)` / `repair_jain(samples, M)` - Turn every read, valid or not, into a tour.
+6. `aggregate_sampleset(sampleset)` - Merges identical reads so each distinct sample is decoded once.
+
+With many reads, annealers return the same bitstring over and over. `aggregate_sampleset` packs
+each read into bytes with `np.packbits`, finds the distinct rows with `np.unique` and keeps one
+row per distinct sample with the summed `num_occurrences`, so the decoders above only see
+distinct samples while the statistics still count every read.
+"""
+
+import dimod
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+def unique_samples(samples, num_occurrences=None):
+    """Finds the distinct rows of a sample array.
+
+    Args:
+        samples (np.array): A (reads x variables) array of binary or spin values.
+        num_occurrences (np.array): The number of times each row was read, 1 by default.
+
+    Returns:
+        tuple: The index of the first read of every distinct sample, in read order; the index of
+        the distinct sample of every read; and the total occurrences of every distinct sample.
+    """
+    samples = np.asarray(samples)
+    if num_occurrences is None:
+        num_occurrences = np.ones(samples.shape[0], dtype=np.int64)
+    if samples.shape[0] == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.int64)
+    # One bit per variable: 1 for binary 1 and spin +1
+    packed = np.packbits(samples > 0, axis=1)
+    _, first, inverse = np.unique(packed, axis=0, return_index=True, return_inverse=True)
+    # Number the distinct samples in the order of their first read
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.size)
+    inverse = rank[inverse.ravel()]
+    counts = np.bincount(inverse, weights=num_occurrences, minlength=order.size).astype(np.int64)
+    return first[order], inverse, counts
+
+def aggregate_sampleset(sampleset):
+    """Merges the identical reads of a sampleset.
+
+    The distinct samples keep the order of their first read, so picking the first lowest-energy
+    read gives the same sample as before. `num_occurrences` is summed, `chain_break_fraction`
+    is averaged over the merged reads and other fields are taken from the first read.
+
+    Args:
+        sampleset (dimod.SampleSet): The samples returned by a sampler.
+
+    Returns:
+        dimod.SampleSet: One row per distinct sample, with the same variables and info.
+    """
+    record = sampleset.record
+    first, inverse, counts = unique_samples(record.sample, record.num_occurrences)
+    if first.size == len(record):
+        return sampleset
+    vectors = {name: record[name][first] for name in record.dtype.names
+               if name not in ('sample', 'energy', 'num_occurrences')}
+    if 'chain_break_fraction' in vectors:
+        weights = record.chain_break_fraction * record.num_occurrences
+        vectors['chain_break_fraction'] = np.bincount(inverse, weights=weights, minlength=first.size) / counts
+    return dimod.SampleSet.from_samples((record.sample[first], sampleset.variables), sampleset.vartype,
+                                        record.energy[first], info=dict(sampleset.info), num_occurrences=counts,
+                                        sort_labels=False, **vectors)
+
+def sample_matrix(sampleset, variables):
+    """Extracts the samples of a sampleset as one array.
+
+    Args:
+        sampleset (dimod.SampleSet): The samples returned by a sampler.
+        variables (iterable): The variable labels, in the order the columns should have.
+
+    Returns:
+        np.array: A (reads x variables) array of the sample values.
+    """
+    columns = [sampleset.variables.index(v) for v in variables]
+    return sampleset.record.sample[:, columns]
+
+def tour_costs(M, tours):
+    """Sums the cost of consecutive cities along each tour.
+
+    Args:
+        M (np.array): The matrix of pairwise costs.
+        tours (np.array): A (reads x n+1) array of closed tours.
+
+    Returns:
+        np.array: The cost of each tour.
+    """
+    return M[tours[:, :-1], tours[:, 1:]].sum(axis=1)
+
+def order_by_position(X, feasible):
+    """Orders the cities of one-hot (city, position) samples by their position.
+
+    Cities sharing a position keep their index order, as when the (city, position) matrix is read
+    column by column.
+
+    Args:
+        X (np.array): A (reads x cities x positions) binary array.
+        feasible (np.array): The mask of reads where every city has exactly one position.
+
+    Returns:
+        np.array: A (reads x cities) array of city indices in visiting order, -1 for infeasible reads.
+    """
+    position = X.argmax(axis=2)
+    order = np.argsort(position, axis=1, kind='stable')
+    order[~feasible] = -1
+    return order
+
+def decode_eqats(samples, M):
+    """Decodes samples of the EQATS formulation.
+
+    Variable k encodes city `k // (n-1) + 1` at position `k % (n-1)`; city 0 is always first.
+    A read is feasible when every city has exactly one position.
+
+    Args:
+        samples (np.array): A (reads x (n-1)^2) binary array with columns in variable order.
+        M (np.array): The symmetrized matrix of pairwise costs.
+
+    Returns:
+        tuple: The feasibility mask, the tours and the tour costs of all reads.
+    """
+    n, _ = M.shape
+    reads = samples.shape[0]
+    X = np.asarray(samples).reshape(reads, n - 1, n - 1)
+    feasible = (X.sum(axis=2) == 1).all(axis=1)
+
+    home = np.zeros((reads, 1), dtype=int)
+    tours = np.hstack([home, order_by_position(X, feasible) + 1, home])
+    tours[~feasible] = -1
+
+    costs = np.full(reads, np.inf)
+    costs[feasible] = tour_costs(M, tours[feasible])
+    return feasible, tours, costs
+
+def decode_dwave(samples, M):
+    """Decodes samples of the `traveling_salesperson_qubo` formulation.
+
+    Variable k encodes city `k // n` at time `k % n`. A read is feasible when every city has
+    exactly one time. The tour starts at the city visited first and its cost includes the edge
+    back to that city.
+
+    Args:
+        samples (np.array): A (reads x n^2) binary array with columns ordered as (city, time) pairs.
+        M (np.array): The symmetrized matrix of pairwise costs.
+
+    Returns:
+        tuple: The feasibility mask, the tours and the tour costs of all reads.
+    """
+    n, _ = M.shape
+    reads = samples.shape[0]
+    X = np.asarray(samples).reshape(reads, n, n)
+    feasible = (X.sum(axis=2) == 1).all(axis=1)
+
+    order = order_by_position(X, feasible)
+    tours = np.hstack([order, order[:, :1]])
+
+    costs = np.full(reads, np.inf)
+    costs[feasible] = tour_costs(M, tours[feasible])
+    return feasible, tours, costs
+
+def decode_jain(samples, M):
+    """Decodes samples of the Jain edge formulation.
+
+    Variable k is the k-th edge (i, j), i < j, in row-major order of the upper triangle.
+    A read is feasible when every city has exactly two edges. Its cost is `np.sum(M * X)` for the
+    symmetric edge matrix X, i.e. M[i, j] + M[j, i] summed over the selected edges. The tour is only
+    filled in when the edges form a single cycle; reads split into several subtours are
+    feasible but keep a row of -1.
+
+    Args:
+        samples (np.array): A (reads x n(n-1)/2) binary array with columns in variable order.
+        M (np.array): The matrix of pairwise costs.
+
+    Returns:
+        tuple: The feasibility mask, the tours and the tour costs of all reads.
+    """
+    n, _ = M.shape
+    samples = np.asarray(samples)
+    reads = samples.shape[0]
+    i, j = np.triu_indices(n, 1)
+
+    incidence = np.zeros((i.size, n), dtype=int)
+    incidence[np.arange(i.size), i] = 1
+    incidence[np.arange(i.size), j] = 1
+    degree = samples @ incidence
+    feasible = (degree == 2).all(axis=1)
+
+    costs = np.full(reads, np.inf)
+    costs[feasible] = samples[feasible] @ (M[i, j] + M[j, i])
+
+    # The two neighbours of every city, then walk the cycle through city 0 for all reads at once
+    tours = np.full((reads, n + 1), -1)
+    X = np.zeros((reads, n, n), dtype=bool)
+    X[:, i, j] = X[:, j, i] = samples.astype(bool)
+    X = X[feasible]
+    neighbours = np.argsort(~X, axis=2, kind='stable')[:, :, :2]
+    rows = np.arange(X.shape[0])
+    walk = np.zeros((X.shape[0], n + 1), dtype=int)
+    previous = neighbours[:, 0, 1]
+    for step in range(1, n + 1):
+        current = walk[:, step - 1]
+        first, second = neighbours[rows, current, 0], neighbours[rows, current, 1]
+        walk[:, step] = np.where(first != previous, first, second)
+        previous = current
+    cycle = (walk[:, n] == 0) & (np.sort(walk[:, :n], axis=1) == np.arange(n)).all(axis=1)
+    walk[~cycle] = -1
+    tours[feasible] = walk
+    return feasible, tours, costs
+
+def repair_eqats(samples, M):
+    """Turns every EQATS read into a valid tour.
+
+    Reads where some city does not have exactly one position are repaired by assigning cities to
+    positions with the Hungarian algorithm, keeping as many of the read's 1 bits as possible.
+    Valid reads are kept as they are.
+
+    Args:
+        samples (np.array): A (reads x (n-1)^2) binary array with columns in variable order.
+        M (np.array): The symmetrized matrix of pairwise costs.
+
+    Returns:
+        tuple: The tours and the tour costs of all reads, and the mask of repaired reads.
+    """
+    n, _ = M.shape
+    feasible, tours, costs = decode_eqats(samples, M)
+    X = np.asarray(samples).reshape(-1, n - 1, n - 1)
+    repaired = ~feasible
+    for r in np.flatnonzero(repaired):
+        cities, positions = linear_sum_assignment(X[r], maximize=True)
+        tours[r, 1:-1] = cities[np.argsort(positions)] + 1
+        tours[r, 0] = tours[r, -1] = 0
+    costs[repaired] = tour_costs(M, tours[repaired])
+    return tours, costs, repaired
+
+def greedy_tour(n, candidates):
+    """Builds a tour from edges taken greedily from a list of candidates.
+
+    An edge is accepted if both cities still have fewer than two edges and it does not close a
+    cycle early. The remaining path is closed by the edge between its two ends.
+
+    Args:
+        n (int): The number of cities.
+        candidates (iterable): Pairs of cities in order of preference. Must contain enough edges
+            to connect all cities into one path.
+
+    Returns:
+        np.array: The closed tour starting and ending at city 0.
+    """
+    degree = [0] * n
+    parent = list(range(n))
+    neighbours = [[] for _ in range(n)]
+
+    def find(u):
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    accepted = 0
+    for u, v in candidates:
+        if accepted == n - 1:
+            break
+        if degree[u] == 2 or degree[v] == 2:
+            continue
+        root_u, root_v = find(u), find(v)
+        if root_u == root_v:
+            continue
+        parent[root_u] = root_v
+        degree[u] += 1
+        degree[v] += 1
+        neighbours[u].append(v)
+        neighbours[v].append(u)
+        accepted += 1
+
+    tour = [0]
+    previous = -1
+    current = 0
+    if n > 1 and degree[0] == 2:
+        # City 0 is inside the path: start from one end of it instead
+        current = next(u for u in range(n) if degree[u] < 2)
+        tour = [current]
+    for _ in range(n - 1):
+        current, previous = next(v for v in neighbours[current] if v != previous), current
+        tour.append(current)
+    tour = np.array(tour)
+    tour = np.roll(tour, -int(np.flatnonzero(tour == 0)[0]))
+    return np.append(tour, 0)
+
+def repair_jain(samples, M):
+    """Turns every Jain read into a valid tour.
+
+    Reads whose edges do not form a single cycle through all cities are repaired by greedy
+    subtour patching: the read's own edges are kept cheapest first as long as they fit in a tour,
+    and the resulting paths are joined with the cheapest edges between their ends.
+    Reads that already form a tour are kept as they are.
+
+    Args:
+        samples (np.array): A (reads x n(n-1)/2) binary array with columns in variable order.
+        M (np.array): The matrix of pairwise costs.
+
+    Returns:
+        tuple: The tours and the tour costs of all reads, and the mask of repaired reads.
+    """
+    n, _ = M.shape
+    samples = np.asarray(samples)
+    _, tours, _ = decode_jain(samples, M)
+    i, j = np.triu_indices(n, 1)
+    weights = M[i, j] + M[j, i]
+    by_cost = np.argsort(weights, kind='stable')
+    all_edges = list(zip(i[by_cost].tolist(), j[by_cost].tolist()))
+
+    repaired = tours[:, 0] < 0
+    for r in np.flatnonzero(repaired):
+        own = by_cost[samples[r, by_cost] == 1]
+        candidates = list(zip(i[own].tolist(), j[own].tolist())) + all_edges
+        tours[r] = greedy_tour(n, candidates)
+    costs = tour_costs(M + M.T, tours)
+    return tours, costs, repaired
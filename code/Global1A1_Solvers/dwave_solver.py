@@ -11,13 +11,16 @@ The program takes two inputs:
 
 The program can be run like this:
 $ python tsp_dwave.py problem.txt solution.txt
+
+The QUBO is the one of `dwave_networkx.traveling_salesperson_qubo`, built directly from the cost
+matrix as a binary quadratic model by `qubo.build_dwave_bqm`.
 """
 
-from dwave_networkx import traveling_salesperson_qubo
-import networkx as nx
 from dwave.system import LeapHybridSampler
 import sys
 import numpy as np
+from decode import aggregate_sampleset, decode_dwave, sample_matrix
+from qubo import build_dwave_bqm
 
 __author__ = "Murhaf Alawir, Anas Alatasi"
 __copyright__ = "Global1A1"
@@ -29,59 +32,6 @@ __email__ = "m.alawir@innopolis.university"
 __status__ = "Staging"
 
 
-def score(M, X):
-    """Calculates the total cost and path of a given solution.
-
-    Args:
-        M (np.array): The matrix of pairwise costs.
-        X (np.array): The binary matrix representing the solution path.
-
-    Returns:
-        tuple: Total cost and the path as a list of nodes.
-    """
-    n, _ = M.shape
-    cost = 0
-    path = []
-
-    # Find the first node in the path (assuming the path starts from node 0)
-    current_node = 0
-
-    for j in range(n):
-        for i in range(n):
-            if not X[i , j]:
-                continue
-            next_node = i
-            path.append(next_node)
-            cost += M[current_node, next_node]
-            current_node = next_node
-
-    # Add the cost to return to the starting node
-    cost += M[current_node, path[0]]
-    path.append(path[0])  # Completing the cycle by returning to the start
-
-    return cost, path
-
-def is_valid_solution(X):
-    """Checks if a given solution is valid.
-
-    A valid solution has exactly one outgoing edge from each node.
-
-    Args:
-        X (np.array): The binary matrix representing the solution path.
-
-    Returns:
-        bool: True if the solution is valid, False otherwise.
-    """
-    n, _ = X.shape
-    for i in range(n):
-        count = 0
-        for j in range(n):
-            if X[i, j] == 1:
-                count += 1
-        if count != 1:
-            return False
-    return True
-
 def build_solution(sample, n):
     """Builds the solution matrix from the raw sample output.
 
@@ -117,31 +67,31 @@ if __name__ == "__main__":
         for j in range(M.shape[1]):
             M[i, j] += M0[j, i]
 
-    # Create a graph from the adjacency matrix
-    G = nx.from_numpy_array(M)
-
-    # Formulate the QUBO problem for TSP
-    new_q = traveling_salesperson_qubo(G)
+    # Formulate the QUBO problem for TSP, variables labeled (city, time)
+    bqm = build_dwave_bqm(M)
 
     # Solve the QUBO problem using the Leap Hybrid Sampler
     sampler = LeapHybridSampler()
-    sampleset = sampler.sample_qubo(new_q, time_limit=3)
-
-    # Extract the first solution
-    first = sampleset.first
+    sampleset = sampler.sample(bqm, time_limit=3)
 
     # Problem ID for tracking
     problem_id = sampleset.info['problem_id']
 
-    # Build the solution matrix
-    e = first.sample.values()
+    # Decode each distinct sample once and keep the lowest-energy valid one
+    sampleset = aggregate_sampleset(sampleset)
     n = M.shape[0]
-    X = build_solution(e, n)
+    samples = sample_matrix(sampleset, [(city, t) for city in range(n) for t in range(n)])
+    feasible, tours, costs = decode_dwave(samples, M)
+    order = np.argsort(sampleset.record.energy, kind='stable')
+    valid = order[feasible[order]]
 
     # Validate and score the solution
-    if is_valid_solution(X):
-        cost, path = score(M, X)
+    if valid.size > 0:
+        k = valid[0]
+        X = build_solution(samples[k], n)
+        cost, path = costs[k], tours[k].tolist()
         with open(out_file, 'w') as f:
             f.write(f"{X}\n")
             f.write(f"Score: {cost}\n")
             f.write(f"Path: {path}\n")
+            f.write(f"Num occurrences: {sampleset.record.num_occurrences[k]}\n")
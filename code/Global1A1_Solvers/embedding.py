@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+"""This module caches minor embeddings of the TSP QUBO formulations on the QPU graph.
+
+`EmbeddingComposite` runs minorminer's heuristic on every call, which often takes longer than
+the anneal itself. The interaction graph of a formulation depends only on the formulation and the
+number of cities, though, so its embedding can be found once per target graph and reused. This
+module stores embeddings as `.json` files keyed by (formulation, n, target fingerprint), where the
+fingerprint is a hash of the target's qubits and couplers: a QPU with a different set of working
+qubits gets its own embedding. Cached embeddings are used through `FixedEmbeddingComposite`.
+
+Embeddings can be precomputed offline against a synthetic Pegasus or Zephyr graph from
+`dwave_networkx`, so the cache can be built and tested without access to hardware.
+
+The functions can be used as follows:
+1. `topology_fingerprint(target)` - Hashes the qubits and couplers of a sampler or graph.
+2. `get_embedding(formulation, n, target, cache_dir=None)` - Returns the cached embedding, finding it if needed.
+3. `fixed_embedding_sampler(child, formulation, n, cache_dir=None)` - Wraps a structured sampler with the cached embedding.
+4. `synthetic_target(topology, size)` - Builds a Pegasus or Zephyr graph to embed into offline.
+
+Example usage:
+    sampler = fixed_embedding_sampler(DWaveSampler(), "eqats", n, cache_dir="embeddings")
+    sampleset = sampler.sample(bqm, num_reads=1000)
+
+The cache can be filled offline like this:
+$ python embedding.py eqats 5 6 7 8 --topology pegasus --size 16 --cache-dir embeddings
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+import minorminer
+import numpy as np
+from dwave.system import FixedEmbeddingComposite
+from qubo import FORMULATIONS
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    import dwave_networkx as dnx
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+# Embeddings already loaded or found in this process, keyed by (formulation, n, fingerprint)
+EMBEDDINGS = {}
+
+TOPOLOGIES = {
+    "pegasus": dnx.pegasus_graph,
+    "zephyr": dnx.zephyr_graph,
+}
+
+def target_structure(target):
+    """Returns the qubits and couplers of a target.
+
+    Args:
+        target: A structured sampler (with `nodelist` and `edgelist`, e.g. `DWaveSampler`) or a
+            networkx graph.
+
+    Returns:
+        tuple: The sorted list of qubits and the sorted list of couplers (u, v) with u < v.
+    """
+    if hasattr(target, "edgelist"):
+        nodes, edges = target.nodelist, target.edgelist
+    else:
+        nodes, edges = target.nodes, target.edges
+    return sorted(nodes), sorted((min(u, v), max(u, v)) for u, v in edges)
+
+def topology_fingerprint(target):
+    """Hashes the qubits and couplers of a target.
+
+    Args:
+        target: A structured sampler or a networkx graph.
+
+    Returns:
+        str: The first 16 hex digits of the SHA-256 hash of the qubit and coupler lists.
+    """
+    nodes, edges = target_structure(target)
+    data = json.dumps([nodes, edges], separators=(",", ":")).encode()
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def source_edges(formulation, n):
+    """Lists the interactions of the QUBO of a formulation.
+
+    Args:
+        formulation (str): The name of the formulation, "eqats" or "jain".
+        n (int): The number of cities.
+
+    Returns:
+        list: The distinct pairs (u, v), u < v, of variables that share a coupler.
+    """
+    if formulation not in FORMULATIONS:
+        raise ValueError(f"Unknown formulation: {formulation}")
+    template = FORMULATIONS[formulation](n)
+    rows = np.concatenate([template.penalty_rows, template.cost_rows])
+    cols = np.concatenate([template.penalty_cols, template.cost_cols])
+    off_diag = rows != cols
+    pairs = np.unique(np.stack([rows[off_diag], cols[off_diag]], axis=1), axis=0)
+    return [tuple(pair) for pair in pairs.tolist()]
+
+def embedding_path(cache_dir, formulation, n, fingerprint):
+    """Returns the path of the on-disk embedding of a formulation.
+
+    Args:
+        cache_dir (str): The directory holding the embeddings.
+        formulation (str): The name of the formulation.
+        n (int): The number of cities.
+        fingerprint (str): The fingerprint of the target.
+
+    Returns:
+        str: The path of the `.json` file.
+    """
+    return os.path.join(cache_dir, f"{formulation}_n{n}_{fingerprint}.json")
+
+def save_embedding(path, embedding):
+    """Saves an embedding to a `.json` file.
+
+    Args:
+        path (str): The path of the file.
+        embedding (dict): The chain of qubits of every variable.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({str(v): list(chain) for v, chain in embedding.items()}, f)
+
+def load_embedding(path):
+    """Loads an embedding from a `.json` file.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        dict: The chain of qubits of every variable.
+    """
+    with open(path) as f:
+        return {int(v): chain for v, chain in json.load(f).items()}
+
+def find_embedding(formulation, n, target, **parameters):
+    """Runs minorminer to embed the QUBO of a formulation into a target.
+
+    Args:
+        formulation (str): The name of the formulation, "eqats" or "jain".
+        n (int): The number of cities.
+        target: A structured sampler or a networkx graph.
+        **parameters: Passed on to `minorminer.find_embedding`, e.g. `random_seed` or `timeout`.
+
+    Returns:
+        dict: The chain of qubits of every variable.
+    """
+    _, edges = target_structure(target)
+    embedding = minorminer.find_embedding(source_edges(formulation, n), edges, **parameters)
+    if not embedding:
+        raise ValueError(f"No embedding found for {formulation} with n = {n}")
+    return {int(v): list(chain) for v, chain in embedding.items()}
+
+def get_embedding(formulation, n, target, cache_dir=None, **parameters):
+    """Returns the embedding of a formulation into a target, finding it only once.
+
+    Embeddings are kept in memory for the process. If `cache_dir` is given, embeddings are read
+    from it when present and written to it otherwise.
+
+    Args:
+        formulation (str): The name of the formulation, "eqats" or "jain".
+        n (int): The number of cities.
+        target: A structured sampler or a networkx graph.
+        cache_dir (str): The directory of the on-disk store, or None to keep embeddings in memory only.
+        **parameters: Passed on to `minorminer.find_embedding` when the embedding is not cached.
+
+    Returns:
+        dict: The chain of qubits of every variable.
+    """
+    fingerprint = topology_fingerprint(target)
+    key = (formulation, n, fingerprint)
+    if key in EMBEDDINGS:
+        return EMBEDDINGS[key]
+
+    path = embedding_path(cache_dir, formulation, n, fingerprint) if cache_dir else None
+    if path and os.path.exists(path):
+        embedding = load_embedding(path)
+    else:
+        embedding = find_embedding(formulation, n, target, **parameters)
+        if path:
+            save_embedding(path, embedding)
+    EMBEDDINGS[key] = embedding
+    return embedding
+
+def fixed_embedding_sampler(child, formulation, n, cache_dir=None, **parameters):
+    """Wraps a structured sampler with the cached embedding of a formulation.
+
+    Args:
+        child (dimod.Structured): The sampler to embed into, e.g. `DWaveSampler()`.
+        formulation (str): The name of the formulation, "eqats" or "jain".
+        n (int): The number of cities.
+        cache_dir (str): The directory of the on-disk embedding store, if any.
+        **parameters: Passed on to `minorminer.find_embedding` when the embedding is not cached.
+
+    Returns:
+        FixedEmbeddingComposite: The sampler, taking the QUBO of the formulation for n cities.
+    """
+    embedding = get_embedding(formulation, n, child, cache_dir, **parameters)
+    return FixedEmbeddingComposite(child, embedding)
+
+def synthetic_target(topology, size):
+    """Builds a complete Pegasus or Zephyr graph to embed into without hardware.
+
+    Args:
+        topology (str): "pegasus" or "zephyr".
+        size (int): The size parameter of the graph, e.g. 16 for Advantage and 6 for Advantage2.
+
+    Returns:
+        networkx.Graph: The graph, with integer qubit labels like the QPU's.
+    """
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Unknown topology: {topology}")
+    return TOPOLOGIES[topology](size)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute embeddings of the TSP QUBO formulations.")
+    parser.add_argument("formulation", choices=sorted(FORMULATIONS), help="QUBO formulation to embed")
+    parser.add_argument("sizes", type=int, nargs="+", help="numbers of cities")
+    parser.add_argument("--topology", choices=sorted(TOPOLOGIES), default="pegasus", help="synthetic target graph")
+    parser.add_argument("--size", type=int, default=16, help="size parameter of the target graph")
+    parser.add_argument("--cache-dir", default="embeddings", help="directory where the embeddings are stored")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of minorminer")
+    args = parser.parse_args()
+
+    target = synthetic_target(args.topology, args.size)
+    print(f"{args.topology}({args.size}): fingerprint {topology_fingerprint(target)}")
+    for n in args.sizes:
+        t0 = time.perf_counter()
+        embedding = get_embedding(args.formulation, n, target, args.cache_dir, random_seed=args.seed)
+        t1 = time.perf_counter()
+        qubits = sum(len(chain) for chain in embedding.values())
+        longest = max(len(chain) for chain in embedding.values())
+        print(f"n = {n}: {len(embedding)} variables on {qubits} qubits, longest chain {longest}, {t1 - t0:.2f} s")
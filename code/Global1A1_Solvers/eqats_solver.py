@@ -11,14 +11,46 @@ The program takes two inputs:
 
 The program can be run like this:
 $ python tsp_dwave.py problem.txt solution.txt
+
+The module can also be imported, so batch drivers can solve many problems in one process:
+    M = load_problem("problem.txt")
+    result = solve(M, sampler="local", num_reads=2000)
+    write_solution("solution.txt", result)
+
+By default the QUBO is passed to the sampler as a sparse binary quadratic model. Use `--dense`
+to build the full QUBO matrix first, as earlier versions did.
+
+The sampler is chosen with `--sampler`: `hybrid` (Leap hybrid solver, the default), `qpu`
+(D-Wave's quantum annealer), `local` (a NumPy simulated annealer that needs no network access)
+or `mock` (the same annealer behind a mock QPU with the Pegasus topology, so the QUBO goes through
+embedding and unembedding like on the QPU):
+$ python tsp_dwave.py problem.txt solution.txt --sampler local --num-reads 2000
+
+With `--embedding-cache DIR`, the QPU sampler embeds the QUBO with an embedding stored in DIR
+(see `embedding.py`) instead of running minorminer on every call.
+
+With `--chain-resolution majority|energy`, QPU samples are unembedded by `chains.py`, which
+reports how often each chain breaks, and `--target-chain-break RATE` samples again with a stronger
+or weaker chain coupling until about RATE of the chains break.
 """
 
-import sys
-from dwave.system.composites import EmbeddingComposite
+import argparse
+import functools
+from dataclasses import dataclass, field
+import dimod
+from dwave.system.composites import EmbeddingComposite, FixedEmbeddingComposite
 from dwave.system import DWaveSampler, LeapHybridSampler
 import dwave.inspector
 import numpy as np
+from chains import ChainResolvingComposite
+from decode import aggregate_sampleset, decode_eqats, repair_eqats, sample_matrix
+from embedding import fixed_embedding_sampler, get_embedding
+from local_search import improve
 from plot import plot_problem, plot_solution
+from penalty import SweepResult, sweep_lambda
+from qubo import build_eqats_qubo
+from samplers import BatchedAnnealingSampler, is_mock_sampleset, mock_qpu_sampler
+import templates
 
 __author__ = "Murhaf Alawir, Anas Alatasi, Hadi Salloum"
 __copyright__ = "Global1A1"
@@ -29,87 +61,108 @@ __maintainer__ = "Murhaf Alawir"
 __email__ = "m.alawir@innopolis.university"
 __status__ = "Staging"
 
-# Input and output file arguments
-in_file = sys.argv[1]
-out_file = sys.argv[2]
-num_samples = 1000
+@dataclass
+class SolveResult:
+    """The best valid solution found by `solve`.
+
+    Attributes:
+        cost (float): The cost of the tour, np.inf if no valid sample was found.
+        path (list): The tour as a list of cities, starting and ending at city 0.
+        energy (float): The energy of the sample the tour was decoded from.
+        solution (np.array): The n*n solution matrix, where X[i][j]=1 means city i is visited at time j.
+        sample (dict): The raw sample returned by the solver.
+        problem_id (str): The id of the problem on D-Wave's servers, None for local samplers.
+        chain_break_fraction (float): The chain break fraction of the sample, None if not reported.
+        num_occurrences (int): The number of reads that returned the sample.
+        chain_stats (chains.ChainStats): The per-chain break statistics, None if the chains were
+            not resolved by `chains.ChainResolvingComposite`.
+        sampleset (dimod.SampleSet): All the samples returned by the solver.
+        sweep (penalty.SweepResult): The statistics of the penalty sweep, if one was run.
+        repaired (bool): True if the tour was obtained by repairing an invalid sample.
+        polished (bool): True if local search improved the tour found by the sampler.
+    """
+    cost: float = np.inf
+    path: list = field(default_factory=list)
+    energy: float = np.inf
+    solution: np.ndarray = None
+    sample: dict = None
+    problem_id: str = None
+    chain_break_fraction: float = None
+    num_occurrences: int = None
+    chain_stats: object = None
+    sampleset: dimod.SampleSet = None
+    sweep: SweepResult = None
+    repaired: bool = False
+    polished: bool = False
+
+    @property
+    def found(self):
+        """bool: True if a valid solution was found."""
+        return self.solution is not None
+
+def load_problem(in_file):
+    """Loads a cost matrix from a file and symmetrizes it.
+
+    Args:
+        in_file (str): The path to the file containing the adjacency matrix.
+
+    Returns:
+        np.array: The matrix M + M^T.
+    """
+    M = np.loadtxt(in_file)
+    return M + M.T
+
+def default_lambda(M):
+    """Computes the default penalty weight of the one-hot constraints.
 
-# Load the cost matrix and symmetrize it
-M0 = np.loadtxt(in_file)
-M = np.loadtxt(in_file)
-for i in range(M.shape[0]):
-    for j in range(M.shape[1]):
-        M[i, j] += M0[j, i]
+    Args:
+        M (np.array): The symmetrized matrix of pairwise costs.
 
-# Lambda is a scaling factor for the QUBO matrix
-_lambda = np.max(np.abs(M)) * 2
+    Returns:
+        float: Twice the largest absolute cost.
+    """
+    return np.max(np.abs(M)) * 2
 
-def build_objective_matrix():
+def build_objective_matrix(M, _lambda=None):
     """Builds the QUBO objective matrix for the TSP problem.
     
     Constructs the QUBO matrix that represents the TSP as a quadratic optimization problem,
     incorporating penalties for invalid solutions and costs for edges between cities.
+    The matrix is assembled in bulk by `build_eqats_qubo`.
     
+    Args:
+        M (np.array): The symmetrized matrix of pairwise costs.
+        _lambda (float): The penalty weight. Defaults to `default_lambda(M)`.
+
     Returns:
         np.array: The QUBO matrix used for solving the TSP.
     """
-    n, _ = M.shape
-    n = n - 1
-    m = int(n * n)
-    Q = np.zeros((m, m))
-
-    for i in range(m):
-        Q[i, i] = 2 * -_lambda
-        city_i = i // n + 1
-        pos_i = i % n
-
-        if pos_i == 0 or pos_i == n - 1:
-            Q[i, i] += M[city_i, 0]
-
-        k = i + 1
-        while k % n != 0:
-            Q[i, k] = 2 * _lambda
-            if pos_i == 0 or pos_i == n - 1:
-                Q[i, k] += M[city_i, 0]
-            k += 1
-
-    for i in range(m):
-        for j in range(i + 1, m):
-            city_i = i // n + 1
-            pos_i = i % n
-            city_j = j // n + 1
-            pos_j = j % n
+    if _lambda is None:
+        _lambda = default_lambda(M)
+    return build_eqats_qubo(M, _lambda)
 
-            if city_i == city_j:
-                continue
-            elif pos_i == pos_j - 1 or pos_i == pos_j + 1:
-                Q[i, j] = M[city_i, city_j]
-            elif pos_i == pos_j:
-                Q[i, j] = 2 * _lambda
+def build_bqm(M, _lambda=None, dense=False, template_cache=None):
+    """Builds the binary quadratic model sent to the samplers.
 
-    return Q
+    The sparse model is filled from the cached EQATS template for n cities, so repeated solves
+    at the same size only gather the costs and scale the penalty.
 
-Q = build_objective_matrix()
-
-def is_valid_solution(X):
-    """Checks if a given solution matrix is valid for TSP.
-    
-    Verifies that each city in the solution matrix is visited exactly once and each row 
-    of the matrix contains exactly one '1', indicating that each city has exactly one outgoing edge.
-    
     Args:
-        X (np.array): The binary matrix representing the solution path.
-    
+        M (np.array): The symmetrized matrix of pairwise costs.
+        _lambda (float): The penalty weight. Defaults to `default_lambda(M)`.
+        dense (bool): Build the dense QUBO matrix first instead of the sparse model.
+        template_cache (str): Directory of the on-disk template store, if any.
+
     Returns:
-        bool: True if the solution matrix is valid, False otherwise.
+        dimod.BinaryQuadraticModel: The QUBO over the (n-1)^2 (city, position) variables.
     """
-    n, _ = X.shape
-    for i in range(n):
-        if np.sum(X[i, :]) != 1:
-            return False
-    return True
+    if _lambda is None:
+        _lambda = default_lambda(M)
+    if dense:
+        return dimod.BinaryQuadraticModel(build_objective_matrix(M, _lambda), dimod.BINARY)
+    return templates.build_bqm("eqats", M, _lambda, template_cache)
 
-def build_solution(sample):
+def build_solution(sample, n):
     """Builds the solution matrix from a QUBO sample.
     
     Converts a binary sample obtained from the QUBO solver into a solution matrix representing 
@@ -117,12 +170,12 @@ def build_solution(sample):
     
     Args:
         sample (list): The binary sample obtained from the QUBO solver.
+        n (int): The number of cities.
     
     Returns:
         np.array: The solution matrix of size n*n 
         where each 'X[i][j]=1' indicates city i is visited at time j.
     """
-    n, _ = M.shape
     m = len(sample)
     assert m == int((n - 1) * (n - 1))
     X = np.zeros((n, n))
@@ -134,121 +187,309 @@ def build_solution(sample):
             k += 1
     return X
 
-def score(M, X):
-    """Calculates the total cost and path of a given solution.
+def best_solution(sampleset, M):
+    """Finds the lowest-energy valid solution of a sampleset.
+
+    All reads are decoded at once by `decode_eqats`; the solution matrix is only built for the
+    read that is returned.
 
     Args:
-        M (np.array): The matrix of pairwise costs.
-        X (np.array): The binary matrix representing the solution path.
+        sampleset (dimod.SampleSet): The samples returned by the solver.
+        M (np.array): The symmetrized matrix of pairwise costs.
 
     Returns:
-        tuple: Total cost and the path as a list of nodes.
+        SolveResult: The best valid solution, or an empty result if no read is valid.
     """
     n, _ = M.shape
-    cost = 0
-    path = []
+    samples = sample_matrix(sampleset, range((n - 1) * (n - 1)))
+    feasible, tours, costs = decode_eqats(samples, M)
+    energies = sampleset.record.energy
+    order = np.argsort(energies, kind='stable')
+    valid = order[feasible[order]]
+    if valid.size == 0:
+        return SolveResult(problem_id=sampleset.info.get('problem_id'), sampleset=sampleset)
 
-    # Find the first node in the path (assuming the path starts from node 0)
-    current_node = 0
+    k = valid[0]
+    return read_result(sampleset, k, M, costs[k], tours[k].tolist())
 
-    for j in range(n):
-        for i in range(n):
-            if not X[i , j]:
-                continue
-            next_node = i
-            path.append(next_node)
-            cost += M[current_node, next_node]
-            current_node = next_node
+def repaired_solution(sampleset, M):
+    """Finds the cheapest tour of a sampleset after repairing the invalid reads.
 
-    # Add the cost to return to the starting node
-    cost += M[current_node, path[0]]
-    path.append(path[0])  # Completing the cycle by returning to the start
+    Invalid reads are turned into tours by `repair_eqats` instead of being discarded; ties in
+    cost are broken by energy.
 
-    return cost, path
+    Args:
+        sampleset (dimod.SampleSet): The samples returned by the solver.
+        M (np.array): The symmetrized matrix of pairwise costs.
 
+    Returns:
+        SolveResult: The cheapest tour over all reads.
+    """
+    n, _ = M.shape
+    samples = sample_matrix(sampleset, range((n - 1) * (n - 1)))
+    tours, costs, repaired = repair_eqats(samples, M)
+    k = np.lexsort((sampleset.record.energy, costs))[0]
+    result = read_result(sampleset, k, M, costs[k], tours[k].tolist())
+    if repaired[k]:
+        result.repaired = True
+        result.solution = np.zeros((n, n))
+        result.solution[tours[k][:-1], np.arange(n)] = 1
+    return result
+
+def polish_solution(result, M, time_limit):
+    """Improves the tour of a result with local search.
 
-def qbu_solve(best_energy):
+    Args:
+        result (SolveResult): The solution to improve, updated in place.
+        M (np.array): The symmetrized matrix of pairwise costs.
+        time_limit (float): The time budget of `local_search.improve` in seconds.
+    """
+    n, _ = M.shape
+    tour, cost, _ = improve(M, result.path[:-1], time_limit=time_limit)
+    if cost < result.cost:
+        tour = np.roll(tour, -int(np.flatnonzero(tour == 0)[0]))
+        result.cost = cost
+        result.path = tour.tolist() + [0]
+        result.solution = np.zeros((n, n))
+        result.solution[tour, np.arange(n)] = 1
+        result.polished = True
+
+def read_result(sampleset, k, M, cost, path):
+    """Builds the result of one read of a sampleset.
+
+    Args:
+        sampleset (dimod.SampleSet): The samples returned by the solver.
+        k (int): The index of the read in `sampleset.record`.
+        M (np.array): The symmetrized matrix of pairwise costs.
+        cost (float): The cost of the decoded tour.
+        path (list): The decoded tour.
+
+    Returns:
+        SolveResult: The solution of the read.
+    """
+    n, _ = M.shape
+    record = sampleset.record[k]
+    result = SolveResult(cost=cost, path=path, energy=record.energy, problem_id=sampleset.info.get('problem_id'),
+                         sampleset=sampleset)
+    result.sample = dict(zip(sampleset.variables, record.sample))
+    result.solution = build_solution(result.sample, n)
+    if 'chain_break_fraction' in sampleset.record.dtype.names:
+        result.chain_break_fraction = record.chain_break_fraction
+    result.num_occurrences = int(record.num_occurrences)
+    result.chain_stats = sampleset.info.get('chain_stats')
+    return result
+
+def write_solution(out_file, result):
+    """Writes a solution to an output file.
+
+    Args:
+        out_file (str): The path to the output file.
+        result (SolveResult): The solution returned by `solve`.
+    """
+    with open(out_file, 'w') as f:
+        f.write(f"Problem Id: {result.problem_id}\n")
+        f.write(f"Solution:\n{result.solution}\n")
+        f.write(f"Score: {result.cost}\n")
+        f.write(f"{result.sample}\n")
+        f.write(f"Energy: {result.energy}\n")
+        if result.num_occurrences is not None:
+            f.write(f"Num occurrences: {result.num_occurrences}\n")
+        if result.sampleset is not None:
+            reads = int(result.sampleset.record.num_occurrences.sum())
+            f.write(f"Distinct samples: {len(result.sampleset)} of {reads} reads\n")
+        if result.chain_break_fraction is not None:
+            f.write(f"Chain break fraction: {result.chain_break_fraction}\n")
+        if result.chain_stats is not None:
+            stats = result.chain_stats
+            f.write(f"Chain strength: {stats.chain_strength:g}\n")
+            f.write(f"Chain break rate: {stats.mean:.4f}\n")
+            f.write(f"Most broken chains: {', '.join(f'{v}={rate:.3f}' for v, rate in stats.worst()) or 'none'}\n")
+            if len(stats.history) > 1:
+                f.write(f"Chain strength tuning: {', '.join(f'{c:g}->{rate:.3f}' for c, rate in stats.history)}\n")
+        if result.repaired:
+            f.write("Repaired: True\n")
+        if result.polished:
+            f.write("Polished: True\n")
+        if result.sweep is not None:
+            f.write(f"Lambda: {result.sweep.best_penalty}\n")
+            f.write(f"Lambda sweep ({result.sweep.total_reads} reads):\n")
+            for step in result.sweep.steps:
+                f.write(f"  lambda={step.penalty:g} reads={step.num_reads} "
+                        f"feasible={step.feasible_fraction:.3f} best={step.best_cost}\n")
+
+@functools.lru_cache(maxsize=None)
+def get_sampler(name):
+    """Creates a sampler by name, reusing it for later calls in the same process.
+
+    Args:
+        name (str): One of "hybrid", "qpu", "local" or "mock".
+
+    Returns:
+        dimod.Sampler: The sampler.
+    """
+    if name == "hybrid":
+        return LeapHybridSampler()
+    if name == "qpu":
+        return EmbeddingComposite(DWaveSampler())
+    if name == "local":
+        return BatchedAnnealingSampler()
+    if name == "mock":
+        return mock_qpu_sampler()
+    raise ValueError(f"Unknown sampler: {name}")
+
+def qbu_solve(bqm, sampler=None, num_reads=1000, inspect=False):
     """Solves the QUBO problem using D-Wave's quantum annealer.
     
-    Uses D-Wave's quantum annealing solver to sample solutions from the QUBO problem, 
-    evaluates their validity, and updates the best solution found so far. The result is 
-    written to an output file if a better solution is found.
+    Uses D-Wave's quantum annealing solver (or any sampler taking `num_reads`) to sample
+    solutions from the QUBO problem.
     
     Args:
-        best_energy (float): The best energy (cost) found so far.
+        bqm (dimod.BinaryQuadraticModel): The QUBO to solve.
+        sampler (dimod.Sampler): A sampler taking `num_reads`. Defaults to the QPU.
+        num_reads (int): The number of reads.
+        inspect (bool): Open the problem in the D-Wave inspector.
     
     Returns:
-        float: The updated best energy after solving.
-    """
-    plot_problem(M)
-    sampler = EmbeddingComposite(DWaveSampler())
-    sampleset = sampler.sample_qubo(Q, num_reads=num_samples)
-    dwave.inspector.show(sampleset)
-    problem_id = sampleset.info['problem_id']
-
-    for e in sampleset.data(sorted_by='energy'):
-        sample = e.sample
-        energy = e.energy
-
-        if best_energy <= energy:
-            return best_energy
-
-        X = build_solution(sample)
-        if is_valid_solution(X):
-            best_energy = energy
-            cost, path = score(M, X)
-            plot_solution(M.shape[0], path, M)
-            with open(out_file, 'w') as f:
-                f.write(f"Problem Id: {problem_id}\n")
-                f.write(f"Solution:\n{X}\n")
-                f.write(f"Score: {cost}\n")
-                f.write(f"{sample}\n")
-                f.write(f"Energy: {energy}\n")
-                f.write(f"Chain break fraction: {e.chain_break_fraction}\n")
-            break
-
-    return best_energy
-
-def hybrid_solve(best_energy):
+        dimod.SampleSet: The samples returned by the solver.
+    """
+    if sampler is None:
+        sampler = get_sampler("qpu")
+    sampleset = sampler.sample(bqm, num_reads=num_reads)
+    # Only samplesets returned by the QPU can be opened in the inspector
+    if inspect and sampleset.info.get('problem_id') is not None and not is_mock_sampleset(sampleset):
+        dwave.inspector.show(sampleset)
+    return sampleset
+
+def hybrid_solve(bqm, sampler=None, time_limit=3):
     """Solves the QUBO problem using D-Wave's hybrid quantum-classical solver.
     
-    Uses D-Wave's hybrid quantum-classical solver to sample solutions from the QUBO problem, 
-    evaluates their validity, and updates the best solution found so far. Additionally, plots 
-    the problem and solution, and writes the results to an output file.
-    
     Args:
-        best_energy (float): The best energy (cost) found so far.
+        bqm (dimod.BinaryQuadraticModel): The QUBO to solve.
+        sampler (dimod.Sampler): A sampler taking `time_limit`. Defaults to Leap's hybrid solver.
+        time_limit (float): The time limit of the hybrid solver in seconds.
     
     Returns:
-        float: The updated best energy after solving.
-    """
-    plot_problem(M)
-    sampler = LeapHybridSampler()
-    sampleset = sampler.sample_qubo(Q, time_limit=3)
-    problem_id = sampleset.info['problem_id']
-
-    for e in sampleset.data(sorted_by='energy'):
-        sample = e.sample
-        energy = e.energy
-
-        if best_energy <= energy:
-            return best_energy
-
-        X = build_solution(sample)
-        if is_valid_solution(X):
-            best_energy = energy
-            cost, path = score(M, X)
-            plot_solution(M.shape[0], path, M)
-            with open(out_file, 'w') as f:
-                f.write(f"Problem Id: {problem_id}\n")
-                f.write(f"Solution:\n{X}\n")
-                f.write(f"Score: {cost}\n")
-                f.write(f"{sample}\n")
-                f.write(f"Energy: {energy}\n")
-            break
-
-    return best_energy
-
-best_energy = 1e9
-for _ in range(1):
-    best_energy = hybrid_solve(best_energy)
+        dimod.SampleSet: The samples returned by the solver.
+    """
+    if sampler is None:
+        sampler = get_sampler("hybrid")
+    return sampler.sample(bqm, time_limit=time_limit)
+
+def solve(M, *, sampler="hybrid", num_reads=1000, time_limit=3, _lambda=None, dense=False, template_cache=None,
+          embedding_cache=None, chain_resolution=None, target_chain_break=None, lambda_sweep=False, lambda_schedule=None, repair=False, polish=None, plot=False, inspect=False):
+    """Solves a TSP instance with the EQATS formulation.
+
+    The function keeps no state between calls apart from the sampler cache of `get_sampler`
+    and the QUBO template cache, so it can be called for many problems from the same process.
+
+    Args:
+        M (np.array): The symmetrized matrix of pairwise costs.
+        sampler (str or dimod.Sampler): "hybrid", "qpu", "local", "mock" or a sampler instance.
+            Samplers accepting `time_limit` are run like the hybrid solver, all others get `num_reads`.
+        num_reads (int): The number of reads for annealing samplers.
+        time_limit (float): The time limit for hybrid samplers in seconds.
+        _lambda (float): The penalty weight. Defaults to `default_lambda(M)`.
+        dense (bool): Build the dense QUBO matrix first instead of the sparse model.
+        template_cache (str): Directory of the on-disk QUBO template store, if any.
+        embedding_cache (str): Directory of the on-disk embedding store. If given, an
+            `EmbeddingComposite` sampler is replaced by a `FixedEmbeddingComposite` over the same
+            child with the cached embedding (see `embedding.py`).
+        chain_resolution (str): "majority" or "energy". If given, or if `target_chain_break` is,
+            an `EmbeddingComposite` sampler is replaced by a `chains.ChainResolvingComposite`
+            that unembeds the reads with this method and reports per-chain break statistics.
+        target_chain_break (float): The break rate the chain strength is tuned towards, up or down.
+        lambda_sweep (bool): Try a schedule of penalty weights with `sweep_lambda` instead of a
+            single one, and keep the cheapest tour found.
+        lambda_schedule (list): The penalty weights of the sweep. Defaults to `penalty.default_schedule(M)`.
+        repair (bool): Repair invalid reads with `repair_eqats` and keep the cheapest tour, instead
+            of keeping the lowest-energy valid read.
+        polish (float): If given, improve the tour with Lin-Kernighan and Or-opt moves for up to
+            this many seconds (see `local_search.improve`).
+        plot (bool): Plot the problem and the solution.
+        inspect (bool): Open QPU problems in the D-Wave inspector.
+
+    Returns:
+        SolveResult: The best valid solution found.
+    """
+    if isinstance(sampler, str):
+        sampler = get_sampler(sampler)
+    if embedding_cache and isinstance(sampler, EmbeddingComposite) and not isinstance(sampler, FixedEmbeddingComposite):
+        # The interaction graph only depends on n, so the embedding is found once per target
+        sampler = fixed_embedding_sampler(sampler.child, "eqats", M.shape[0], embedding_cache)
+    if (chain_resolution or target_chain_break is not None) and isinstance(sampler, EmbeddingComposite):
+        if isinstance(sampler, FixedEmbeddingComposite):
+            embedding = sampler.embedding
+        else:
+            embedding = get_embedding("eqats", M.shape[0], sampler.child, embedding_cache)
+        sampler = ChainResolvingComposite(sampler.child, embedding, chain_resolution or "majority", target_chain_break)
+    if plot:
+        plot_problem(M)
+
+    if lambda_sweep:
+        if 'time_limit' in sampler.parameters:
+            parameters = {'time_limit': time_limit}
+        else:
+            parameters = {'num_reads': num_reads}
+        sweep = sweep_lambda("eqats", M, sampler, lambda_schedule, template_cache=template_cache, **parameters)
+        if sweep.sampleset is None:
+            result = SolveResult(sweep=sweep)
+        else:
+            result = read_result(sweep.sampleset, sweep.index, M, sweep.best_cost, sweep.best_tour)
+            result.sweep = sweep
+        if repair and sweep.steps:
+            # The samples of the best step may still hold a cheaper tour once invalid reads are repaired
+            # Without any tour, the samples of the last step are repaired instead
+            sampleset = sweep.sampleset if sweep.sampleset is not None else sweep.last_sampleset
+            repaired = repaired_solution(sampleset, M)
+            if repaired.cost < result.cost:
+                repaired.sweep = sweep
+                result = repaired
+    else:
+        bqm = build_bqm(M, _lambda, dense, template_cache)
+        if 'time_limit' in sampler.parameters:
+            sampleset = hybrid_solve(bqm, sampler, time_limit)
+        else:
+            sampleset = qbu_solve(bqm, sampler, num_reads, inspect)
+        # Identical reads are decoded once; num_occurrences keeps them in the statistics
+        sampleset = aggregate_sampleset(sampleset)
+        result = repaired_solution(sampleset, M) if repair else best_solution(sampleset, M)
+
+    if polish and result.found:
+        polish_solution(result, M, polish)
+
+    if plot and result.found:
+        plot_solution(M.shape[0], result.path, M)
+    return result
+
+def main(in_file, out_file, **options):
+    """Main function to read input, solve the problem, and write the output.
+
+    Args:
+        in_file (str): The path to the input file containing the adjacency matrix.
+        out_file (str): The path to the output file where the solution will be written.
+        **options: Passed on to `solve`.
+    """
+    M = load_problem(in_file)
+    result = solve(M, plot=True, inspect=True, **options)
+    if result.found:
+        write_solution(out_file, result)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a TSP instance with the EQATS QUBO formulation.")
+    parser.add_argument("in_file", help="file containing the pairwise costs as an adjacency matrix")
+    parser.add_argument("out_file", help="file where the solution will be written")
+    parser.add_argument("--dense", action="store_true", help="build the dense QUBO matrix instead of the sparse model")
+    parser.add_argument("--sampler", choices=["hybrid", "qpu", "local", "mock"], default="hybrid", help="sampler backend to use")
+    parser.add_argument("--num-reads", type=int, default=1000, help="number of reads for the qpu and local samplers")
+    parser.add_argument("--template-cache", metavar="DIR", help="directory where QUBO templates are stored and reused")
+    parser.add_argument("--embedding-cache", metavar="DIR", help="directory where QPU embeddings are stored and reused")
+    parser.add_argument("--chain-resolution", choices=["majority", "energy"], help="unembed QPU samples with this method and report per-chain breaks")
+    parser.add_argument("--target-chain-break", type=float, metavar="RATE", help="tune the chain strength up or down until about RATE of the chains break")
+    parser.add_argument("--lambda-sweep", action="store_true", help="try a schedule of penalty weights and keep the best tour")
+    parser.add_argument("--repair", action="store_true", help="repair invalid samples into tours instead of discarding them")
+    parser.add_argument("--polish", type=float, metavar="SECONDS", help="improve the tour with local search for up to SECONDS")
+    args = parser.parse_args()
+    main(args.in_file, args.out_file, sampler=args.sampler, num_reads=args.num_reads, dense=args.dense,
+         template_cache=args.template_cache, embedding_cache=args.embedding_cache,
+         chain_resolution=args.chain_resolution, target_chain_break=args.target_chain_break,
+         lambda_sweep=args.lambda_sweep, repair=args.repair, polish=args.polish)
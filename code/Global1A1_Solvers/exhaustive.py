@@ -0,0 +1,477 @@
+#!/usr/bin/env python
+"""This module enumerates and scores all TSP tours in large NumPy blocks.
+
+It reproduces the enumeration of `brute-force-solver.py`: the permutations p of the cities
+0..n-2 in `itertools.permutations` order, keeping those with p[0] <= p[-1] (the reverse of each
+tour is skipped) and appending city n-1, so the k-th tour here is the k-th tour there. Instead
+of one Python iteration per tour, the permutations are built block by block as an int array:
+every permutation of the first n-1-s cities (the prefix) is combined with a table of all
+permutations of the remaining s cities (the suffix), which keeps the lexicographic order. Each
+block is scored with fancy-indexed edge gathers and a row sum, and the best score, the second
+best score and the ties are kept with array reductions.
+
+The prefix of each block is found by unranking its index (Lehmer code), so any range of blocks
+can be scored on its own. `brute_force_parallel` splits the blocks into shards, scores them on a
+process pool and merges the shard results; with a shard directory, every finished shard is saved
+as an `.npz` file and skipped when the run is resumed.
+
+The scores of all tours can be kept in a score log: a `.npy` file holding one score per tour,
+indexed by the enumeration index k and written a whole block at a time through a memory map.
+It is int32 for integer costs (float64 otherwise), a fraction of the size of the "k score" text
+lines, and the shards of a parallel run write their ranges of it directly.
+
+The functions can be used as follows:
+1. `permutation_blocks(m)` - Yields all permutations of m elements in lexicographic order, in blocks.
+2. `ring_costs(W, rings)` - Computes the cost of a block of tours.
+3. `brute_force(M, on_block=None)` - Scores all tours and returns the best ones.
+4. `brute_force_parallel(M, workers=None, shard_dir=None)` - The same, sharded over processes.
+5. `open_score_log(path, n, dtype)` - Creates the score log of all tours.
+6. `export_scores(log, f)` - Writes a score log as "k score" text lines.
+
+Example usage:
+    result = brute_force(M)
+    print(result.best_score, len(result.solutions))
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import glob
+import itertools
+import math
+import os
+import warnings
+import numpy as np
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+# Number of cities permuted inside a block, i.e. blocks hold up to 8! = 40320 permutations
+SUFFIX_LENGTH = 8
+
+# Number of shards of a parallel run. It does not depend on the number of workers, so a run
+# can be resumed from its shard directory with a different number of workers.
+DEFAULT_SHARDS = 256
+
+@dataclass
+class ExhaustiveResult:
+    """The outcome of an exhaustive search.
+
+    Attributes:
+        best_score (float): The lowest tour cost.
+        second_best_score (float): The lowest tour cost above the best one, np.inf if there is none.
+        solutions (list): The tours with the best score, each as an array of the n cities in
+            visiting order, in enumeration order.
+        ranks (list): The enumeration index k of each of the solutions.
+        count (int): The number of tours scored.
+    """
+    best_score: float = np.inf
+    second_best_score: float = np.inf
+    solutions: list = field(default_factory=list)
+    ranks: list = field(default_factory=list)
+    count: int = 0
+
+    def update(self, start, rings, scores):
+        """Merges a block of scored tours into the result.
+
+        Args:
+            start (int): The enumeration index of the first tour of the block.
+            rings (np.array): The (tours x n) block of tours.
+            scores (np.array): The cost of each tour.
+        """
+        self.count += scores.size
+        if scores.size == 0:
+            return
+        block_best = scores.min()
+        best = min(self.best_score, block_best)
+        # The second best score is the lowest score above the best one, wherever it was seen
+        above = scores[scores > best]
+        candidates = [self.second_best_score, above.min() if above.size else np.inf]
+        if self.best_score > best:
+            candidates.append(self.best_score)
+            self.solutions, self.ranks = [], []
+        self.best_score = best
+        self.second_best_score = min(candidates)
+        if block_best == best:
+            ties = np.flatnonzero(scores == best)
+            self.solutions.extend(rings[ties])
+            self.ranks.extend((start + ties).tolist())
+
+    def merge(self, other):
+        """Merges the result of the tours that follow these ones, e.g. of the next shard.
+
+        Args:
+            other (ExhaustiveResult): The result to merge.
+        """
+        best = min(self.best_score, other.best_score)
+        candidates = [self.second_best_score, other.second_best_score]
+        if self.best_score > best:
+            candidates.append(self.best_score)
+            self.solutions, self.ranks = [], []
+        if other.best_score > best:
+            candidates.append(other.best_score)
+        else:
+            self.solutions.extend(other.solutions)
+            self.ranks.extend(other.ranks)
+        self.best_score = best
+        self.second_best_score = min(candidates)
+        self.count += other.count
+
+def save_result(path, result):
+    """Saves a result to a `.npz` file.
+
+    Args:
+        path (str): The path of the file.
+        result (ExhaustiveResult): The result to save.
+    """
+    np.savez(path, best_score=result.best_score, second_best_score=result.second_best_score,
+             solutions=np.array(result.solutions, dtype=np.intp), ranks=np.array(result.ranks, dtype=np.int64),
+             count=result.count)
+
+def load_result(path):
+    """Loads a result from a `.npz` file.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        ExhaustiveResult: The loaded result.
+    """
+    with np.load(path) as data:
+        return ExhaustiveResult(float(data["best_score"]), float(data["second_best_score"]),
+                                list(data["solutions"]), data["ranks"].tolist(), int(data["count"]))
+
+def unrank_permutation(rank, m, length=None):
+    """Finds the permutation at a given rank in lexicographic order.
+
+    The rank is decoded as a Lehmer code: each digit picks one of the elements not used yet.
+
+    Args:
+        rank (int): The rank, between 0 and `math.perm(m, length) - 1`.
+        m (int): The number of elements.
+        length (int): The length of the permutation, m by default. Shorter permutations are
+            ranked like `itertools.permutations(range(m), length)`.
+
+    Returns:
+        list: The permutation.
+    """
+    if length is None:
+        length = m
+    remaining = list(range(m))
+    permutation = []
+    for i in range(length):
+        digit, rank = divmod(rank, math.perm(m - i - 1, length - i - 1))
+        permutation.append(remaining.pop(digit))
+    return permutation
+
+def suffix_table(s):
+    """Lists all permutations of s elements in lexicographic order.
+
+    Args:
+        s (int): The number of elements.
+
+    Returns:
+        np.array: A (s! x s) array of permutations.
+    """
+    return np.array(list(itertools.permutations(range(s))), dtype=np.intp).reshape(-1, s)
+
+def num_blocks(m, suffix=SUFFIX_LENGTH):
+    """Returns the number of blocks of `permutation_blocks(m, suffix)`.
+
+    Args:
+        m (int): The number of elements.
+        suffix (int): The number of elements permuted inside each block.
+
+    Returns:
+        int: The number of prefixes of the blocks.
+    """
+    return math.perm(m, m - min(suffix, m))
+
+def permutation_blocks(m, suffix=SUFFIX_LENGTH, start=0, stop=None):
+    """Yields all permutations of m elements in the order of `itertools.permutations(range(m))`.
+
+    Args:
+        m (int): The number of elements.
+        suffix (int): The number of elements permuted inside each block.
+        start (int): The index of the first block.
+        stop (int): The index after the last block, `num_blocks(m, suffix)` by default.
+
+    Yields:
+        np.array: A (s! x m) block of permutations, where s = min(suffix, m). The same array is
+        reused for every block.
+    """
+    s = min(suffix, m)
+    table = suffix_table(s)
+    block = np.empty((table.shape[0], m), dtype=np.intp)
+    if stop is None:
+        stop = num_blocks(m, suffix)
+    for b in range(start, stop):
+        prefix = unrank_permutation(b, m, m - s)
+        remaining = np.setdiff1d(np.arange(m), prefix)
+        block[:, :m - s] = prefix
+        block[:, m - s:] = remaining[table]
+        yield block
+
+def block_counts(n, suffix=SUFFIX_LENGTH):
+    """Counts the tours kept in each block of `ring_blocks(n, suffix)`.
+
+    A permutation of a block is kept if its first element is below its last one. The first
+    element is fixed by the prefix, and the last one is each remaining element equally often.
+
+    Args:
+        n (int): The number of cities.
+        suffix (int): The number of cities permuted inside each block.
+
+    Returns:
+        np.array: The number of tours of each block.
+    """
+    m = n - 1
+    s = min(suffix, m)
+    if s == m:
+        table = suffix_table(s)
+        return np.array([np.count_nonzero(table[:, 0] <= table[:, -1])])
+    counts = np.empty(num_blocks(m, suffix), dtype=np.int64)
+    for b in range(counts.size):
+        prefix = unrank_permutation(b, m, m - s)
+        first = prefix[0]
+        above = (m - 1 - first) - sum(city > first for city in prefix)
+        counts[b] = above * math.factorial(s - 1)
+    return counts
+
+def ring_blocks(n, suffix=SUFFIX_LENGTH, start=0, stop=None):
+    """Yields the tours enumerated by `brute-force-solver.py`, in blocks.
+
+    Args:
+        n (int): The number of cities.
+        suffix (int): The number of cities permuted inside each block.
+        start (int): The index of the first block.
+        stop (int): The index after the last block.
+
+    Yields:
+        np.array: A (tours x n) block of tours, city n-1 last.
+    """
+    for block in permutation_blocks(n - 1, suffix, start, stop):
+        rings = block[block[:, 0] <= block[:, -1]]
+        yield np.hstack([rings, np.full((rings.shape[0], 1), n - 1)])
+
+def score_lines(start, scores):
+    """Formats scores as the "k score" lines of `brute-force-solver.py`.
+
+    Args:
+        start (int): The enumeration index of the first score.
+        scores (np.array): The scores.
+
+    Returns:
+        str: One line per score.
+    """
+    if scores.size == 0:
+        return ""
+    k = np.arange(start, start + scores.size).astype(str)
+    return '\n'.join(np.char.add(np.char.add(k, ' '), scores.astype(str))) + '\n'
+
+def ring_costs(W, rings):
+    """Computes the cost of closed tours from their edges.
+
+    Args:
+        W (np.array): The symmetric matrix of edge costs.
+        rings (np.array): A (tours x n) block of tours.
+
+    Returns:
+        np.array: The sum of the edge costs of each tour, including the edge back to the start.
+    """
+    return W[rings, np.roll(rings, -1, axis=1)].sum(axis=1)
+
+def brute_force(M, on_block=None, suffix=SUFFIX_LENGTH, start=0, stop=None, first_rank=None):
+    """Scores every tour and keeps the best ones.
+
+    The score of a tour is `np.sum(np.multiply(M, ring(nodes)))` as in `brute-force-solver.py`,
+    i.e. M[u, v] + M[v, u] summed over its edges. The scores are identical for integer costs;
+    for fractional costs they can differ in the last digit since they are summed in another order.
+
+    Args:
+        M (np.array): The matrix of pairwise costs, with at least 3 cities.
+        on_block (callable): Called as `on_block(start, scores)` for every block, e.g. to write
+            the scores; `start` is the enumeration index of the first tour of the block.
+        suffix (int): The number of cities permuted inside each block.
+        start (int): The index of the first block to score.
+        stop (int): The index after the last block to score, all blocks by default.
+        first_rank (int): The enumeration index of the first tour of block `start`. Computed
+            from `block_counts` if not given.
+
+    Returns:
+        ExhaustiveResult: The best and second best scores and all the best tours.
+    """
+    n, _ = M.shape
+    if n < 3:
+        raise ValueError("brute_force needs at least 3 cities")
+    if first_rank is None:
+        first_rank = int(block_counts(n, suffix)[:start].sum()) if start else 0
+    W = M + M.T
+    result = ExhaustiveResult()
+    for rings in ring_blocks(n, suffix, start, stop):
+        rank = first_rank + result.count
+        scores = ring_costs(W, rings)
+        if on_block is not None:
+            on_block(rank, scores)
+        result.update(rank, rings, scores)
+    return result
+
+def num_tours(n):
+    """Returns the number of tours enumerated for n cities, (n-1)!/2 for n >= 3."""
+    return math.factorial(n - 1) // 2
+
+def score_dtype(M):
+    """Chooses the type of the score log for a cost matrix.
+
+    Args:
+        M (np.array): The matrix of pairwise costs.
+
+    Returns:
+        np.dtype: int32 if the costs are integers and no tour can overflow it, else float64.
+    """
+    n, _ = M.shape
+    integral = np.array_equal(M, np.round(M))
+    if integral and 2 * n * np.abs(M).max(initial=0) < np.iinfo(np.int32).max:
+        return np.dtype(np.int32)
+    return np.dtype(np.float64)
+
+def open_score_log(path, n, dtype, resume=False):
+    """Creates the score log of all tours, or opens it to resume a run.
+
+    Args:
+        path (str): The path of the `.npy` file.
+        n (int): The number of cities.
+        dtype (np.dtype): The type of the scores.
+        resume (bool): Whether to open an existing log of the right shape and type instead of
+            creating a new one.
+
+    Returns:
+        np.memmap: The writable score log, indexed by the enumeration index k.
+    """
+    shape = (num_tours(n),)
+    if resume and os.path.exists(path):
+        log = np.load(path, mmap_mode='r+')
+        if log.shape == shape and log.dtype == dtype:
+            return log
+        del log
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+
+def log_scores(log):
+    """Returns an `on_block` callback of `brute_force` that writes the scores to a score log.
+
+    Args:
+        log (np.memmap): The score log.
+
+    Returns:
+        function: The callback.
+    """
+    def on_block(start, scores):
+        log[start:start + scores.size] = scores
+    return on_block
+
+def export_scores(log, f, dtype=None, chunk=1 << 20):
+    """Writes a score log as the "k score" text lines of `brute-force-solver.py`.
+
+    Args:
+        log (np.array): The score log.
+        f (file): The text file to write to.
+        dtype (np.dtype): The type the scores are converted to before formatting, e.g. the type
+            of the cost matrix to reproduce the text written by the loop engine.
+        chunk (int): The number of lines formatted at once.
+    """
+    for start in range(0, log.size, chunk):
+        scores = np.asarray(log[start:start + chunk])
+        f.write(score_lines(start, scores.astype(dtype or scores.dtype)))
+
+def score_shard(M, start, stop, first_rank, suffix=SUFFIX_LENGTH, log_path=None):
+    """Scores one shard of blocks in a worker process.
+
+    Args:
+        M (np.array): The matrix of pairwise costs.
+        start (int): The index of the first block of the shard.
+        stop (int): The index after the last block of the shard.
+        first_rank (int): The enumeration index of the first tour of the shard.
+        suffix (int): The number of cities permuted inside each block.
+        log_path (str): If given, the scores of the shard are written to this score log.
+
+    Returns:
+        ExhaustiveResult: The result of the shard.
+    """
+    if log_path is None:
+        return brute_force(M, suffix=suffix, start=start, stop=stop, first_rank=first_rank)
+    log = np.load(log_path, mmap_mode='r+')
+    result = brute_force(M, log_scores(log), suffix, start, stop, first_rank)
+    log.flush()
+    return result
+
+def brute_force_parallel(M, workers=None, shards=None, shard_dir=None, log_path=None, suffix=SUFFIX_LENGTH):
+    """Scores every tour on a pool of processes and keeps the best ones.
+
+    The blocks are split into contiguous shards. Each shard knows the enumeration index of its
+    first tour from `block_counts`, so the merged result is the same as that of `brute_force`.
+
+    Args:
+        M (np.array): The matrix of pairwise costs, with at least 3 cities.
+        workers (int): The number of processes. Defaults to the number of CPUs.
+        shards (int): The number of shards. Defaults to `DEFAULT_SHARDS`, whatever the number of
+            workers. Capped at the number of blocks.
+        shard_dir (str): If given, each finished shard is saved there and shards already saved
+            are loaded instead of being scored again, so an interrupted run can be resumed.
+            Shards saved with another number of shards cannot be reused; a warning is issued and
+            they are ignored.
+        log_path (str): If given, the scores of all tours are written to this score log. When
+            resuming, the log of the interrupted run must still be there.
+        suffix (int): The number of cities permuted inside each block.
+
+    Returns:
+        ExhaustiveResult: The best and second best scores and all the best tours.
+    """
+    n, _ = M.shape
+    if n < 3:
+        raise ValueError("brute_force_parallel needs at least 3 cities")
+    workers = workers or os.cpu_count()
+    counts = block_counts(n, suffix)
+    ranks = np.concatenate([[0], np.cumsum(counts)])
+    shards = min(shards or DEFAULT_SHARDS, counts.size)
+    bounds = np.linspace(0, counts.size, shards + 1).astype(int)
+    if shard_dir:
+        os.makedirs(shard_dir, exist_ok=True)
+        stale = [path for path in glob.glob(os.path.join(shard_dir, "shard_*.npz"))
+                 if not os.path.basename(path).endswith(f"_of_{shards:05d}.npz")]
+        if stale:
+            warnings.warn(f"{shard_dir} holds {len(stale)} shards saved with another number of shards than "
+                          f"{shards}; they are ignored")
+    if log_path:
+        # Created here once; the workers open it again to write their ranges
+        log = open_score_log(log_path, n, score_dtype(M), resume=bool(shard_dir))
+        log.flush()
+        del log
+
+    def shard_path(i):
+        return os.path.join(shard_dir, f"shard_{i:05d}_of_{shards:05d}.npz")
+
+    results = [None] * shards
+    with ProcessPoolExecutor(workers) as executor:
+        futures = {}
+        for i in range(shards):
+            if shard_dir and os.path.exists(shard_path(i)):
+                results[i] = load_result(shard_path(i))
+                continue
+            future = executor.submit(score_shard, M, int(bounds[i]), int(bounds[i + 1]), int(ranks[bounds[i]]),
+                                     suffix, log_path)
+            futures[future] = i
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            if shard_dir:
+                save_result(shard_path(i), results[i])
+
+    result = ExhaustiveResult()
+    for shard in results:
+        result.merge(shard)
+    return result
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""This program solves the Traveling Salesman Problem (TSP) exactly with the Held-Karp algorithm.
+
+The algorithm is a dynamic program over subsets of cities. For every set S of cities other than
+the start and every city j in S, the table holds the cost of the cheapest path that leaves city 0,
+visits exactly the cities of S and ends in j:
+
+    D[S, j] = min over i in S - {j} of D[S - {j}, i] + M[i, j]
+
+Subsets are encoded as bitmasks and processed one popcount layer at a time, so every layer only
+reads the previous one and each update is a NumPy min-reduction over a block of subsets. The run
+time is O(2^n n^2) instead of the O(n!) of `backtrack.py`. Costs and the table are stored as int32
+(int64 if the costs are too large), and the table can be kept in a memory-mapped file with
+`--memmap`, so n = 22-25 fits on a normal machine. The tour is read back from the table itself.
+
+Like `backtrack.py`, the matrix is symmetrized first and edges with zero cost cannot be used.
+
+The program takes two inputs:
+1. A file containing the pairwise costs as an adjacency matrix.
+2. The output file where the solution (minimum cost and corresponding path) will be written.
+
+The program can be run like this:
+$ python held_karp.py problem.txt solution.txt
+$ python held_karp.py problem.txt solution.txt --memmap /tmp/held_karp.dat
+"""
+
+import argparse
+import os
+import numpy as np
+from backtrack import write_output
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir, Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+# Number of subsets updated per NumPy block, bounding the temporary arrays
+BLOCK_SIZE = 1 << 16
+
+def cost_table(M):
+    """Builds the compact cost table used by the dynamic program.
+
+    Missing edges (zero cost off the diagonal) get a cost that no tour can reach.
+
+    Args:
+        M (np.array): The matrix of pairwise costs.
+
+    Returns:
+        tuple: The cost table and the value used as infinity, both int32 unless the costs are too
+        large for it.
+    """
+    n, _ = M.shape
+    dtype = np.int32
+    if np.abs(M).max(initial=0) * (n + 1) >= np.iinfo(np.int32).max // 4:
+        dtype = np.int64
+    infinity = np.iinfo(dtype).max // 4
+    C = np.asarray(M).astype(dtype)
+    C[(C <= 0) & ~np.eye(n, dtype=bool)] = infinity
+    return C, dtype(infinity)
+
+def subsets_by_size(m):
+    """Groups the bitmasks of all subsets of m elements by their number of elements.
+
+    Args:
+        m (int): The number of elements.
+
+    Returns:
+        list: For each size k from 0 to m, the sorted array of the bitmasks with k bits set.
+    """
+    masks = np.arange(1 << m, dtype=np.int64)
+    sizes = np.bitwise_count(masks)
+    order = np.argsort(sizes, kind='stable')
+    bounds = np.searchsorted(sizes[order], np.arange(m + 2))
+    return [masks[order[bounds[k]:bounds[k + 1]]] for k in range(m + 1)]
+
+def held_karp(M, memmap_path=None):
+    """Solves the Traveling Salesman Problem with the Held-Karp dynamic program.
+
+    Args:
+        M (np.array): The matrix of pairwise costs.
+        memmap_path (str): If given, the table is stored in this file instead of in memory.
+
+    Returns:
+        tuple: The minimum cost and the path corresponding to this cost, starting and ending at
+        city 0. The cost is infinity and the path empty if there is no tour.
+    """
+    n, _ = M.shape
+    if n == 1:
+        return 0, [0, 0]
+    C, infinity = cost_table(M)
+
+    # City j + 1 of the problem is bit j of the masks
+    m = n - 1
+    shape = (1 << m, m)
+    if memmap_path:
+        D = np.memmap(memmap_path, dtype=C.dtype, mode='w+', shape=shape)
+    else:
+        D = np.empty(shape, dtype=C.dtype)
+    bits = np.arange(m)
+    D[0] = D[1 << bits] = infinity
+    D[1 << bits, bits] = C[0, 1:]
+
+    inner = C[1:, 1:]
+    for layer in subsets_by_size(m)[2:]:
+        for start in range(0, layer.size, BLOCK_SIZE):
+            S = layer[start:start + BLOCK_SIZE]
+            # Paths cannot end outside S: those entries stay infinity
+            block = np.full((S.size, m), infinity, dtype=C.dtype)
+            for j in range(m):
+                has_j = (S >> j) & 1 == 1
+                # Cities outside S - {j} hold infinity in the previous layer, so they never win
+                block[has_j, j] = np.minimum((D[S[has_j] ^ (1 << j)] + inner[:, j]).min(axis=1), infinity)
+            D[S] = block
+        if memmap_path:
+            D.flush()
+
+    full = (1 << m) - 1
+    closing = D[full] + C[1:, 0]
+    cost = closing.min()
+    min_cost, path = float('inf'), []
+    if cost < infinity:
+        # Walk back through the table: the previous city is the one that gives the stored value
+        j = int(closing.argmin())
+        S = full
+        path = [j + 1]
+        while S != 1 << j:
+            previous = S ^ (1 << j)
+            i = int(np.flatnonzero(D[previous] + inner[:, j] == D[S, j])[0])
+            path.append(i + 1)
+            S, j = previous, i
+        min_cost, path = int(cost), [0] + path[::-1] + [0]
+
+    if memmap_path:
+        del D
+        os.remove(memmap_path)
+    return min_cost, path
+
+def main(input_file, output_file, memmap_path=None):
+    """Main function to read input, solve the problem, and write the output.
+
+    Args:
+        input_file (str): The path to the input file containing the adjacency matrix.
+        output_file (str): The path to the output file where the solution will be written.
+        memmap_path (str): The file backing the table, or None to keep it in memory.
+    """
+    M = np.loadtxt(input_file, dtype=np.int64)
+    min_cost, best_path = held_karp(M + M.T, memmap_path)
+    write_output(output_file, min_cost, best_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a TSP instance exactly with the Held-Karp algorithm.")
+    parser.add_argument("input_file", help="file containing the pairwise costs as an adjacency matrix")
+    parser.add_argument("output_file", help="file where the solution will be written")
+    parser.add_argument("--memmap", metavar="FILE", help="keep the dynamic programming table in this file")
+    args = parser.parse_args()
+    main(args.input_file, args.output_file, args.memmap)
@@ -0,0 +1,497 @@
+#!/usr/bin/env python
+"""This module improves TSP tours with local search.
+
+Tours are kept as arrays of cities (the start city is not repeated at the end) and the costs as
+a symmetric matrix D, e.g. D = M + M^T for the Jain solvers. A 2-opt move removes the edges
+(a, b) and (c, d) and reconnects the tour as (a, c) and (b, d) by reversing the segment from b
+to c; its gain only depends on these four edges, so evaluating a move is O(1).
+
+The functions can be used as follows:
+1. `tour_cost(D, tour)` - Computes the cost of a closed tour.
+2. `two_opt(D, tour=None, strategy="first")` - Improves a tour with 2-opt moves until none is left.
+3. `two_opt_matrix(D, tour=None)` - The same with the gains of all moves computed at once by NumPy.
+4. `neighbour_lists(D, k)` - Returns the k nearest neighbours of every city.
+5. `two_opt_neighbours(D, tour=None, k=8)` - 2-opt restricted to neighbour lists, with don't-look bits.
+6. `or_opt(D, tour=None)` - Moves segments of up to three cities to a better place in the tour.
+7. `lin_kernighan(D, tour=None)` - Lin-Kernighan style variable-depth chains of 2-opt moves.
+8. `improve(D, tour=None, time_limit=1.0)` - Alternates the two above within a time budget.
+
+Example usage:
+    tour, cost, moves = two_opt(M + M.T)
+    tour, cost, moves = improve(M + M.T, tour, time_limit=0.5)
+"""
+
+from collections import deque
+import time
+import numpy as np
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+# Gains smaller than this are treated as zero, so float rounding cannot cause endless moves
+EPSILON = 1e-9
+
+# Number of candidate neighbours per city used by default
+DEFAULT_NEIGHBOURS = 8
+
+# Number of 2-opt moves a Lin-Kernighan chain may make before it is closed
+DEFAULT_DEPTH = 6
+
+def tour_cost(D, tour):
+    """Computes the cost of a closed tour.
+
+    Args:
+        D (np.array): The matrix of pairwise costs.
+        tour (iterable): The cities in visiting order, without returning to the start.
+
+    Returns:
+        float: The sum of the costs of consecutive cities, including the edge back to the start.
+    """
+    tour = np.asarray(tour)
+    return D[tour, np.roll(tour, -1)].sum()
+
+def two_opt(D, tour=None, strategy="first", nearest=None):
+    """Improves a tour with 2-opt moves until no move lowers its cost.
+
+    With the "first" strategy every improving move is applied as soon as it is found and the scan
+    goes on from the same position; with the "best" strategy each scan over all pairs of edges
+    applies only the move with the largest gain. The "matrix" strategy is best improvement with
+    the scan done by `two_opt_matrix`, and "neighbours" runs `two_opt_neighbours`.
+
+    Args:
+        D (np.array): The symmetric matrix of pairwise costs.
+        tour (iterable): The starting tour. Defaults to visiting the cities in index order.
+        strategy (str): "first", "best", "matrix" or "neighbours".
+        nearest (np.array): The result of `neighbour_lists(D, k)` for the "neighbours" strategy,
+            if already computed.
+
+    Returns:
+        tuple: The improved tour as an array, its cost and the number of moves applied.
+    """
+    if strategy == "matrix":
+        return two_opt_matrix(D, tour)
+    if strategy == "neighbours":
+        return two_opt_neighbours(D, tour, nearest=nearest)
+    if strategy not in ("first", "best"):
+        raise ValueError(f"Unknown strategy: {strategy}")
+    n = len(D)
+    t = list(range(n)) if tour is None else [int(city) for city in tour]
+    if n < 4:
+        return np.array(t), tour_cost(D, t), 0
+
+    d = np.asarray(D, dtype=float).tolist()
+    moves = 0
+    improved = True
+    while improved:
+        improved = False
+        best_gain, best_move = EPSILON, None
+        for i in range(n - 2):
+            a, b = t[i], t[i + 1]
+            row_a, row_b = d[a], d[b]
+            removed = row_a[b]
+            # Edge i and edge n-1 share city t[0] when i is 0
+            for j in range(i + 2, n if i else n - 1):
+                c = t[j]
+                e = t[j + 1] if j + 1 < n else t[0]
+                gain = removed + d[c][e] - row_a[c] - row_b[e]
+                if gain <= best_gain:
+                    continue
+                if strategy == "best":
+                    best_gain, best_move = gain, (i, j)
+                    continue
+                t[i + 1:j + 1] = t[j:i:-1]
+                moves += 1
+                improved = True
+                b = t[i + 1]
+                row_b = d[b]
+                removed = row_a[b]
+        if best_move is not None:
+            i, j = best_move
+            t[i + 1:j + 1] = t[j:i:-1]
+            moves += 1
+            improved = True
+
+    return np.array(t), tour_cost(D, t), moves
+
+def two_opt_matrix(D, tour=None):
+    """Improves a tour with best-improvement 2-opt, scoring all moves with one NumPy expression.
+
+    The costs are kept permuted into tour order, P[i, j] = D[t[i], t[j]] with the start city
+    repeated at the end, so the gain of removing edges i and j is
+    P[i, i+1] + P[j, j+1] - P[i, j] - P[i+1, j+1] for every pair at once. The best move is found
+    with `argmax` and applied by reversing the segment in the tour and in the rows and columns
+    of P, so the matrix never has to be gathered again.
+
+    Args:
+        D (np.array): The symmetric matrix of pairwise costs.
+        tour (iterable): The starting tour. Defaults to visiting the cities in index order.
+
+    Returns:
+        tuple: The improved tour as an array, its cost and the number of moves applied.
+    """
+    n = len(D)
+    t = np.arange(n) if tour is None else np.array(tour, dtype=int)
+    if n < 4:
+        return t, tour_cost(D, t), 0
+
+    closed = np.append(t, t[0])
+    P = np.asarray(D, dtype=float)[np.ix_(closed, closed)]
+    # Moves that remove two edges sharing a city are not valid
+    valid = np.triu(np.ones((n, n), dtype=bool), 2)
+    valid[0, n - 1] = False
+
+    moves = 0
+    while True:
+        edges = np.diagonal(P, 1)
+        gains = edges[:, None] + edges[None, :] - P[:n, :n] - P[1:, 1:]
+        best = np.argmax(np.where(valid, gains, -np.inf))
+        i, j = divmod(int(best), n)
+        if gains[i, j] <= EPSILON:
+            break
+        segment = slice(i + 1, j + 1)
+        reverse = slice(j, i, -1)
+        t[segment] = t[reverse].copy()
+        P[segment] = P[reverse].copy()
+        P[:, segment] = P[:, reverse].copy()
+        moves += 1
+
+    return t, tour_cost(D, t), moves
+
+def neighbour_lists(D, k):
+    """Finds the k nearest neighbours of every city.
+
+    The lists only depend on the problem, so callers that search the same problem several times
+    compute them once and pass them to the searches as `nearest`.
+
+    Args:
+        D (np.array): The matrix of pairwise costs.
+        k (int): The number of neighbours per city.
+
+    Returns:
+        np.array: A (n x k) array, row i holding the neighbours of city i from nearest to farthest.
+    """
+    n = len(D)
+    k = min(k, n - 1)
+    costs = np.array(D, dtype=float)
+    np.fill_diagonal(costs, np.inf)
+    nearest = np.argpartition(costs, k - 1, axis=1)[:, :k] if k > 0 else np.empty((n, 0), dtype=int)
+    order = np.argsort(np.take_along_axis(costs, nearest, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(nearest, order, axis=1)
+
+def reverse_segment(t, position, start, end):
+    """Reverses the cities at positions start to end of a tour, wrapping around its end.
+
+    The shorter of the segment and the rest of the tour is reversed: both give the same cycle.
+
+    Args:
+        t (list): The tour, modified in place.
+        position (list): The position of every city in the tour, kept up to date.
+        start (int): The position of the first city of the segment.
+        end (int): The position of the last city of the segment.
+    """
+    n = len(t)
+    length = (end - start) % n + 1
+    if 2 * length > n:
+        start, end = (end + 1) % n, (start - 1) % n
+        length = n - length
+    for _ in range(length // 2):
+        a, b = t[start], t[end]
+        t[start], t[end] = b, a
+        position[b], position[a] = start, end
+        start = start + 1 if start + 1 < n else 0
+        end = end - 1 if end > 0 else n - 1
+
+def two_opt_neighbours(D, tour=None, k=DEFAULT_NEIGHBOURS, nearest=None):
+    """Improves a tour with 2-opt moves between each city and its nearest neighbours.
+
+    A move that adds the edge (a, c) can only pay off if that edge is cheaper than one of the
+    edges it replaces at a, so only the k nearest neighbours of a are tried, nearest first.
+    Each city has a don't-look bit: cities are taken from a queue, and a city that yields no
+    improving move leaves it until a move changes one of its edges. A pass then costs about
+    O(n k) instead of O(n^2).
+
+    Args:
+        D (np.array): The symmetric matrix of pairwise costs.
+        tour (iterable): The starting tour. Defaults to visiting the cities in index order.
+        k (int): The number of neighbours tried per city.
+        nearest (np.array): The result of `neighbour_lists(D, k)`, if already computed.
+
+    Returns:
+        tuple: The improved tour as an array, its cost and the number of moves applied.
+    """
+    n = len(D)
+    t = list(range(n)) if tour is None else [int(city) for city in tour]
+    if n < 4:
+        return np.array(t), tour_cost(D, t), 0
+
+    D = np.asarray(D, dtype=float)
+    if nearest is None:
+        nearest = neighbour_lists(D, k)
+    neighbours = nearest.tolist()
+    near_costs = np.take_along_axis(D, nearest, axis=1).tolist()
+    # Only O(n k) costs are looked at, so D is not converted to lists
+    cost = D.item
+    position = [0] * n
+    for i, city in enumerate(t):
+        position[city] = i
+
+    queue = deque(t)
+    active = [True] * n
+    moves = 0
+    while queue:
+        a = queue.popleft()
+        active[a] = False
+        i = position[a]
+        improved = False
+        # Replace the edge to the successor of a, then the edge to its predecessor
+        for step in (1, -1):
+            b = t[(i + step) % n]
+            ab = cost(a, b)
+            for c, ac in zip(neighbours[a], near_costs[a]):
+                if ac >= ab:
+                    break
+                j = position[c]
+                e = t[(j + step) % n]
+                if c == b or e == a:
+                    continue
+                gain = ab + cost(c, e) - ac - cost(b, e)
+                if gain > EPSILON:
+                    # Remove (a, b) and (c, e), add (a, c) and (b, e)
+                    if step == 1:
+                        reverse_segment(t, position, (i + 1) % n, j)
+                    else:
+                        reverse_segment(t, position, j, (i - 1) % n)
+                    moves += 1
+                    improved = True
+                    for city in (a, b, c, e):
+                        if not active[city]:
+                            active[city] = True
+                            queue.append(city)
+                    break
+            if improved:
+                break
+
+    return np.array(t), tour_cost(D, t), moves
+
+def expired(deadline):
+    """Checks whether a deadline has passed.
+
+    Args:
+        deadline (float): A `time.perf_counter` value, or None for no deadline.
+
+    Returns:
+        bool: True if the deadline has passed.
+    """
+    return deadline is not None and time.perf_counter() > deadline
+
+def or_opt(D, tour=None, k=DEFAULT_NEIGHBOURS, max_segment=3, time_limit=None, nearest=None):
+    """Improves a tour by moving segments of consecutive cities to another place.
+
+    Every segment of 1 to `max_segment` cities is taken out and put back, in either direction,
+    between two adjacent cities next to one of the segment's nearest neighbours, if that makes
+    the tour cheaper. Passes are repeated until no move is left or the time is up.
+
+    Args:
+        D (np.array): The symmetric matrix of pairwise costs.
+        tour (iterable): The starting tour. Defaults to visiting the cities in index order.
+        k (int): The number of neighbours of each end of the segment tried as insertion points.
+        max_segment (int): The longest segment that is moved.
+        time_limit (float): The time budget in seconds, or None to run until no move is left.
+        nearest (np.array): The result of `neighbour_lists(D, k)`, if already computed.
+
+    Returns:
+        tuple: The improved tour as an array, its cost and the number of moves applied.
+    """
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    n = len(D)
+    t = list(range(n)) if tour is None else [int(city) for city in tour]
+    D = np.asarray(D, dtype=float)
+    neighbours = (neighbour_lists(D, k) if nearest is None else nearest).tolist()
+    cost = D.item
+
+    position = {city: p for p, city in enumerate(t)}
+    moves = 0
+    improved = True
+    while improved and not expired(deadline):
+        improved = False
+        for length in range(1, min(max_segment, n - 3) + 1):
+            i = 0
+            while i < n and not expired(deadline):
+                segment = [t[(i + s) % n] for s in range(length)]
+                first, last = segment[0], segment[-1]
+                before, after = t[(i - 1) % n], t[(i + length) % n]
+                removed = cost(before, first) + cost(last, after) - cost(before, after)
+
+                # The cheapest place between two adjacent cities (x, y) of the rest of the tour
+                best_gain, best = EPSILON, None
+                for c in neighbours[first] + neighbours[last]:
+                    if c in segment:
+                        continue
+                    p = position[c]
+                    for x, y in ((c, t[(p + 1) % n]), (t[(p - 1) % n], c)):
+                        if x in segment:
+                            x = before
+                        if y in segment:
+                            y = after
+                        if x == y:
+                            continue
+                        forward = cost(x, first) + cost(last, y)
+                        backward = cost(x, last) + cost(first, y)
+                        gain = removed - min(forward, backward) + cost(x, y)
+                        if gain > best_gain:
+                            best_gain, best = gain, (x, forward > backward)
+
+                if best is None:
+                    i += 1
+                    continue
+                x, reverse = best
+                rest = [city for city in t if city not in segment]
+                p = rest.index(x) + 1
+                rest[p:p] = segment[::-1] if reverse else segment
+                t = rest
+                position = {city: p for p, city in enumerate(t)}
+                moves += 1
+                improved = True
+
+    return np.array(t), tour_cost(D, t), moves
+
+def lin_kernighan(D, tour=None, k=DEFAULT_NEIGHBOURS, max_depth=DEFAULT_DEPTH, time_limit=None, nearest=None):
+    """Improves a tour with Lin-Kernighan style variable-depth moves.
+
+    A move starts by removing an edge (t1, t2). It then repeatedly adds an edge (t2, t3) to one of
+    the nearest neighbours of t2, removes the edge (t3, t4) that keeps the tour closable, and
+    continues from t4, as long as the running gain stays positive and up to `max_depth` steps.
+    Each step is applied as a 2-opt move, so the tour is always valid; afterwards the chain is
+    rolled back to the step where closing the tour gave the largest gain. Cities are processed
+    with don't-look bits as in `two_opt_neighbours`.
+
+    Args:
+        D (np.array): The symmetric matrix of pairwise costs.
+        tour (iterable): The starting tour. Defaults to visiting the cities in index order.
+        k (int): The number of neighbours tried for each added edge.
+        max_depth (int): The maximum number of steps of a chain.
+        time_limit (float): The time budget in seconds, or None to run until no move is left.
+        nearest (np.array): The result of `neighbour_lists(D, k)`, if already computed.
+
+    Returns:
+        tuple: The improved tour as an array, its cost and the number of chain steps kept.
+    """
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    n = len(D)
+    t = list(range(n)) if tour is None else [int(city) for city in tour]
+    if n < 4:
+        return np.array(t), tour_cost(D, t), 0
+
+    D = np.asarray(D, dtype=float)
+    if nearest is None:
+        nearest = neighbour_lists(D, k)
+    neighbours = nearest.tolist()
+    near_costs = np.take_along_axis(D, nearest, axis=1).tolist()
+    cost = D.item
+    position = [0] * n
+    for i, city in enumerate(t):
+        position[city] = i
+
+    def chain(t1, step):
+        """Runs one variable-depth move from t1 and keeps its best prefix.
+
+        Args:
+            t1 (int): The city the move starts from.
+            step (int): 1 to remove the edge to the successor of t1, -1 for its predecessor.
+
+        Returns:
+            tuple: The number of steps kept and the cities whose edges changed.
+        """
+        t2 = t[(position[t1] + step) % n]
+        gain = cost(t1, t2)
+        touched = {t1, t2}
+        applied = []
+        best_gain, best_steps = EPSILON, 0
+        for _ in range(max_depth):
+            best_value, best = -np.inf, None
+            for t3, c23 in zip(neighbours[t2], near_costs[t2]):
+                if gain - c23 <= EPSILON:
+                    break
+                if t3 in touched:
+                    continue
+                t4 = t[(position[t3] - step) % n]
+                if t4 in touched:
+                    continue
+                value = cost(t3, t4) - c23
+                if value > best_value:
+                    best_value, best = value, (t3, t4, c23)
+            if best is None:
+                break
+
+            # Remove (t1, t2) and (t4, t3), add (t2, t3) and (t1, t4)
+            t3, t4, c23 = best
+            i, j = position[t1], position[t4]
+            segment = ((i + 1) % n, j) if step == 1 else (j, (i - 1) % n)
+            reverse_segment(t, position, *segment)
+            applied.append(segment)
+            gain += cost(t3, t4) - c23
+            touched.update((t3, t4))
+            if gain - cost(t4, t1) > best_gain:
+                best_gain, best_steps = gain - cost(t4, t1), len(applied)
+            # The reversal may have flipped the rest of the tour instead of the segment
+            t2 = t4
+            step = 1 if t[(position[t1] + 1) % n] == t2 else -1
+
+        for segment in reversed(applied[best_steps:]):
+            reverse_segment(t, position, *segment)
+        return best_steps, touched
+
+    queue = deque(t)
+    active = [True] * n
+    moves = 0
+    while queue and not expired(deadline):
+        t1 = queue.popleft()
+        active[t1] = False
+        for step in (1, -1):
+            steps, touched = chain(t1, step)
+            if steps:
+                moves += steps
+                for city in touched:
+                    if not active[city]:
+                        active[city] = True
+                        queue.append(city)
+                break
+
+    return np.array(t), tour_cost(D, t), moves
+
+def improve(D, tour=None, time_limit=1.0, k=DEFAULT_NEIGHBOURS, nearest=None):
+    """Improves a tour with Lin-Kernighan and Or-opt moves within a time budget.
+
+    The two searches alternate until neither finds a move or the time is up. This can polish
+    tours decoded from annealer samples as well as build tours from scratch. The cost matrix is
+    converted and its neighbour lists are computed once for all rounds.
+
+    Args:
+        D (np.array): The symmetric matrix of pairwise costs.
+        tour (iterable): The starting tour. Defaults to visiting the cities in index order.
+        time_limit (float): The time budget in seconds.
+        k (int): The number of neighbours per city used by both searches.
+        nearest (np.array): The result of `neighbour_lists(D, k)`, if already computed.
+
+    Returns:
+        tuple: The improved tour as an array, its cost and the number of moves applied.
+    """
+    deadline = time.perf_counter() + time_limit
+    costs = np.asarray(D, dtype=float)
+    if nearest is None:
+        nearest = neighbour_lists(costs, k)
+    t = np.arange(len(D)) if tour is None else np.asarray(tour)
+    moves = 0
+    while True:
+        t, _, lk_moves = lin_kernighan(costs, t, k, time_limit=deadline - time.perf_counter(), nearest=nearest)
+        t, _, or_moves = or_opt(costs, t, k, time_limit=deadline - time.perf_counter(), nearest=nearest)
+        moves += lk_moves + or_moves
+        if or_moves == 0 or expired(deadline):
+            break
+    return t, tour_cost(D, t), moves
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""This module searches for a good penalty weight (lambda) of the TSP QUBO formulations.
+
+The feasibility and the quality of the annealer's samples depend heavily on the penalty weight:
+too small and most reads break the constraints, too large and the cost differences between
+tours drown in the penalty landscape. `sweep_lambda` tries an increasing schedule of penalty
+weights, records the fraction of reads that decode to a tour and the best tour found for each
+one, and stops as soon as the feasible fraction saturates.
+
+The QUBO is split once into its penalty and cost parts (see `qubo.QuboTemplate`); each step of
+the sweep only rescales the penalty values instead of rebuilding the model.
+
+Example usage:
+    result = sweep_lambda("eqats", M, BatchedAnnealingSampler(), num_reads=200)
+    print(result.best_penalty, result.best_cost)
+"""
+
+from dataclasses import dataclass, field
+import numpy as np
+from decode import aggregate_sampleset, decode_eqats, decode_jain, sample_matrix
+from qubo import coo_to_bqm
+import templates
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+DECODERS = {
+    "eqats": decode_eqats,
+    "jain": decode_jain,
+}
+
+# Penalty weights tried by default, relative to the largest absolute cost
+DEFAULT_FACTORS = (0.25, 0.35, 0.5, 0.7, 1.0, 1.4, 2.0, 2.8, 4.0)
+
+@dataclass
+class SweepStep:
+    """The outcome of sampling with one penalty weight.
+
+    Attributes:
+        penalty (float): The penalty weight.
+        num_reads (int): The number of reads taken.
+        feasible_fraction (float): The fraction of reads that decode to a tour.
+        best_cost (float): The cost of the best tour, np.inf if there is none.
+        best_tour (list): The best tour, empty if there is none.
+    """
+    penalty: float
+    num_reads: int
+    feasible_fraction: float
+    best_cost: float = np.inf
+    best_tour: list = field(default_factory=list)
+
+@dataclass
+class SweepResult:
+    """The outcome of a penalty sweep.
+
+    Attributes:
+        steps (list): One `SweepStep` per penalty weight tried, in order.
+        best_penalty (float): The penalty weight that gave the best tour, None if no tour was found.
+        best_cost (float): The cost of the best tour over all steps.
+        best_tour (list): The best tour over all steps.
+        sampleset (dimod.SampleSet): The samples of the step that gave the best tour.
+        index (int): The index of the read of the best tour in `sampleset.record`.
+        last_sampleset (dimod.SampleSet): The samples of the last step, so callers can report or
+            repair them without sampling again when no step found a tour.
+    """
+    steps: list = field(default_factory=list)
+    best_penalty: float = None
+    best_cost: float = np.inf
+    best_tour: list = field(default_factory=list)
+    sampleset: object = None
+    index: int = None
+    last_sampleset: object = None
+
+    @property
+    def total_reads(self):
+        """int: The number of reads taken over all steps."""
+        return sum(step.num_reads for step in self.steps)
+
+def default_schedule(M):
+    """Builds the default schedule of penalty weights for a cost matrix.
+
+    Args:
+        M (np.array): The cost matrix used by the formulation.
+
+    Returns:
+        list: Increasing penalty weights.
+    """
+    return [factor * np.max(np.abs(M)) for factor in DEFAULT_FACTORS]
+
+def sweep_lambda(formulation, M, sampler, schedule=None, saturation=0.9, patience=2, min_fraction=0.1,
+                 template_cache=None, **parameters):
+    """Samples a formulation with increasing penalty weights and keeps the best tour.
+
+    The sweep stops early when the feasible fraction reaches `saturation`, or when neither the
+    feasible fraction nor the best cost improved for `patience` steps once some step had a
+    feasible fraction of at least `min_fraction`. Below that, a tour or two per step is mostly
+    noise, so steps without improvement are not counted and the sweep moves on to larger weights.
+
+    Args:
+        formulation (str): The name of the formulation, "eqats" or "jain".
+        M (np.array): The cost matrix (symmetrized for "eqats").
+        sampler (dimod.Sampler): The sampler to use.
+        schedule (list): The penalty weights to try, in order. Defaults to `default_schedule(M)`.
+        saturation (float): The feasible fraction at which the sweep stops.
+        patience (int): The number of steps without improvement after which the sweep stops.
+        min_fraction (float): The feasible fraction from which steps count toward `patience`.
+        template_cache (str): Directory of the on-disk QUBO template store, if any.
+        **parameters: Passed on to `sampler.sample`, e.g. `num_reads`.
+
+    Returns:
+        SweepResult: The statistics of every step and the best tour found.
+    """
+    if schedule is None:
+        schedule = default_schedule(M)
+    decode = DECODERS[formulation]
+
+    # Split the QUBO once: only the penalty values change from one step to the next
+    n, _ = M.shape
+    template = templates.get_template(formulation, n, template_cache)
+    rows = np.concatenate([template.penalty_rows, template.cost_rows])
+    cols = np.concatenate([template.penalty_cols, template.cost_cols])
+    costs = np.asarray(M, dtype=float).ravel()[template.cost_index]
+
+    result = SweepResult()
+    best_fraction = 0.0
+    stale = 0
+    for penalty in schedule:
+        values = np.concatenate([penalty * template.penalty_values, costs])
+        bqm = coo_to_bqm(template.num_variables, rows, cols, values)
+        # Identical reads are decoded once; num_occurrences keeps them in the statistics
+        sampleset = aggregate_sampleset(sampler.sample(bqm, **parameters))
+
+        samples = sample_matrix(sampleset, range(template.num_variables))
+        _, tours, tour_costs = decode(samples, M)
+        # Jain reads split into subtours pass the degree check but have no tour
+        usable = tours[:, 0] >= 0
+        occurrences = sampleset.record.num_occurrences
+        num_reads = int(occurrences.sum())
+        step = SweepStep(penalty, num_reads, occurrences[usable].sum() / num_reads)
+
+        improved = step.feasible_fraction > best_fraction
+        if usable.any():
+            k = np.flatnonzero(usable)[np.argmin(tour_costs[usable])]
+            step.best_cost = tour_costs[k]
+            step.best_tour = tours[k].tolist()
+            if step.best_cost < result.best_cost:
+                improved = True
+                result.best_penalty = penalty
+                result.best_cost = step.best_cost
+                result.best_tour = step.best_tour
+                result.sampleset = sampleset
+                result.index = k
+        result.steps.append(step)
+        result.last_sampleset = sampleset
+
+        best_fraction = max(best_fraction, step.feasible_fraction)
+        stale = 0 if improved or best_fraction < min_fraction else stale + 1
+        if step.feasible_fraction >= saturation or stale >= patience:
+            break
+
+    return result
@@ -0,0 +1,503 @@
+#!/usr/bin/env python
+"""This module builds the QUBO matrices used by the quantum annealing TSP solvers.
+
+The EQATS formulation fixes city 0 at the first position of the tour and uses one binary
+variable per (city, position) pair for the remaining n-1 cities, which gives m = (n-1)^2 variables.
+Variable i encodes city `i // (n-1) + 1` visited at position `i % (n-1)`.
+
+The Jain formulation uses one binary variable per undirected edge (i, j) with i < j, which gives
+m = n(n-1)/2 variables numbered in row-major order of the upper triangle.
+
+The formulation of `dwave_networkx.traveling_salesperson_qubo` uses one binary variable per
+(city, time) pair, n^2 variables, with variable i encoding city `i // n` at time `i % n`.
+
+Most entries of both QUBO matrices are zero, so the sparse builders return only the nonzero
+couplers as COO arrays (rows, cols, values) with rows <= cols, where entries with rows == cols
+are the linear biases. Their memory grows with the number of couplers instead of m^2.
+
+Both formulations are the sum of a penalty part that depends only on n and a cost part taken
+from the cost matrix. `eqats_template(n)` and `jain_template(n)` build that structure once, and
+`template_coo(template, M, penalty)` fills it for a given cost matrix and penalty weight.
+
+The functions can be used as follows:
+1. `build_eqats_qubo(M, _lambda)` - Builds the QUBO matrix with NumPy block operations.
+2. `build_eqats_qubo_loop(M, _lambda)` - Builds the same matrix with the original Python loops.
+3. `build_eqats_coo(M, _lambda)` / `build_jain_coo(M, lagrange_multiplier)` - Build the nonzero couplers.
+4. `build_eqats_bqm(M, _lambda)` / `build_jain_bqm(M, lagrange_multiplier)` - Build a `dimod.BinaryQuadraticModel`.
+5. `build_jain_constraint(n, sparse=False)` - Builds the degree constraint matrix C of `my-quantum-solver.py`.
+6. `build_dwave_bqm(M, lagrange=None)` - Builds the QUBO of `traveling_salesperson_qubo` straight from the cost matrix.
+"""
+
+from typing import NamedTuple
+import dimod
+import numpy as np
+import scipy.sparse
+
+__author__ = "Murhaf Alawir, Anas Alatasi, Hadi Salloum"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir, Anas Alatasi, Hadi Salloum"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+def build_eqats_qubo_loop(M, _lambda):
+    """Builds the EQATS QUBO matrix using nested Python loops.
+
+    This is the reference implementation the vectorized builder is checked against.
+    It runs in O(n^4) interpreted steps.
+
+    Args:
+        M (np.array): The symmetrized matrix of pairwise costs.
+        _lambda (float): The penalty weight of the one-hot constraints.
+
+    Returns:
+        np.array: The upper triangular QUBO matrix of size m*m.
+    """
+    n, _ = M.shape
+    n = n - 1
+    m = int(n * n)
+    Q = np.zeros((m, m))
+
+    for i in range(m):
+        Q[i, i] = 2 * -_lambda
+        city_i = i // n + 1
+        pos_i = i % n
+
+        if pos_i == 0 or pos_i == n - 1:
+            Q[i, i] += M[city_i, 0]
+
+        k = i + 1
+        while k % n != 0:
+            Q[i, k] = 2 * _lambda
+            if pos_i == 0 or pos_i == n - 1:
+                Q[i, k] += M[city_i, 0]
+            k += 1
+
+    for i in range(m):
+        for j in range(i + 1, m):
+            city_i = i // n + 1
+            pos_i = i % n
+            city_j = j // n + 1
+            pos_j = j % n
+
+            if city_i == city_j:
+                continue
+            elif pos_i == pos_j - 1 or pos_i == pos_j + 1:
+                Q[i, j] = M[city_i, city_j]
+            elif pos_i == pos_j:
+                Q[i, j] = 2 * _lambda
+
+    return Q
+
+def build_eqats_qubo(M, _lambda):
+    """Builds the EQATS QUBO matrix with NumPy block operations.
+
+    The matrix is viewed as a 4D array indexed by (city_i, pos_i, city_j, pos_j), so each group of
+    couplings is written in one assignment: the one-hot penalty between positions of the same city,
+    the one-hot penalty between cities sharing a position, and the edge cost between cities at
+    adjacent positions. The result is identical to `build_eqats_qubo_loop`.
+
+    Args:
+        M (np.array): The symmetrized matrix of pairwise costs.
+        _lambda (float): The penalty weight of the one-hot constraints.
+
+    Returns:
+        np.array: The upper triangular QUBO matrix of size m*m.
+    """
+    n, _ = M.shape
+    n = n - 1
+    M = np.asarray(M, dtype=float)
+    Q = np.zeros((n, n, n, n))
+    cities = np.arange(n)
+    positions = np.arange(n - 1)
+
+    # Cost of the edge between each city and city 0, only paid at the first and last positions
+    home = M[1:, 0]
+    ends = np.zeros(n)
+    ends[0] = ends[n - 1] = 1
+
+    # Different cities: penalty at the same position, edge cost at adjacent positions
+    upper = np.triu(np.ones((n, n)), 1)
+    Q[:, cities, :, cities] = 2 * _lambda * upper
+    Q[:, positions, :, positions + 1] = upper * M[1:, 1:]
+    Q[:, positions + 1, :, positions] = upper * M[1:, 1:]
+
+    # Same city: penalty between later positions plus the (repeated) home edge cost of the endpoints.
+    # Written last because the assignments above also touch the same-city entries.
+    Q[cities, :, cities, :] = (2 * _lambda + np.outer(home, ends)[:, :, None]) * upper
+    Q[cities, :, cities, :] += np.eye(n) * (-2 * _lambda + np.outer(home, ends))[:, :, None]
+
+    return Q.reshape(n * n, n * n)
+
+class QuboTemplate(NamedTuple):
+    """The structure of a QUBO formulation for a given number of cities.
+
+    The QUBO is split into a penalty part, which depends only on n and is scaled by the penalty
+    weight, and a cost part whose values are gathered from the cost matrix. All arrays are COO
+    entries of the upper triangle, with rows == cols for the linear biases.
+
+    Attributes:
+        num_variables (int): The number of binary variables.
+        penalty_rows (np.array): The row index of each penalty entry.
+        penalty_cols (np.array): The column index of each penalty entry.
+        penalty_values (np.array): The value of each penalty entry for a penalty weight of 1.
+        cost_rows (np.array): The row index of each cost entry.
+        cost_cols (np.array): The column index of each cost entry.
+        cost_index (np.array): The flat index into the cost matrix of each cost entry.
+    """
+    num_variables: int
+    penalty_rows: np.ndarray
+    penalty_cols: np.ndarray
+    penalty_values: np.ndarray
+    cost_rows: np.ndarray
+    cost_cols: np.ndarray
+    cost_index: np.ndarray
+
+def eqats_template(n):
+    """Builds the structure of the EQATS QUBO for n cities.
+
+    Only same-city, same-position and adjacent-position pairs are coupled, so the number of
+    entries is O(n^3) instead of the O(n^4) of the dense matrix.
+
+    Args:
+        n (int): The number of cities, including city 0.
+
+    Returns:
+        QuboTemplate: The penalty and cost structure over the (n-1)^2 (city, position) variables.
+    """
+    n = n - 1
+    var = np.arange(n * n).reshape(n, n)
+    a, b = np.triu_indices(n, 1)
+    p = np.arange(n - 1)
+    ends = np.zeros(n, dtype=bool)
+    ends[0] = ends[n - 1] = True
+    # Flat index of M[city, 0] for every city, in a matrix of n+1 columns
+    home = (np.arange(n) + 1) * (n + 1)
+
+    # Penalty: linear biases, same city at two positions, two cities at the same position
+    penalty_rows = np.concatenate([var.ravel(), var[:, a].ravel(), var[a, :].ravel()])
+    penalty_cols = np.concatenate([var.ravel(), var[:, b].ravel(), var[b, :].ravel()])
+    penalty_values = np.concatenate([np.full(n * n, -2.0), np.full(2 * a.size * n, 2.0)])
+
+    # Cost: the home edge on the linear biases of the first and last positions, repeated on the
+    # same-city couplers leaving those positions, and the edge between cities at adjacent positions
+    home_vars = var[:, ends].ravel()
+    leaving = ends[a]
+    home_pair_rows = var[:, a[leaving]].ravel()
+    home_pair_cols = var[:, b[leaving]].ravel()
+    adj_rows = np.concatenate([var[a][:, p], var[a][:, p + 1]], axis=1).ravel()
+    adj_cols = np.concatenate([var[b][:, p + 1], var[b][:, p]], axis=1).ravel()
+
+    cost_rows = np.concatenate([home_vars, home_pair_rows, adj_rows])
+    cost_cols = np.concatenate([home_vars, home_pair_cols, adj_cols])
+    cost_index = np.concatenate([
+        np.repeat(home, ends.sum()),
+        np.repeat(home, leaving.sum()),
+        np.repeat((a + 1) * (n + 1) + b + 1, 2 * (n - 1)),
+    ])
+    return QuboTemplate(n * n, penalty_rows, penalty_cols, penalty_values, cost_rows, cost_cols, cost_index)
+
+def jain_edge_index(n):
+    """Builds the map from a pair of cities to the index of the edge variable between them.
+
+    Args:
+        n (int): The number of cities.
+
+    Returns:
+        np.array: A symmetric n*n matrix whose entry (i, j) is the variable index of edge (i, j).
+            The diagonal is set to -1.
+    """
+    E = np.full((n, n), -1)
+    i, j = np.triu_indices(n, 1)
+    E[i, j] = E[j, i] = np.arange(i.size)
+    return E
+
+def jain_template(n):
+    """Builds the structure of the Jain QUBO for n cities.
+
+    The constraint that every city has exactly two edges puts -6 on each edge and couples each
+    pair of edges sharing a city. The objective puts M[i, j] + M[j, i] on the edge (i, j).
+
+    Args:
+        n (int): The number of cities.
+
+    Returns:
+        QuboTemplate: The penalty and cost structure over the n(n-1)/2 edge variables.
+    """
+    E = jain_edge_index(n)
+    i, j = np.triu_indices(n, 1)
+    edges = E[i, j]
+
+    # For every city, all pairs of other cities it could be connected to
+    others = np.arange(n - 1)[None, :] + (np.arange(n - 1)[None, :] >= np.arange(n)[:, None])
+    a, b = np.triu_indices(n - 1, 1)
+    city = np.arange(n)[:, None]
+    first = E[city, others[:, a]].ravel()
+    second = E[city, others[:, b]].ravel()
+
+    penalty_rows = np.concatenate([edges, np.minimum(first, second)])
+    penalty_cols = np.concatenate([edges, np.maximum(first, second)])
+    penalty_values = np.concatenate([np.full(edges.size, -6.0), np.full(first.size, 2.0)])
+
+    cost_rows = np.concatenate([edges, edges])
+    cost_cols = np.concatenate([edges, edges])
+    cost_index = np.concatenate([i * n + j, j * n + i])
+    return QuboTemplate(edges.size, penalty_rows, penalty_cols, penalty_values, cost_rows, cost_cols, cost_index)
+
+def dwave_template(n):
+    """Builds the structure of the `traveling_salesperson_qubo` formulation for n cities.
+
+    Every city is visited at exactly one time and every time holds exactly one city, which puts
+    -2 on each variable and 2 on each pair of variables sharing a city or a time. The objective
+    couples city u at time t with city v at time t+1 (cyclically) through the cost of u -> v.
+
+    Args:
+        n (int): The number of cities.
+
+    Returns:
+        QuboTemplate: The penalty and cost structure over the n^2 (city, time) variables.
+    """
+    var = np.arange(n * n).reshape(n, n)
+    a, b = np.triu_indices(n, 1)
+    t = np.arange(n)
+    later = (t + 1) % n
+
+    # Penalty: linear biases, same city at two times, two cities at the same time
+    penalty_rows = np.concatenate([var.ravel(), var[:, a].ravel(), var[a, :].ravel()])
+    penalty_cols = np.concatenate([var.ravel(), var[:, b].ravel(), var[b, :].ravel()])
+    penalty_values = np.concatenate([np.full(n * n, -2.0), np.full(2 * a.size * n, 2.0)])
+
+    # Cost: u at t then v at t+1, and v at t then u at t+1, for every pair of cities u < v
+    first = np.concatenate([var[a][:, t], var[b][:, t]]).ravel()
+    second = np.concatenate([var[b][:, later], var[a][:, later]]).ravel()
+    cost_index = np.concatenate([np.repeat(a * n + b, n), np.repeat(b * n + a, n)])
+    return QuboTemplate(n * n, penalty_rows, penalty_cols, penalty_values,
+                        np.minimum(first, second), np.maximum(first, second), cost_index)
+
+FORMULATIONS = {
+    "eqats": eqats_template,
+    "jain": jain_template,
+}
+
+def template_coo(template, M, penalty):
+    """Fills a template with a cost matrix and a penalty weight.
+
+    Args:
+        template (QuboTemplate): The structure of the formulation.
+        M (np.array): The cost matrix the template indexes into.
+        penalty (float): The penalty weight.
+
+    Returns:
+        tuple: The row indices, column indices and values of the upper triangular QUBO.
+    """
+    costs = np.asarray(M, dtype=float).ravel()[template.cost_index]
+    rows = np.concatenate([template.penalty_rows, template.cost_rows])
+    cols = np.concatenate([template.penalty_cols, template.cost_cols])
+    values = np.concatenate([penalty * template.penalty_values, costs])
+    return rows, cols, values
+
+def build_eqats_coo(M, _lambda):
+    """Builds the nonzero entries of the EQATS QUBO matrix as COO arrays.
+
+    Summing the entries into an m*m matrix gives exactly `build_eqats_qubo(M, _lambda)`.
+
+    Args:
+        M (np.array): The symmetrized matrix of pairwise costs.
+        _lambda (float): The penalty weight of the one-hot constraints.
+
+    Returns:
+        tuple: The row indices, column indices and values of the upper triangular QUBO.
+    """
+    n, _ = M.shape
+    return template_coo(eqats_template(n), M, _lambda)
+
+def build_jain_coo(M, lagrange_multiplier):
+    """Builds the nonzero entries of the Jain QUBO matrix as COO arrays.
+
+    Summed into a matrix, the entries give the upper triangular form of
+    `Q + lagrange_multiplier * C` from `my-quantum-solver.py`.
+
+    Args:
+        M (np.array): The matrix of pairwise costs.
+        lagrange_multiplier (float): The penalty weight of the degree constraints.
+
+    Returns:
+        tuple: The row indices, column indices and values of the upper triangular QUBO.
+    """
+    n, _ = M.shape
+    return template_coo(jain_template(n), M, lagrange_multiplier)
+
+def coo_to_bqm(num_variables, rows, cols, values, labels=None):
+    """Builds a binary quadratic model directly from COO arrays.
+
+    Duplicate entries are summed.
+
+    Args:
+        num_variables (int): The number of binary variables, labeled 0 to num_variables - 1.
+        rows (np.array): The row index of each entry.
+        cols (np.array): The column index of each entry.
+        values (np.array): The value of each entry.
+        labels (list): The labels of the variables, if they should not be their indices.
+
+    Returns:
+        dimod.BinaryQuadraticModel: The model with the diagonal entries as linear biases.
+    """
+    on_diag = rows == cols
+    linear = np.bincount(rows[on_diag], weights=values[on_diag], minlength=num_variables)
+    quadratic = (rows[~on_diag], cols[~on_diag], values[~on_diag])
+    return dimod.BinaryQuadraticModel.from_numpy_vectors(linear, quadratic, 0.0, dimod.BINARY, variable_order=labels)
+
+def coo_to_dense(num_variables, rows, cols, values):
+    """Sums COO arrays into a dense matrix.
+
+    Args:
+        num_variables (int): The size of the matrix.
+        rows (np.array): The row index of each entry.
+        cols (np.array): The column index of each entry.
+        values (np.array): The value of each entry.
+
+    Returns:
+        np.array: The num_variables*num_variables matrix.
+    """
+    Q = np.zeros((num_variables, num_variables))
+    np.add.at(Q, (rows, cols), values)
+    return Q
+
+def build_eqats_bqm(M, _lambda):
+    """Builds the EQATS QUBO as a sparse binary quadratic model.
+
+    Args:
+        M (np.array): The symmetrized matrix of pairwise costs.
+        _lambda (float): The penalty weight of the one-hot constraints.
+
+    Returns:
+        dimod.BinaryQuadraticModel: The model over the (n-1)^2 (city, position) variables.
+    """
+    n, _ = M.shape
+    return coo_to_bqm((n - 1) * (n - 1), *build_eqats_coo(M, _lambda))
+
+def build_jain_bqm(M, lagrange_multiplier):
+    """Builds the Jain QUBO as a sparse binary quadratic model.
+
+    Args:
+        M (np.array): The matrix of pairwise costs.
+        lagrange_multiplier (float): The penalty weight of the degree constraints.
+
+    Returns:
+        dimod.BinaryQuadraticModel: The model over the n(n-1)/2 edge variables.
+    """
+    n, _ = M.shape
+    return coo_to_bqm(n * (n - 1) // 2, *build_jain_coo(M, lagrange_multiplier))
+
+def build_jain_constraint_loop(n):
+    """Builds the degree constraint matrix of the Jain formulation using nested Python loops.
+
+    This is the original `build_constraint_matrix` of `my-quantum-solver.py`, kept as the
+    reference implementation. It runs in O(n^3) interpreted steps.
+
+    Args:
+        n (int): The number of cities.
+
+    Returns:
+        np.array: The symmetric constraint matrix of size m*m, m = n(n-1)/2.
+    """
+    def index(i, j):
+        if i > j:
+            i, j = j, i
+        return int(i * n - i * (i + 1) / 2 + j - (i + 1))
+
+    m = int(n * (n - 1) / 2)
+    C = np.zeros((m, m))
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                C[index(i, j), index(i, j)] += -3
+        for a in range(n):
+            for b in range(n):
+                if a == b or a == i or b == i:
+                    continue
+                C[index(i, a), index(i, b)] += 1
+    return C
+
+def build_jain_constraint(n, sparse=False):
+    """Builds the degree constraint matrix of the Jain formulation from `jain_template(n)`.
+
+    Every edge gets -3 from each of its two cities, and every pair of edges sharing a city is
+    coupled with 1 on both sides of the diagonal. The entries are taken from the penalty part of
+    the template (-6 on the diagonal, 2 on the upper triangle), so the result is identical to
+    `build_jain_constraint_loop` without any Python loop.
+
+    Args:
+        n (int): The number of cities.
+        sparse (bool): Whether to return a `scipy.sparse.csr_matrix` instead of a dense array.
+
+    Returns:
+        np.array or scipy.sparse.csr_matrix: The symmetric constraint matrix of size m*m, m = n(n-1)/2.
+    """
+    template = jain_template(n)
+    rows, cols, values = template.penalty_rows, template.penalty_cols, template.penalty_values
+    off_diag = rows != cols
+    # Two edges share at most one city, so no entry appears twice
+    rows, cols = np.concatenate([rows, cols[off_diag]]), np.concatenate([cols, rows[off_diag]])
+    values = np.where(off_diag, values / 2, values)
+    values = np.concatenate([values, values[off_diag]])
+    m = template.num_variables
+    if sparse:
+        return scipy.sparse.csr_matrix((values, (rows, cols)), shape=(m, m))
+    C = np.zeros((m, m))
+    C[rows, cols] = values
+    return C
+
+def dwave_defaults(M):
+    """Computes the default parameters of `traveling_salesperson_qubo` for a cost matrix.
+
+    The graph `nx.from_numpy_array(M)` has an edge for every nonzero entry of the upper triangle
+    (diagonal included). The default Lagrange parameter is the average edge weight times n, and
+    missing edges cost the sum of all edge weights.
+
+    Args:
+        M (np.array): The symmetrized matrix of pairwise costs.
+
+    Returns:
+        tuple: The default Lagrange parameter and the default weight of missing edges.
+    """
+    n, _ = M.shape
+    weights = np.asarray(M, dtype=float)[np.triu_indices(n)]
+    weights = weights[weights != 0]
+    total = weights.sum()
+    lagrange = total * n / weights.size if weights.size > 0 else 2
+    return lagrange, total
+
+def build_dwave_bqm(M, lagrange=None, missing_edge_weight=None):
+    """Builds the QUBO of `dwave_networkx.traveling_salesperson_qubo` straight from the cost matrix.
+
+    The result equals `dimod.BinaryQuadraticModel.from_qubo(traveling_salesperson_qubo(
+    nx.from_numpy_array(M), lagrange, missing_edge_weight=missing_edge_weight))`, without the
+    networkx graph and the dict of tuple-keyed biases.
+
+    Args:
+        M (np.array): The symmetrized matrix of pairwise costs. Zero entries off the diagonal are
+            missing edges.
+        lagrange (float): The penalty weight. Defaults to the value `traveling_salesperson_qubo`
+            would choose.
+        missing_edge_weight (float): The cost of missing edges. Defaults to the sum of all edge
+            weights, as in `traveling_salesperson_qubo`.
+
+    Returns:
+        dimod.BinaryQuadraticModel: The model over the variables (city, time).
+    """
+    n, _ = M.shape
+    if n in (1, 2):
+        raise ValueError("graph must have at least 3 nodes or be empty")
+    default_lagrange, default_missing = dwave_defaults(M)
+    if lagrange is None:
+        lagrange = default_lagrange
+    if missing_edge_weight is None:
+        missing_edge_weight = default_missing
+
+    W = np.asarray(M, dtype=float).copy()
+    W[(W == 0) & ~np.eye(n, dtype=bool)] = missing_edge_weight
+    labels = [(city, t) for city in range(n) for t in range(n)]
+    return coo_to_bqm(n * n, *template_coo(dwave_template(n), W, lagrange), labels)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+"""This module provides local samplers that can stand in for D-Wave's cloud solvers.
+
+`BatchedAnnealingSampler` is a simulated annealer written with NumPy. All `num_reads` replicas
+are kept in one state array and annealed together, so each Metropolis step is a handful of array
+operations instead of a Python loop over reads. Variables are split into colour classes of the
+interaction graph; variables in the same class share no couplers, so a whole class can be updated
+in one step while the local fields of all other variables are updated incrementally.
+
+The sampler follows the `dimod.Sampler` interface and returns a `dimod.SampleSet`, so it can be
+used wherever the solvers use `EmbeddingComposite(DWaveSampler())`, without network access.
+
+`MockQPUSampler` goes one step further and stands in for `DWaveSampler` itself: it is a
+structured sampler whose qubits and couplers are those of a `dwave_networkx` Pegasus graph, so
+problems have to be embedded into it like into the QPU, and it anneals them with
+`BatchedAnnealingSampler`. Wrapped in `EmbeddingComposite`, it exercises the whole QPU path
+offline: embedding, chain strength, unembedding and the `problem_id`, `embedding_context` and
+`chain_break_fraction` fields of the returned sampleset.
+
+Example usage:
+    sampler = BatchedAnnealingSampler()
+    sampleset = sampler.sample_qubo(Q, num_reads=1000, seed=42)
+
+    sampler = mock_qpu_sampler()
+    sampleset = sampler.sample(bqm, num_reads=100, chain_strength=scaled)
+"""
+
+import uuid
+import warnings
+import dimod
+import numpy as np
+from dwave.system import EmbeddingComposite
+from scipy import sparse
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    import dwave_networkx as dnx
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+def color_classes(J):
+    """Splits the variables into classes with no couplers inside a class.
+
+    Uses a greedy colouring that visits the variables in order of decreasing degree.
+
+    Args:
+        J (sparse.csr_matrix): The symmetric matrix of quadratic biases.
+
+    Returns:
+        list: One array of variable indices per colour class.
+    """
+    m = J.shape[0]
+    degree = np.diff(J.indptr)
+    color = np.full(m, -1)
+    for v in np.argsort(-degree, kind='stable'):
+        taken = set(color[J.indices[J.indptr[v]:J.indptr[v + 1]]].tolist())
+        c = 0
+        while c in taken:
+            c += 1
+        color[v] = c
+    return [np.flatnonzero(color == c) for c in range(color.max() + 1)]
+
+def default_beta_range(h, J):
+    """Chooses the inverse temperatures at the start and the end of the anneal.
+
+    The hot end accepts the largest possible uphill move with probability 1/2, and the cold end
+    accepts the smallest nonzero uphill move with probability 1/100.
+
+    Args:
+        h (np.array): The linear biases of the binary model.
+        J (sparse.csr_matrix): The symmetric matrix of quadratic biases.
+
+    Returns:
+        tuple: The initial and the final inverse temperature.
+    """
+    max_field = np.max(np.abs(h) + np.asarray(abs(J).sum(axis=1)).ravel(), initial=0)
+    biases = np.abs(np.concatenate([h, J.data]))
+    biases = biases[biases > 0]
+    if max_field == 0 or biases.size == 0:
+        return 0.1, 1.0
+    return np.log(2) / max_field, np.log(100) / biases.min()
+
+class BatchedAnnealingSampler(dimod.Sampler):
+    """Simulated annealing sampler that anneals all reads at once.
+
+    Example:
+        >>> sampler = BatchedAnnealingSampler()
+        >>> sampleset = sampler.sample_qubo({(0, 0): -1, (0, 1): 2, (1, 1): -1}, num_reads=10)
+    """
+
+    @property
+    def parameters(self):
+        return {'num_reads': [], 'num_sweeps': [], 'beta_range': [], 'seed': []}
+
+    @property
+    def properties(self):
+        return {}
+
+    def sample(self, bqm, num_reads=100, num_sweeps=200, beta_range=None, seed=None, **kwargs):
+        """Samples from a binary quadratic model with simulated annealing.
+
+        Args:
+            bqm (dimod.BinaryQuadraticModel): The model to sample from.
+            num_reads (int): The number of independent reads.
+            num_sweeps (int): The number of sweeps over all variables per read.
+            beta_range (tuple): The initial and the final inverse temperature. If None, it is
+                derived from the biases of the model.
+            seed (int): The seed of the random number generator.
+
+        Returns:
+            dimod.SampleSet: One sample per read, in the vartype of `bqm`.
+        """
+        variables = list(bqm.variables)
+        m = len(variables)
+        binary = bqm.change_vartype(dimod.BINARY, inplace=False)
+        h, (rows, cols, values), _ = binary.to_numpy_vectors(variable_order=variables)
+        J = sparse.csr_matrix(
+            (np.concatenate([values, values]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+            shape=(m, m))
+
+        if beta_range is None:
+            beta_range = default_beta_range(h, J)
+        betas = np.geomspace(beta_range[0], beta_range[1], num_sweeps)
+
+        # Each class updates its own variables and the fields of their neighbours
+        classes = color_classes(J) if m else []
+        couplers = [J[:, c].tocsr() for c in classes]
+
+        # State and local fields are stored variable-major: x[v, r] is variable v of read r.
+        # F[v, r] is the energy change of setting variable v to 1 in read r.
+        rng = np.random.default_rng(seed)
+        x = rng.integers(0, 2, size=(m, num_reads)).astype(float)
+        F = h[:, None] + J @ x
+
+        for beta in betas:
+            for c, Jc in zip(classes, couplers):
+                sign = 1 - 2 * x[c]
+                delta = sign * F[c]
+                flip = delta <= -np.log1p(-rng.random(delta.shape)) / beta
+                change = sign * flip
+                x[c] += change
+                F += Jc @ change
+
+        samples = x.T.astype(np.int8)
+        if bqm.vartype is dimod.SPIN:
+            samples = 2 * samples - 1
+        info = {'beta_range': tuple(float(b) for b in beta_range), 'num_sweeps': num_sweeps}
+        return dimod.SampleSet.from_samples_bqm((samples, variables), bqm, info=info)
+
+# Prefix of the problem ids of `MockQPUSampler`, which no real QPU problem id has
+MOCK_PROBLEM_PREFIX = "mock-"
+
+def is_mock_sampleset(sampleset):
+    """Tells whether a sampleset comes from `MockQPUSampler`, e.g. to skip the D-Wave inspector.
+
+    Args:
+        sampleset (dimod.SampleSet): The samples returned by a sampler.
+
+    Returns:
+        bool: True if the problem id is one of `MockQPUSampler`.
+    """
+    return str(sampleset.info.get('problem_id', '')).startswith(MOCK_PROBLEM_PREFIX)
+
+class MockQPUSampler(dimod.Sampler, dimod.Structured):
+    """Structured sampler with the topology of a Pegasus QPU, annealed locally.
+
+    Only the qubits and couplers of the graph can be used, as on the QPU. Every call gets a fresh
+    `problem_id` starting with `MOCK_PROBLEM_PREFIX`.
+
+    Example:
+        >>> sampler = EmbeddingComposite(MockQPUSampler(6))
+        >>> sampleset = sampler.sample_qubo({(0, 0): -1, (0, 1): 2, (1, 1): -1}, num_reads=10)
+    """
+
+    def __init__(self, size=16, seed=None):
+        """Creates the sampler.
+
+        Args:
+            size (int): The size parameter of the Pegasus graph, 16 for an Advantage QPU.
+            seed (int): The seed of the first call; later calls use the following seeds. Random
+                if None.
+        """
+        graph = dnx.pegasus_graph(size)
+        self._nodelist = sorted(graph.nodes)
+        self._edgelist = sorted((min(u, v), max(u, v)) for u, v in graph.edges)
+        self._properties = {
+            'topology': {'type': 'pegasus', 'shape': [size]},
+            'num_reads_range': [1, 10000],
+            'chip_id': f"mock_pegasus_{size}",
+        }
+        self.annealer = BatchedAnnealingSampler()
+        self.seed = seed
+
+    @property
+    def nodelist(self):
+        return self._nodelist
+
+    @property
+    def edgelist(self):
+        return self._edgelist
+
+    @property
+    def parameters(self):
+        return {'num_reads': [], 'num_sweeps': [], 'seed': [], 'annealing_time': []}
+
+    @property
+    def properties(self):
+        return self._properties
+
+    @dimod.decorators.bqm_structured
+    def sample(self, bqm, num_reads=100, num_sweeps=200, seed=None, **kwargs):
+        """Samples from a binary quadratic model defined on the qubits and couplers of the graph.
+
+        Args:
+            bqm (dimod.BinaryQuadraticModel): The embedded model.
+            num_reads (int): The number of reads.
+            num_sweeps (int): The number of sweeps of the simulated annealer per read.
+            seed (int): The seed of the random number generator. Defaults to the next seed of the
+                sampler.
+            **kwargs: QPU parameters such as `annealing_time`, accepted and ignored.
+
+        Returns:
+            dimod.SampleSet: One sample per read, with a `problem_id` and `timing` in its info.
+        """
+        if seed is None and self.seed is not None:
+            seed = self.seed
+            self.seed += 1
+        sampleset = self.annealer.sample(bqm, num_reads=num_reads, num_sweeps=num_sweeps, seed=seed)
+        sampleset.info.update(problem_id=MOCK_PROBLEM_PREFIX + str(uuid.uuid4()), timing={})
+        return sampleset
+
+def mock_qpu_sampler(size=16, seed=None):
+    """Creates the offline stand-in of `EmbeddingComposite(DWaveSampler())`.
+
+    The embedding context is returned with every sampleset, as the solvers read the chain
+    strength from it.
+
+    Args:
+        size (int): The size parameter of the Pegasus graph.
+        seed (int): The seed of the first call of the sampler.
+
+    Returns:
+        EmbeddingComposite: The composite over a `MockQPUSampler`.
+    """
+    sampler = EmbeddingComposite(MockQPUSampler(size, seed))
+    sampler.return_embedding_default = True
+    return sampler
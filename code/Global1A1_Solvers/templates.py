@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""This module caches the cost-independent structure of the QUBO formulations.
+
+The penalty part of both the EQATS and the Jain QUBO depends only on the number of cities, and
+the positions of the cost entries do too. The templates built by `qubo.py` are kept in memory
+with LRU eviction and can also be stored on disk as `.npz` files keyed by (formulation, n), so
+setting up a solve becomes: load template, gather the costs, scale the penalty.
+
+The functions can be used as follows:
+1. `get_template(formulation, n, cache_dir=None)` - Returns the cached template, building it if needed.
+2. `build_bqm(formulation, M, penalty, cache_dir=None)` - Builds the sparse BQM from the cached template.
+
+Example usage:
+    bqm = build_bqm("eqats", M, _lambda, cache_dir="templates")
+"""
+
+import functools
+import os
+import numpy as np
+from qubo import FORMULATIONS, QuboTemplate, coo_to_bqm, template_coo
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+def template_path(cache_dir, formulation, n):
+    """Returns the path of the on-disk template of a formulation.
+
+    Args:
+        cache_dir (str): The directory holding the templates.
+        formulation (str): The name of the formulation, "eqats" or "jain".
+        n (int): The number of cities.
+
+    Returns:
+        str: The path of the `.npz` file.
+    """
+    return os.path.join(cache_dir, f"{formulation}_n{n}.npz")
+
+def save_template(path, template):
+    """Saves a template to a `.npz` file.
+
+    Args:
+        path (str): The path of the file.
+        template (QuboTemplate): The template to save.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez(path, **template._asdict())
+
+def load_template(path):
+    """Loads a template from a `.npz` file.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        QuboTemplate: The loaded template.
+    """
+    with np.load(path) as data:
+        fields = {name: data[name] for name in QuboTemplate._fields}
+    fields["num_variables"] = int(fields["num_variables"])
+    return QuboTemplate(**fields)
+
+@functools.lru_cache(maxsize=16)
+def get_template(formulation, n, cache_dir=None):
+    """Returns the template of a formulation for n cities.
+
+    Templates are kept in memory for the most recently used (formulation, n, cache_dir) keys.
+    If `cache_dir` is given, templates are read from it when present and written to it otherwise.
+    The arrays of the returned template are read-only because they are shared between calls.
+
+    Args:
+        formulation (str): The name of the formulation, "eqats" or "jain".
+        n (int): The number of cities.
+        cache_dir (str): The directory of the on-disk store, or None to keep templates in memory only.
+
+    Returns:
+        QuboTemplate: The template.
+    """
+    if formulation not in FORMULATIONS:
+        raise ValueError(f"Unknown formulation: {formulation}")
+
+    path = template_path(cache_dir, formulation, n) if cache_dir else None
+    if path and os.path.exists(path):
+        template = load_template(path)
+    else:
+        template = FORMULATIONS[formulation](n)
+        if path:
+            save_template(path, template)
+
+    for array in template[1:]:
+        array.setflags(write=False)
+    return template
+
+def build_bqm(formulation, M, penalty, cache_dir=None):
+    """Builds the sparse QUBO of a formulation from its cached template.
+
+    Args:
+        formulation (str): The name of the formulation, "eqats" or "jain".
+        M (np.array): The cost matrix (symmetrized for "eqats").
+        penalty (float): The penalty weight.
+        cache_dir (str): The directory of the on-disk template store, if any.
+
+    Returns:
+        dimod.BinaryQuadraticModel: The QUBO.
+    """
+    n, _ = M.shape
+    template = get_template(formulation, n, cache_dir)
+    return coo_to_bqm(template.num_variables, *template_coo(template, M, penalty))
@@ -13,13 +13,32 @@ The program takes two inputs:
 
 The program can be run like this:
 $ python 2opt-solver.py problem.txt solution.txt
+
+Use `--method 2opt` for a genuine 2-opt search instead (see `Global1A1_Solvers/local_search.py`):
+segments of the tour are reversed and each move is scored from the four edges it changes,
+so it scales to thousands of cities:
+$ python 2opt-solver.py problem.txt solution.txt --method 2opt --strategy best
+
+`--strategy matrix` computes the gains of all 2-opt moves in one NumPy expression per step,
+which is much faster than `best` for a few hundred to a few thousand cities. `--strategy neighbours`
+only tries moves towards the nearest neighbours of each city and skips cities whose edges did not
+change, for instances with thousands of cities.
+
+`--method lk` runs Lin-Kernighan style variable-depth moves and Or-opt segment moves for up to
+`--time-limit` seconds:
+$ python 2opt-solver.py problem.txt solution.txt --method lk --time-limit 2
 """
 
+import argparse
+import os
 import numpy as np
 import sys
 import time
 import itertools
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Global1A1_Solvers"))
+from local_search import DEFAULT_NEIGHBOURS, improve, neighbour_lists, two_opt
+
 __author__ = "Siddharth Jain"
 __copyright__ = "Copyright 2021, Johnson & Johnson"
 __credits__ = ["Siddharth Jain"]
@@ -72,13 +91,49 @@ def solve(M):
                 break # break out of for loop     
     return best_matrix, best_score, steps
 
-in_file = sys.argv[1]
-out_file = sys.argv[2]
+def solve_2opt(M, strategy="first", D=None, nearest=None):
+    """ solve traveling salesman problem with segment reversals, starting from the same ring as solve.
+        D = M + M.T and its neighbour lists can be passed in when the same problem is solved several times """
+    # the ring uses each edge in both directions, so the cost of an edge is M[u,v] + M[v,u]
+    if D is None:
+        D = M + M.T
+    tour, _, moves = two_opt(D, strategy=strategy, nearest=nearest)
+    X = ring(tour)
+    return X, score(M, X), moves
+
+def solve_lk(M, time_limit=1.0, D=None, nearest=None):
+    """ solve traveling salesman problem with Lin-Kernighan and Or-opt moves, starting from the same ring as solve.
+        D = M + M.T and its neighbour lists can be passed in when the same problem is solved several times """
+    if D is None:
+        D = M + M.T
+    tour, _, moves = improve(D, time_limit=time_limit, nearest=nearest)
+    X = ring(tour)
+    return X, score(M, X), moves
+
+parser = argparse.ArgumentParser(description="Solve a TSP instance with local search.")
+parser.add_argument("in_file", help="file containing the pairwise costs as a matrix")
+parser.add_argument("out_file", help="file where the solution will be written")
+parser.add_argument("--method", choices=["swap", "2opt", "lk"], default="swap", help="local search moves to use")
+parser.add_argument("--strategy", choices=["first", "best", "matrix", "neighbours"], default="first",
+                    help="apply the first or the best improving 2-opt move; matrix finds the best move with NumPy, "
+                         "neighbours only tries moves between nearby cities")
+parser.add_argument("--time-limit", type=float, default=1.0, help="time budget of the lk method in seconds")
+args = parser.parse_args()
+in_file = args.in_file
+out_file = args.out_file
 # the matrix of pairwise costs. this need not be a symmetric matrix but the diagonal entries are ignored
 # and assumed to be zero (don't care)
 M = np.loadtxt(in_file)
 tic = time.perf_counter()
-X, best_score, steps = solve(M)
+# the symmetric costs and their neighbour lists only depend on the problem, so they are computed once
+D = M + M.T
+nearest = neighbour_lists(D, DEFAULT_NEIGHBOURS) if args.method == "lk" or args.strategy == "neighbours" else None
+if args.method == "2opt":
+    X, best_score, steps = solve_2opt(M, args.strategy, D, nearest)
+elif args.method == "lk":
+    X, best_score, steps = solve_lk(M, args.time_limit, D, nearest)
+else:
+    X, best_score, steps = solve(M)
 toc = time.perf_counter()
 
 with open(out_file, 'w') as f:
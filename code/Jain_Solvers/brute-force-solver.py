@@ -11,14 +11,37 @@ The program takes three inputs:
 3. The output file to store the solution found by this method.
 
 The program can be run like this:
+$ python brute-force-solver.py problem.txt scores.npy solution.txt
+
+The costs of the combinations are written as a binary score log: a `.npy` array with the score of
+the k-th combination at index k, int32 for integer costs. It is much smaller and faster to write
+than text, and can be opened without parsing with `np.load(file, mmap_mode='r')`.
+
+If the scores file name does not end in `.npy`, the costs are exported as "k score" text lines
+instead, as earlier versions wrote them. `Utils/line_plot.py` plots both formats:
 $ python brute-force-solver.py problem.txt scores.txt solution.txt
+
+By default the combinations are generated and scored in large NumPy blocks (see
+`Global1A1_Solvers/exhaustive.py`), which gives the same output an order of magnitude faster.
+Use `--engine loop` to score them one at a time as before.
+
+With `--workers N` the blocks are split into shards that are scored by N processes. With
+`--shard-dir DIR` every finished shard is kept in DIR, and running the command again, with any
+number of workers, resumes an interrupted run by skipping the shards already there:
+$ python brute-force-solver.py problem.txt scores.npy solution.txt --workers 4 --shard-dir shards
 """
 
+import argparse
+import os
 import numpy as np
 import sys
 import itertools
+import tempfile
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Global1A1_Solvers"))
+from exhaustive import brute_force, brute_force_parallel, export_scores, log_scores, open_score_log, score_dtype, score_lines
+
 __author__ = "Siddharth Jain"
 __copyright__ = "Copyright 2021, Johnson & Johnson"
 __credits__ = ["Siddharth Jain"]
@@ -51,41 +74,93 @@ def enumerate_all_rings(n):
             nodes.append(n-1)
             yield ring(nodes)
 
-in_file = sys.argv[1]
-out_file1 = sys.argv[2]
-out_file2 = sys.argv[3]
-# the matrix of pairwise costs. this need not be a symmetric matrix but the diagonal entries are ignored
-# and assumed to be zero (don't care)
-M = np.loadtxt(in_file)
-n, _ = M.shape
-k = 0
-best_matrix = np.zeros((n,n))
-best_score = np.inf
-second_best_score = np.inf
-unique_solutions = []
-t0 = time.perf_counter()
-with open(out_file1, 'w') as f:
+def solve_loop(M, record):
+    """ score every combination one at a time, passing each score to record(k, score) """
+    n, _ = M.shape
+    k = 0
+    best_score = np.inf
+    second_best_score = np.inf
+    unique_solutions = []
     for A in enumerate_all_rings(n):
         # multiply will do element-wise multiplication
         # sum will sum over all the elements
         score = np.sum(np.multiply(M, A))
-        f.write("{0} {1}\n".format(k, score))
+        record(k, score)
         k +=1
         if score == best_score:
             unique_solutions.append(A)
         elif score < best_score:
             second_best_score = best_score            
             best_score = score
-            best_matrix = A
             unique_solutions = [A]
         elif score < second_best_score:
             second_best_score = score
-t1 = time.perf_counter()
-with open(out_file2, 'w') as f:
-    f.write("Best score: {0}\n".format(best_score))
-    f.write("Number of distinct solutions: {0}\n".format(len(unique_solutions)))
-    for solution in unique_solutions:
-        f.write("{0}\n".format(solution))
-    f.write("Second best score: {0}\n".format(second_best_score))
-    f.write("Energy difference: {0}\n".format(best_score - second_best_score))
-    f.write(f"Time: {t1-t0:0.4f} s\n")
\ No newline at end of file
+    return best_score, second_best_score, unique_solutions
+
+def write_scores(f):
+    """ returns a callback writing a block of scores as "k score" lines """
+    def on_block(start, scores):
+        f.write(score_lines(start, scores))
+    return on_block
+
+def solve_numpy(M, on_block):
+    """ score the combinations in blocks with NumPy (same order and output as solve_loop) """
+    result = brute_force(M, on_block=on_block)
+    return result.best_score, result.second_best_score, [ring(nodes) for nodes in result.solutions]
+
+def solve_parallel(M, workers, shard_dir, log_path):
+    """ score the combinations in shards on several processes (same output as solve_numpy) """
+    result = brute_force_parallel(M, workers, shard_dir=shard_dir, log_path=log_path)
+    return result.best_score, result.second_best_score, [ring(nodes) for nodes in result.solutions]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a TSP instance by enumerating all tours.")
+    parser.add_argument("in_file", help="file containing the pairwise costs as a matrix")
+    parser.add_argument("out_file1", help="file where the scores of all combinations are written (a binary score log if it ends in .npy)")
+    parser.add_argument("out_file2", help="file where the solution will be written")
+    parser.add_argument("--engine", choices=["numpy", "loop"], default="numpy", help="score the combinations in NumPy blocks or one at a time")
+    parser.add_argument("--workers", type=int, help="score the NumPy blocks in shards on this many processes")
+    parser.add_argument("--shard-dir", help="keep the finished shards in this directory to resume an interrupted --workers run")
+    args = parser.parse_args()
+    in_file = args.in_file
+    out_file1 = args.out_file1
+    out_file2 = args.out_file2
+    # the matrix of pairwise costs. this need not be a symmetric matrix but the diagonal entries are ignored
+    # and assumed to be zero (don't care)
+    M = np.loadtxt(in_file)
+    n, _ = M.shape
+    # the format of the scores follows the name of the file, so existing callers still get text
+    binary_scores = out_file1.endswith('.npy')
+    t0 = time.perf_counter()
+    if args.workers and binary_scores:
+        best_score, second_best_score, unique_solutions = solve_parallel(M, args.workers, args.shard_dir, out_file1)
+    elif args.workers:
+        # the shards write a score log, which is then exported as text
+        with tempfile.TemporaryDirectory() as tmp:
+            log_path = os.path.join(args.shard_dir or tmp, "scores.npy")
+            best_score, second_best_score, unique_solutions = solve_parallel(M, args.workers, args.shard_dir, log_path)
+            with open(out_file1, 'w') as f:
+                export_scores(np.load(log_path, mmap_mode='r'), f, M.dtype)
+    elif binary_scores:
+        log = open_score_log(out_file1, n, score_dtype(M))
+        if args.engine == "numpy":
+            best_score, second_best_score, unique_solutions = solve_numpy(M, log_scores(log))
+        else:
+            best_score, second_best_score, unique_solutions = solve_loop(M, log.__setitem__)
+        log.flush()
+        del log
+    else:
+        with open(out_file1, 'w') as f:
+            if args.engine == "numpy":
+                best_score, second_best_score, unique_solutions = solve_numpy(M, write_scores(f))
+            else:
+                best_score, second_best_score, unique_solutions = solve_loop(M, lambda k, score: f.write("{0} {1}\n".format(k, score)))
+    t1 = time.perf_counter()
+    with open(out_file2, 'w') as f:
+        f.write("Best score: {0}\n".format(best_score))
+        f.write("Number of distinct solutions: {0}\n".format(len(unique_solutions)))
+        for solution in unique_solutions:
+            f.write("{0}\n".format(solution))
+        f.write("Second best score: {0}\n".format(second_best_score))
+        f.write("Energy difference: {0}\n".format(best_score - second_best_score))
+        f.write(f"Time: {t1-t0:0.4f} s\n")
\ No newline at end of file
@@ -9,18 +9,49 @@ The program takes two inputs:
 The program can be run like this:
 $ python my-quantum-solver.py problem.txt solution.txt
 
+By default the QUBO is sent to the sampler as a sparse binary quadratic model built from the
+cached constraint template of `Global1A1_Solvers/templates.py`. Use `--template-cache DIR` to
+keep the templates on disk between runs, or `--dense` to build the full matrices as before.
+
+With `--repair`, samples that do not form a single tour are patched into one (see
+`decode.repair_jain`) and the cheapest tour over all samples is reported.
+
+With `--embedding-cache DIR`, the QUBO is embedded on the QPU with an embedding stored in DIR (see
+`Global1A1_Solvers/embedding.py`) instead of running minorminer on every call.
+
+With `--mock-qpu`, the QPU is replaced by a local sampler with the same Pegasus topology (see
+`samplers.MockQPUSampler`), so the whole embedding and chain-break path runs without Leap:
+$ python my-quantum-solver.py problem.txt solution.txt --mock-qpu
+
+With `--chain-resolution majority|energy`, the samples are unembedded by
+`Global1A1_Solvers/chains.py`, which reports how often each chain breaks, and
+`--target-chain-break RATE` samples again with a stronger or weaker chain coupling until about
+RATE of the chains break.
+
 Prerequisites:
 * You must have the D-Wave Ocean SDK installed with valid dwave.conf file and a D-Wave user account
 """
 
+import argparse
+import os
 import numpy as np
 import sys
+import dimod
 from dwave.embedding.chain_strength import scaled
-from dwave.system.composites import EmbeddingComposite
+from dwave.system.composites import EmbeddingComposite, FixedEmbeddingComposite
 from dwave.system.samplers import DWaveSampler
 import dwave.inspector
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Global1A1_Solvers"))
+from chains import ChainResolvingComposite
+from decode import aggregate_sampleset, decode_jain, repair_jain, sample_matrix
+from embedding import fixed_embedding_sampler, get_embedding
+from penalty import sweep_lambda
+from samplers import MockQPUSampler, is_mock_sampleset
+from qubo import build_jain_constraint
+import templates
+
 __author__ = "Siddharth Jain"
 __copyright__ = "Copyright 2021, Johnson & Johnson"
 __credits__ = ["Siddharth Jain"]
@@ -30,36 +61,12 @@ __maintainer__ = "Siddharth Jain"
 __email__ = "sjain68@its.jnj.com"
 __status__ = "Production"
 
-def index(i, j, n):
-    if i == j:
-        raise ValueError
-    elif i > j:
-        return index(j, i, n)
-    else:
-        return int(i*n - i*(i+1)/2 + j - (i+1))
-
-def build_constraint_matrix(n):
+def build_constraint_matrix(n, sparse=False):
     """
-        The constraint matrix encodes the constraint that each city (node) is connected to exactly two other cities in the output cycle.        
+        The constraint matrix encodes the constraint that each city (node) is connected to exactly two other cities in the output cycle.
+        It is built with NumPy index maps (see `qubo.build_jain_constraint`); pass sparse=True to get a scipy.sparse matrix.
     """
-    m = int(n*(n-1)/2)
-    C = np.zeros((m,m))
-    for i in range(0, n):
-        # diagonal terms of C (these are equal to -6)
-        for j in range(0, n):
-            if i == j:
-                continue
-            k = index(i, j, n)
-            C[k,k] += -3
-        # off diagonal terms (these have a bizzare pattern)
-        for a in range(0, n):
-            for b in range(0, n):
-                if a == b or a == i or b == i:
-                    continue
-                ia = index(i,a,n)
-                ib = index(i,b,n)
-                C[ia,ib] += 1
-    return C
+    return build_jain_constraint(n, sparse)
 
 def build_objective_matrix(M):
     n, _ = M.shape
@@ -76,17 +83,6 @@ def build_objective_matrix(M):
     # diagonal matrix of biases
     return Q
 
-def is_valid_solution(X):
-    rows, cols = X.shape
-    for i in range(rows):
-        count = 0
-        for j in range(cols):
-            if X[i,j] == 1:
-                count += 1
-        if not count == 2:
-            return False
-    return True
-    
 def build_solution(sample):
     n, _ = M.shape # this will use the global M variable
     m = len(sample)
@@ -99,64 +95,129 @@ def build_solution(sample):
             k += 1
     return X
 
-def score(M, X):
-    return np.sum(np.multiply(M, X))    
-
-in_file = sys.argv[1]
-out_file = sys.argv[2]
+parser = argparse.ArgumentParser(description="Solve a TSP instance with the edge-based QUBO formulation.")
+parser.add_argument("in_file", help="file containing the pairwise costs as a matrix")
+parser.add_argument("out_file", help="file where the solution will be written")
+parser.add_argument("--dense", action="store_true", help="build the dense QUBO matrices instead of the sparse model")
+parser.add_argument("--template-cache", metavar="DIR", help="directory where QUBO templates are stored and reused")
+parser.add_argument("--embedding-cache", metavar="DIR", help="directory where QPU embeddings are stored and reused")
+parser.add_argument("--mock-qpu", action="store_true", help="anneal locally on a mock QPU with the Pegasus topology instead of the real QPU")
+parser.add_argument("--chain-resolution", choices=["majority", "energy"], help="unembed the samples with this method and report per-chain breaks")
+parser.add_argument("--target-chain-break", type=float, metavar="RATE", help="tune the chain strength up or down until about RATE of the chains break")
+parser.add_argument("--lambda-sweep", action="store_true", help="try a schedule of lagrange multipliers and keep the best one")
+parser.add_argument("--repair", action="store_true", help="patch samples with subtours or wrong degrees into tours and keep the cheapest")
+args = parser.parse_args()
+in_file = args.in_file
+out_file = args.out_file
 num_samples = 100
 
 # the matrix of paiwise costs (cost to travel from node i to node j). this need not be a symmetric matrix but the diagonal entries are ignored
 # and assumed to be zero (don't care)
 M = np.loadtxt(in_file)
-Q = build_objective_matrix(M)
 lagrange_multiplier = np.max(np.abs(M))
 
 # now we just need to add the constraint that each city is connected to exactly 2 other cities
 # we do this using the method of lagrange multipliers where the constraint is absorbed into the objective function
 # this is the hardest part of the problem
 n, _ = M.shape
-C = build_constraint_matrix(n)
-# print(C)
-
-qubo = Q + lagrange_multiplier * C
-sampler = EmbeddingComposite(DWaveSampler()) # QPU sampler to run in production
+if args.dense:
+    Q = build_objective_matrix(M)
+    C = build_constraint_matrix(n)
+    qubo = dimod.BinaryQuadraticModel(Q + lagrange_multiplier * C, dimod.BINARY)
+else:
+    # only the edge pairs sharing a city are coupled, so we skip the m*m matrices entirely.
+    # the constraint structure only depends on n and is loaded from the template cache
+    qubo = templates.build_bqm("jain", M, lagrange_multiplier, args.template_cache)
+qpu = MockQPUSampler() if args.mock_qpu else DWaveSampler()
+if args.embedding_cache:
+    # the edge variables and their couplers only depend on n, so the embedding is found once and reused
+    sampler = fixed_embedding_sampler(qpu, "jain", n, args.embedding_cache)
+else:
+    sampler = EmbeddingComposite(qpu) # QPU sampler to run in production
+if args.chain_resolution or args.target_chain_break is not None:
+    # unembed all reads ourselves to get per-chain break statistics
+    embedding = sampler.embedding if isinstance(sampler, FixedEmbeddingComposite) else get_embedding("jain", n, qpu, args.embedding_cache)
+    sampler = ChainResolvingComposite(qpu, embedding, args.chain_resolution or "majority", args.target_chain_break)
 t0 = time.perf_counter()
-sampleset = sampler.sample_qubo(qubo, num_reads=num_samples, chain_strength=scaled)
+sweep = None
+if args.lambda_sweep:
+    # try increasing multipliers until most reads are valid, and keep the samples of the one that gave the best tour
+    sweep = sweep_lambda("jain", M, sampler, template_cache=args.template_cache, num_reads=num_samples, chain_strength=scaled, return_embedding=True)
+    if sweep.sampleset is not None:
+        lagrange_multiplier = sweep.best_penalty
+        sampleset = sweep.sampleset
+    else:
+        # nothing valid at any multiplier: report the samples of the last one, which the sweep kept
+        lagrange_multiplier = sweep.steps[-1].penalty
+        sampleset = sweep.last_sampleset
+else:
+    sampleset = sampler.sample(qubo, num_reads=num_samples, chain_strength=scaled, return_embedding=True)
 t1 = time.perf_counter()
-dwave.inspector.show(sampleset)
+if not is_mock_sampleset(sampleset):
+    dwave.inspector.show(sampleset)
+# identical reads are decoded once, num_occurrences keeps count of them
+sampleset = aggregate_sampleset(sampleset)
 have_solution = False
 problem_id = sampleset.info['problem_id']
 chain_strength = sampleset.info['embedding_context']['chain_strength']
+# decode all the samples at once and take the valid one with the lowest energy
+samples = sample_matrix(sampleset, range(n*(n-1)//2))
+order = np.argsort(sampleset.record.energy, kind='stable')
+best = None         # row of the reported sample in the sampleset
+repaired_tour = None
+if args.repair:
+    # every sample becomes a tour: take the cheapest one, ties broken by energy
+    tours, costs, repaired = repair_jain(samples, M)
+    if len(sampleset) > 0:
+        best = np.lexsort((sampleset.record.energy, costs))[0]
+        if repaired[best]:
+            repaired_tour = tours[best]
+else:
+    feasible, tours, costs = decode_jain(samples, M)
+    valid = np.flatnonzero(feasible[order])
+    if valid.size > 0:
+        best = order[valid[0]]
 with open(out_file, 'w') as f:
     f.write(f"Problem Id: {problem_id}\n")        # does not depend on sample  
-    count = 0
-    for e in sampleset.data(sorted_by='energy'):
-        sample = e.sample
-        energy = e.energy
-        num_occurrences = e.num_occurrences
-        chain_break_fraction = e.chain_break_fraction
+    if best is not None:
+        have_solution = True
+        count = np.flatnonzero(order == best)[0]    # index of the solution in the energy-sorted samples
+        e = sampleset.record[best]
+        sample = dict(zip(sampleset.variables, e.sample))
         X = build_solution(sample)
-        if is_valid_solution(X):
-            have_solution = True
-            score = score(M, X)
-            f.write(f"Solution:\n")
-            f.write(f"{X}\n")
-            f.write(f"Score: {score}\n")
-            f.write(f"{sample}\n")
-            f.write(f"index: {count}\n")
-            f.write(f"energy: {energy}\n")
-            f.write(f"num_occurrences: {num_occurrences}\n")            
-            f.write(f"chain break fraction: {chain_break_fraction}\n")            
-            break   # break out of for loop
-        count += 1
+        if repaired_tour is not None:
+            # the sample itself is not a tour: report the repaired one
+            X = np.zeros((n,n))
+            X[repaired_tour[:-1], repaired_tour[1:]] = X[repaired_tour[1:], repaired_tour[:-1]] = 1
+        f.write(f"Solution:\n")
+        f.write(f"{X}\n")
+        f.write(f"Score: {costs[best]}\n")
+        f.write(f"{sample}\n")
+        f.write(f"index: {count}\n")
+        f.write(f"energy: {e.energy}\n")
+        f.write(f"num_occurrences: {e.num_occurrences}\n")
+        f.write(f"chain break fraction: {e.chain_break_fraction}\n")            
+        if args.repair:
+            f.write(f"repaired: {repaired_tour is not None}\n")
+    f.write(f"distinct samples: {len(sampleset)} of {np.sum(sampleset.record.num_occurrences)} reads\n")
     f.write(f"chain strength: {chain_strength}\n")  # does not depend on sample
+    chain_stats = sampleset.info.get('chain_stats')
+    if chain_stats is not None:
+        f.write(f"chain break rate: {chain_stats.mean:.4f}\n")
+        f.write(f"most broken chains: {', '.join(f'{v}={rate:.3f}' for v, rate in chain_stats.worst()) or 'none'}\n")
+        if len(chain_stats.history) > 1:
+            f.write(f"chain strength tuning: {', '.join(f'{c:g}->{rate:.3f}' for c, rate in chain_stats.history)}\n")
     f.write(f"lagrange multiplier: {lagrange_multiplier}\n")
+    if sweep is not None:
+        f.write(f"lambda sweep ({sweep.total_reads} reads):\n")
+        for step in sweep.steps:
+            f.write(f"  lambda={step.penalty:g} reads={step.num_reads} feasible={step.feasible_fraction:.3f} best={step.best_cost}\n")
     f.write(f"Time: {t1-t0:0.4f} s\n")
     if not have_solution:
         # https://docs.ocean.dwavesys.com/en/latest/examples/inspector_graph_partitioning.html
         # this is the overall chain break fraction
-        chain_break_fraction = np.sum(sampleset.record.chain_break_fraction)/num_samples
+        record = sampleset.record
+        chain_break_fraction = np.sum(record.chain_break_fraction * record.num_occurrences)/np.sum(record.num_occurrences)
         f.write("did not find any solution\n")
         f.write(f"chain break fraction: {chain_break_fraction}\n")
 
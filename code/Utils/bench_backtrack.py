@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""This script checks the iterative backtracking engine against the recursive one and compares their speed.
+
+For every problem size n, a random cost matrix is generated, written to a temporary file and
+read back with both readers. Both engines then solve it; the costs and paths are compared and
+the time taken by each reader and each engine is printed, with the speedup of the iterative
+engine over the recursive one. The iterative engine exists to remove the recursion, not for
+speed, so do not expect large speedups.
+
+Usage:
+    python3 bench_backtrack.py [n ...]
+
+Example:
+    python3 bench_backtrack.py 8 9 10 11
+    This will compare the engines for n = 8, 9, 10 and 11.
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Global1A1_Solvers"))
+from backtrack import read_adjacency_matrix, read_flat_matrix, tsp_backtracking, tsp_iterative
+from bench_qubo import timed
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+def write_problem(n, rng, file_path):
+    """Writes a random cost matrix like the ones in the data directory.
+
+    Args:
+        n (int): The number of cities.
+        rng (np.random.Generator): The random number generator.
+        file_path (str): The path of the file to write.
+    """
+    M = rng.integers(1, 21, size=(n, n))
+    np.fill_diagonal(M, 0)
+    np.savetxt(file_path, M, fmt="%d")
+
+def compare_backtracking(sizes, rng):
+    """Compares `tsp_iterative` with `tsp_backtracking` for each problem size.
+
+    Args:
+        sizes (list): The problem sizes to compare.
+        rng (np.random.Generator): The random number generator.
+    """
+    print("Backtracking")
+    print(f"{'n':>4} {'read (s)':>10} {'flat (s)':>10} {'recursive (s)':>14} {'iterative (s)':>14} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            file_path = os.path.join(tmp, f"n{n}.txt")
+            write_problem(n, rng, file_path)
+            matrix, t_read = timed(read_adjacency_matrix, file_path)
+            flat, t_flat = timed(read_flat_matrix, file_path)
+            result_recursive, t_recursive = timed(tsp_backtracking, matrix)
+            result_iterative, t_iterative = timed(tsp_iterative, flat)
+            if result_recursive != result_iterative:
+                print(f"Mismatch between the engines for n = {n}")
+                sys.exit(1)
+            print(f"{n:>4} {t_read:>10.5f} {t_flat:>10.5f} {t_recursive:>14.4f} {t_iterative:>14.4f} "
+                  f"{t_recursive / t_iterative:>7.1f}x")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [6, 7, 8, 9, 10]
+    rng = np.random.default_rng(0)
+    compare_backtracking(sizes, rng)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""This script checks the vectorized QUBO builders against the loop versions and compares their speed.
+
+For every problem size n, a random cost matrix is generated and symmetrized the same way the solvers do it.
+The QUBO is then built with both implementations, the matrices are compared entry by entry,
+and the time taken by each builder is printed. The same is done for the constraint matrix of the
+Jain formulation, dense and sparse, and for the `traveling_salesperson_qubo` formulation used by
+`dwave_solver.py`, where the peak memory of both builders is printed as well.
+
+Usage:
+    python3 bench_qubo.py [n ...]
+
+Example:
+    python3 bench_qubo.py 8 12 16 20
+    This will compare the builders for n = 8, 12, 16 and 20.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+import dimod
+import networkx as nx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Global1A1_Solvers"))
+from qubo import build_dwave_bqm, build_eqats_qubo, build_eqats_qubo_loop, build_jain_constraint, build_jain_constraint_loop
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    from dwave_networkx import traveling_salesperson_qubo
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+def random_problem(n, rng):
+    """Generates a random symmetrized cost matrix like the ones in the data directory.
+
+    Args:
+        n (int): The number of cities.
+        rng (np.random.Generator): The random number generator.
+
+    Returns:
+        np.array: The symmetrized n*n cost matrix with a zero diagonal.
+    """
+    M = rng.integers(1, n + 1, size=(n, n)).astype(float)
+    np.fill_diagonal(M, 0)
+    return M + M.T
+
+def timed(builder, *args):
+    """Runs a builder once and measures its wall time.
+
+    Args:
+        builder (callable): The function to run.
+        *args: The arguments passed to the function.
+
+    Returns:
+        tuple: The result of the function and the elapsed time in seconds.
+    """
+    t0 = time.perf_counter()
+    result = builder(*args)
+    t1 = time.perf_counter()
+    return result, t1 - t0
+
+def compare_eqats(sizes, rng):
+    """Compares `build_eqats_qubo` with `build_eqats_qubo_loop` for each problem size.
+
+    Args:
+        sizes (list): The problem sizes to compare.
+        rng (np.random.Generator): The random number generator.
+    """
+    print("EQATS QUBO")
+    print(f"{'n':>4} {'loop (s)':>10} {'numpy (s)':>10} {'speedup':>8}")
+    for n in sizes:
+        M = random_problem(n, rng)
+        _lambda = np.max(np.abs(M)) * 2
+        Q_loop, t_loop = timed(build_eqats_qubo_loop, M, _lambda)
+        Q_fast, t_fast = timed(build_eqats_qubo, M, _lambda)
+        if not np.array_equal(Q_loop, Q_fast):
+            print(f"Mismatch between the builders for n = {n}")
+            sys.exit(1)
+        print(f"{n:>4} {t_loop:>10.4f} {t_fast:>10.4f} {t_loop / t_fast:>7.1f}x")
+
+def compare_jain_constraint(sizes):
+    """Compares `build_jain_constraint` with `build_jain_constraint_loop` for each problem size.
+
+    Args:
+        sizes (list): The problem sizes to compare.
+    """
+    print("Jain constraint matrix")
+    print(f"{'n':>4} {'loop (s)':>10} {'numpy (s)':>10} {'sparse (s)':>10} {'speedup':>8}")
+    for n in sizes:
+        C_loop, t_loop = timed(build_jain_constraint_loop, n)
+        C_fast, t_fast = timed(build_jain_constraint, n)
+        C_sparse, t_sparse = timed(build_jain_constraint, n, True)
+        if not (np.array_equal(C_loop, C_fast) and np.array_equal(C_loop, C_sparse.toarray())):
+            print(f"Mismatch between the builders for n = {n}")
+            sys.exit(1)
+        print(f"{n:>4} {t_loop:>10.4f} {t_fast:>10.4f} {t_sparse:>10.4f} {t_loop / t_fast:>7.1f}x")
+
+def dwave_networkx_bqm(M):
+    """Builds the QUBO the way `dwave_solver.py` used to: graph, dict of biases, then model.
+
+    Args:
+        M (np.array): The symmetrized cost matrix.
+
+    Returns:
+        dimod.BinaryQuadraticModel: The model over the variables (city, time).
+    """
+    return dimod.BinaryQuadraticModel.from_qubo(traveling_salesperson_qubo(nx.from_numpy_array(M)))
+
+def peak_memory(builder, *args):
+    """Runs a builder once and measures the peak memory it allocates.
+
+    Args:
+        builder (callable): The function to run.
+        *args: The arguments passed to the function.
+
+    Returns:
+        float: The peak allocated memory in MB.
+    """
+    tracemalloc.start()
+    builder(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+def compare_dwave(sizes, rng):
+    """Compares `build_dwave_bqm` with `traveling_salesperson_qubo` for each problem size.
+
+    Args:
+        sizes (list): The problem sizes to compare.
+        rng (np.random.Generator): The random number generator.
+    """
+    print("traveling_salesperson_qubo")
+    print(f"{'n':>4} {'networkx (s)':>13} {'numpy (s)':>10} {'speedup':>8} {'networkx (MB)':>14} {'numpy (MB)':>11}")
+    for n in sizes:
+        M = random_problem(n, rng)
+        bqm_ref, t_ref = timed(dwave_networkx_bqm, M)
+        bqm_fast, t_fast = timed(build_dwave_bqm, M)
+        if not bqm_ref.is_almost_equal(bqm_fast):
+            print(f"Mismatch between the builders for n = {n}")
+            sys.exit(1)
+        del bqm_ref, bqm_fast
+        mb_ref = peak_memory(dwave_networkx_bqm, M)
+        mb_fast = peak_memory(build_dwave_bqm, M)
+        print(f"{n:>4} {t_ref:>13.4f} {t_fast:>10.4f} {t_ref / t_fast:>7.1f}x {mb_ref:>14.1f} {mb_fast:>11.1f}")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [4, 8, 12, 16, 20, 25]
+    rng = np.random.default_rng(0)
+    compare_eqats(sizes, rng)
+    compare_jain_constraint(sizes)
+    compare_dwave([n for n in sizes if n >= 3], rng)
@@ -1,7 +1,16 @@
 #!/usr/bin/env python
 """This file contains the code used to generate figure 1 in the paper.
+
+It plots the score of every combination written by `brute-force-solver.py`. A binary score log
+(`.npy`, recognized by its header rather than its name) is memory-mapped instead of parsed, and when there are more combinations than pixels the
+scores are decimated: each pixel column shows the minimum and the maximum score of its range of
+combinations, so no peak or valley is lost. Text score files ("k score" lines) can still be read.
+
+Usage:
+    python3 line_plot.py [scores file] [--width PIXELS]
 """
 
+import argparse
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
@@ -15,15 +24,41 @@ __maintainer__ = "Siddharth Jain"
 __email__ = "sjain68@its.jnj.com"
 __status__ = "Production"
 
-# prerequisite: need to install:
-# conda install -c anaconda pyqt
-# see https://gist.github.com/siddjain/44c70083a72b888c64033ff51de755af
-matplotlib.use("Qt5Agg")
-file = '../data/n8/solutions/brute-force/scores1.txt'
-M = np.loadtxt(file)
-fig, ax = plt.subplots()
-ax.plot(M[:,0], M[:,1])
-ax.set_xlabel('combinations', fontsize=16)
-ax.set_ylabel(r'$\sum M .* X$', fontsize=16)
-fig.show()
-input("Press ENTER to exit")
+# first bytes of every file written by np.save
+NPY_MAGIC = b'\x93NUMPY'
+
+def load_scores(file):
+    """ returns the scores indexed by combination, memory-mapped for a .npy score log whatever the file is called """
+    with open(file, 'rb') as f:
+        binary = f.read(len(NPY_MAGIC)) == NPY_MAGIC
+    if binary:
+        return np.load(file, mmap_mode='r')
+    return np.loadtxt(file)[:, 1]
+
+def decimate(scores, width):
+    """ returns the first combination, the minimum and the maximum score of width equal ranges of combinations """
+    width = min(width, scores.size)
+    starts = np.linspace(0, scores.size, width, endpoint=False).astype(np.int64)
+    return starts, np.minimum.reduceat(scores, starts), np.maximum.reduceat(scores, starts)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot the score of every combination.")
+    parser.add_argument("file", nargs="?", default='../data/n8/solutions/brute-force/scores1.txt', help="score log (.npy) or text score file")
+    parser.add_argument("--width", type=int, default=2000, help="number of ranges the scores are decimated to")
+    args = parser.parse_args()
+
+    # prerequisite: need to install:
+    # conda install -c anaconda pyqt
+    # see https://gist.github.com/siddjain/44c70083a72b888c64033ff51de755af
+    matplotlib.use("Qt5Agg")
+    scores = load_scores(args.file)
+    x, low, high = decimate(scores, args.width)
+    fig, ax = plt.subplots()
+    if x.size == scores.size:
+        ax.plot(x, low)
+    else:
+        ax.fill_between(x, low, high, step='post', linewidth=0.5)
+    ax.set_xlabel('combinations', fontsize=16)
+    ax.set_ylabel(r'$\sum M .* X$', fontsize=16)
+    fig.show()
+    input("Press ENTER to exit")
@@ -1,11 +1,18 @@
 #!/usr/bin/env python
-"""This script runs a solver script on all problem files in a specified directory and stores the solutions in another directory.
+"""This script solves all problem files in a specified directory with the EQATS solver and stores the solutions in another directory.
 
 Usage:
-    python3 run_all_tests.py <n>
+    python3 run_all_tests.py <n> [sampler]
     
 Arguments:
     <n> (int): The problem set size, which determines the directory structure for problems and solutions.
+    [sampler] (str): The sampler used by the EQATS solver: hybrid (default), qpu, local or mock.
+
+The EQATS solver is imported and called in this process, so its imports, the sampler connection
+and any caches are shared by all the problems instead of starting a new interpreter for each one.
+A problem that fails is reported and skipped, and the batch goes on with the next one. Unlike a
+single run of eqats_solver.py, the batch does not plot the problems, so no problem.png or
+solution.png is written.
 
 Directory Structure:
     The script expects the following structure:
@@ -19,43 +26,49 @@ Example:
 """
 
 import os
-import subprocess
 import sys
 
-def run_solver_on_problems(problem_dir, solution_dir, solver_script):
-    """Runs the solver script on all problem files in the problem directory and saves the results to the solution directory.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Global1A1_Solvers"))
+import eqats_solver
+
+def solve_problems_in_process(problem_dir, solution_dir, sampler="hybrid"):
+    """Solves all problem files in the problem directory with the EQATS solver in the current process.
 
     Args:
         problem_dir (str): Directory containing problem files.
         solution_dir (str): Directory where solution files will be saved.
-        solver_script (str): Path to the solver script.
+        sampler (str): The sampler backend, one of "hybrid", "qpu", "local" or "mock".
 
     Creates:
         Solution directory if it does not exist.
-        Runs the solver script for each problem file and saves the output to the corresponding solution file.
+        Writes the solution of each problem to the corresponding solution file. Problems that
+        fail are reported and skipped.
     """
-    # Create the solution directory if it doesn't exist
     if not os.path.exists(solution_dir):
         os.makedirs(solution_dir)
-    
-    # Iterate over all problem files in the problem directory
+
     for filename in os.listdir(problem_dir):
         if filename.startswith("problem") and filename.endswith(".txt"):
             problem_path = os.path.join(problem_dir, filename)
             problem_number = filename.replace("problem", "").replace(".txt", "")
-            solution_filename = f"solution{problem_number}.txt"
-            solution_path = os.path.join(solution_dir, solution_filename)
-            
-            # Run the solver script
+            solution_path = os.path.join(solution_dir, f"solution{problem_number}.txt")
+
+            # One failing problem (a malformed file, a sampler error) must not stop the batch
             try:
-                subprocess.run(["python3", solver_script, problem_path, solution_path], check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"Error running solver on {problem_path}: {e}")
+                M = eqats_solver.load_problem(problem_path)
+                result = eqats_solver.solve(M, sampler=sampler)
+                if result.found:
+                    eqats_solver.write_solution(solution_path, result)
+                else:
+                    print(f"No valid solution found for {problem_path}")
+            except Exception as e:
+                print(f"Error solving {problem_path}: {e}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("\nUsage: python3 run_all_tests.py <n>")
+    if len(sys.argv) not in (2, 3):
+        print("\nUsage: python3 run_all_tests.py <n> [sampler]")
         print("  <n>: The problem set size.")
+        print("  [sampler]: hybrid (default), qpu, local or mock.")
         print("This script expects the following directory structure:")
         print("     ../../data/n<n>/problems/problemX.txt")
         print("     ../../data/n<n>/solutions/eqats_hqpu_solutions/solutionX.txt")
@@ -70,10 +83,11 @@ if __name__ == "__main__":
         print("Error: <n> must be an integer")
         sys.exit(1)
     
-    # Define the directories and solver script path
+    sampler = sys.argv[2] if len(sys.argv) == 3 else "hybrid"
+
+    # Define the directories
     problem_directory = f"../../data/n{n}/problems"
     solution_directory = f"../../data/n{n}/solutions/eqats_hqpu_solutions"
-    solver_script_path = "../Global1A1_Solvers/eqats_solver.py"
     
     # Check if the problem directory exists
     if not os.path.exists(problem_directory):
@@ -81,4 +95,4 @@ if __name__ == "__main__":
         sys.exit(1)
 
     # Run the solver on all problems
-    run_solver_on_problems(problem_directory, solution_directory, solver_script_path)
+    solve_problems_in_process(problem_directory, solution_directory, sampler)
@@ -0,0 +1,6 @@
+"""Makes the solver modules importable from the tests, like the scripts in `code/Utils` do."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "code", "Global1A1_Solvers"))
@@ -0,0 +1,166 @@
+"""Checks the chain resolution and the chain strength tuning of `chains.py`.
+
+`resolve_chains` is compared with `dwave.embedding.majority_vote` and `broken_chains`, and the
+energy method must never give a higher logical energy than the majority vote when a single chain
+is broken. `ChainResolvingComposite` is run on a child whose break rate falls as the chain
+strength grows, so the tuning can be followed round by round.
+"""
+
+import dimod
+import numpy as np
+import pytest
+from dwave.embedding import broken_chains, majority_vote
+from chains import ChainResolvingComposite, chain_incidence, next_chain_strength, resolve_chains
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+# Three logical variables on six qubits, with chains of 1, 3 and 2 qubits
+EMBEDDING = {"a": (0,), "b": (1, 2, 3), "c": (4, 5)}
+EDGES = [(1, 2), (2, 3), (4, 5), (0, 1), (3, 4), (5, 0)]
+
+def logical_bqm(vartype=dimod.SPIN):
+    """Builds a small logical problem on the embedded variables."""
+    bqm = dimod.BinaryQuadraticModel({"a": 0.5, "b": -0.25, "c": 0.1}, {("a", "b"): -1.0, ("b", "c"): 0.75,
+                                     ("a", "c"): 0.5}, 0.0, dimod.SPIN)
+    return bqm.change_vartype(vartype, inplace=False)
+
+class ChainBreakingSampler(dimod.Sampler, dimod.Structured):
+    """A structured sampler whose chains break less often as the chain coupling grows.
+
+    Every read sets all qubits to +1, and the first `rate * reads * chains` (read, chain) pairs
+    with more than one qubit are broken by flipping one qubit, with `rate = scale / strength`.
+    The chain strength is read back from the coupling of qubits 4 and 5.
+    """
+
+    def __init__(self, scale=0.5):
+        self.scale = scale
+
+    @property
+    def nodelist(self):
+        return list(range(6))
+
+    @property
+    def edgelist(self):
+        return EDGES
+
+    @property
+    def properties(self):
+        return {}
+
+    @property
+    def parameters(self):
+        return {'num_reads': []}
+
+    def sample(self, bqm, num_reads=100):
+        strength = -bqm.spin.quadratic[4, 5]
+        chains = [chain for chain in EMBEDDING.values() if len(chain) > 1]
+        samples = np.ones((num_reads, 6), dtype=np.int8)
+        broken = int(round(min(1.0, self.scale / strength) * num_reads * len(chains)))
+        for k in range(broken):
+            samples[k // len(chains), chains[k % len(chains)][0]] = -1
+        return dimod.SampleSet.from_samples_bqm((samples, self.nodelist), bqm.spin, info={'problem_id': 'mock'})
+
+@pytest.mark.parametrize("too_weak, too_strong, expected", [
+    (2.0, None, 3.0),
+    (None, 3.0, 2.0),
+    (2.0, 8.0, 4.0),
+])
+def test_next_chain_strength(too_weak, too_strong, expected):
+    assert next_chain_strength(too_weak, too_strong, 1.5) == pytest.approx(expected)
+
+def test_chain_incidence():
+    incidence = chain_incidence(EMBEDDING, ["c", "a", "b"], [5, 4, 3, 2, 1, 0])
+    expected = np.zeros((6, 3))
+    expected[[0, 1], 0] = 1
+    expected[5, 1] = 1
+    expected[[2, 3, 4], 2] = 1
+    np.testing.assert_array_equal(incidence.toarray(), expected)
+
+def test_majority_matches_dwave():
+    rng = np.random.default_rng(0)
+    samples = rng.integers(0, 2, size=(200, 6))
+    variables = list(EMBEDDING)
+    chains = [EMBEDDING[v] for v in variables]
+    x, broken = resolve_chains(samples, chain_incidence(EMBEDDING, variables, range(6)), logical_bqm(dimod.BINARY),
+                               variables)
+    expected, _ = majority_vote(samples, chains)
+    np.testing.assert_array_equal(broken, broken_chains(samples, chains))
+    # Chain "c" can tie; resolve_chains sends ties to 1
+    ties = samples[:, 4] != samples[:, 5]
+    np.testing.assert_array_equal(x[:, :2], expected[:, :2])
+    np.testing.assert_array_equal(x[~ties, 2], expected[~ties, 2])
+    assert (x[ties, 2] == 1).all()
+
+@pytest.mark.parametrize("vartype", [dimod.SPIN, dimod.BINARY])
+def test_energy_resolution_never_worse_than_majority(vartype):
+    rng = np.random.default_rng(1)
+    variables = list(EMBEDDING)
+    x = rng.integers(0, 2, size=(300, 3))
+    samples = np.repeat(x, [1, 3, 2], axis=1)
+    # Break one qubit of chain "b" in every read
+    samples[np.arange(300), rng.integers(1, 4, size=300)] ^= 1
+    bqm = logical_bqm(vartype)
+    incidence = chain_incidence(EMBEDDING, variables, range(6))
+    majority, broken = resolve_chains(samples, incidence, bqm, variables, "majority")
+    energy, energy_broken = resolve_chains(samples, incidence, bqm, variables, "energy")
+    np.testing.assert_array_equal(energy_broken, broken)
+    np.testing.assert_array_equal(energy[:, [0, 2]], majority[:, [0, 2]])
+
+    binary = bqm.change_vartype(dimod.BINARY, inplace=False)
+    majority_energy = binary.energies((majority, variables))
+    energy_energy = binary.energies((energy, variables))
+    assert (energy_energy <= majority_energy + 1e-12).all()
+    assert (energy_energy < majority_energy).any()
+
+def test_resolve_chains_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        resolve_chains(np.zeros((1, 6)), chain_incidence(EMBEDDING, list(EMBEDDING), range(6)), logical_bqm(),
+                       list(EMBEDDING), "vote")
+
+def test_composite_without_target_samples_once():
+    sampler = ChainResolvingComposite(ChainBreakingSampler(), EMBEDDING)
+    sampleset = sampler.sample(logical_bqm(), chain_strength=2.0, num_reads=100)
+    stats = sampleset.info["chain_stats"]
+    assert stats.history == [(2.0, pytest.approx(0.25 * 2 / 3))]
+    assert sampleset.info["embedding_context"]["chain_strength"] == 2.0
+    assert sampleset.info["problem_id"] == "mock"
+    np.testing.assert_allclose(sampleset.record.chain_break_fraction, stats.read_break_fraction)
+    assert set(sampleset.variables) == set(EMBEDDING)
+
+def test_composite_strengthens_weak_chains():
+    # Break rates of the chains with more than one qubit: 0.5 / strength
+    sampler = ChainResolvingComposite(ChainBreakingSampler(), EMBEDDING, target_break_rate=0.1 * 2 / 3,
+                                      tolerance=0.02 * 2 / 3)
+    sampleset = sampler.sample(logical_bqm(), chain_strength=1.0, num_reads=300)
+    strengths = [strength for strength, _ in sampleset.info["chain_stats"].history]
+    np.testing.assert_allclose(strengths, [1.0, 1.5, 2.25, 3.375, 5.0625])
+    assert sampleset.info["chain_stats"].chain_strength == pytest.approx(5.0625)
+
+def test_composite_weakens_strong_chains():
+    sampler = ChainResolvingComposite(ChainBreakingSampler(), EMBEDDING, target_break_rate=0.1 * 2 / 3,
+                                      tolerance=0.01 * 2 / 3, factor=3.0)
+    sampleset = sampler.sample(logical_bqm(), chain_strength=40.0, num_reads=300)
+    stats = sampleset.info["chain_stats"]
+    strengths = [strength for strength, _ in stats.history]
+    # Too strong twice, then too weak: the next rounds bisect between 40/9 and 40/3
+    np.testing.assert_allclose(strengths[:3], [40.0, 40 / 3, 40 / 9])
+    assert strengths[3] == pytest.approx(np.sqrt(40 / 3 * 40 / 9))
+    assert all(40 / 9 < strength < 40 / 3 for strength in strengths[3:])
+    assert abs(stats.mean - 0.1 * 2 / 3) <= 0.01 * 2 / 3
+
+def test_composite_keeps_the_closest_round():
+    sampler = ChainResolvingComposite(ChainBreakingSampler(), EMBEDDING, target_break_rate=0.01, tolerance=0.001,
+                                      max_rounds=3)
+    sampleset = sampler.sample(logical_bqm(), chain_strength=1.0, num_reads=100)
+    stats = sampleset.info["chain_stats"]
+    assert len(stats.history) == 3
+    closest = min(stats.history, key=lambda round: abs(round[1] - 0.01))
+    assert stats.chain_strength == closest[0]
+    assert stats.mean == pytest.approx(closest[1])
@@ -0,0 +1,213 @@
+"""Checks the batch decoders of `decode.py` against per-sample reference implementations.
+
+The references below are the loop versions the solvers used before `decode.py`: build the
+solution matrix of one sample, check its rows and walk it to get the tour and its cost. They are
+compared with the decoders on random reads, valid tours, reads with cities sharing a position and,
+for the Jain formulation, reads split into subtours. The repairs must turn every read into a
+valid tour, and `aggregate_sampleset` must keep the occurrences and energies of the merged reads.
+"""
+
+import dimod
+import numpy as np
+import pytest
+from decode import (aggregate_sampleset, decode_dwave, decode_eqats, decode_jain, repair_eqats, repair_jain,
+                    sample_matrix, unique_samples)
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+SIZES = range(3, 9)
+
+def cost_matrix(n, seed=0):
+    """Generates a random symmetric integer cost matrix with a zero diagonal."""
+    rng = np.random.default_rng(seed + n)
+    M = np.triu(rng.integers(1, 10, size=(n, n)), 1).astype(float)
+    return M + M.T
+
+def one_hot_samples(rng, cities, positions, reads):
+    """Generates (city, position) reads: random bits, permutations and shared positions."""
+    random = rng.integers(0, 2, size=(reads, cities * positions))
+    eye = np.eye(positions, dtype=int)
+    permutations = np.array([eye[rng.permutation(positions)].ravel() for _ in range(reads)])
+    shared = np.array([eye[rng.integers(0, positions, size=cities)].ravel() for _ in range(reads)])
+    return np.vstack([random, permutations, shared])
+
+def jain_samples(rng, n, reads):
+    """Generates edge reads: random bits, tours and, for n >= 6, two subtours."""
+    i, j = np.triu_indices(n, 1)
+    index = {(u, v): k for k, (u, v) in enumerate(zip(i.tolist(), j.tolist()))}
+
+    def edges(*cycles):
+        sample = np.zeros(i.size, dtype=int)
+        for cycle in cycles:
+            for u, v in zip(cycle, np.roll(cycle, -1)):
+                sample[index[min(u, v), max(u, v)]] = 1
+        return sample
+
+    samples = [rng.integers(0, 2, size=i.size) for _ in range(reads)]
+    samples += [edges(rng.permutation(n)) for _ in range(reads)]
+    if n >= 6:
+        for _ in range(reads):
+            cities = rng.permutation(n)
+            samples.append(edges(cities[:3], cities[3:]))
+    return np.array(samples)
+
+def eqats_reference(sample, M):
+    """Validates and scores one EQATS read the way `eqats_solver.py` did before `decode.py`."""
+    n, _ = M.shape
+    X = np.zeros((n, n))
+    X[0, 0] = 1
+    X[1:, 1:] = np.reshape(sample, (n - 1, n - 1))
+    if any(np.sum(X[i, :]) != 1 for i in range(n)):
+        return False, None, None
+    cost, path, current = 0, [], 0
+    for j in range(n):
+        for i in range(n):
+            if X[i, j]:
+                path.append(i)
+                cost += M[current, i]
+                current = i
+    cost += M[current, path[0]]
+    return True, path + [path[0]], cost
+
+def dwave_reference(sample, M):
+    """Validates and scores one (city, time) read, starting the tour at the city visited first."""
+    n, _ = M.shape
+    X = np.reshape(sample, (n, n))
+    if any(np.sum(X[i, :]) != 1 for i in range(n)):
+        return False, None, None
+    path = [i for j in range(n) for i in range(n) if X[i, j]]
+    cost = sum(M[path[k], path[(k + 1) % n]] for k in range(n))
+    return True, path + [path[0]], cost
+
+def jain_reference(sample, M):
+    """Validates and scores one edge read the way `my-quantum-solver.py` did before `decode.py`."""
+    n, _ = M.shape
+    X = np.zeros((n, n))
+    k = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            X[i, j] = X[j, i] = sample[k]
+            k += 1
+    if any(np.sum(X[i, :]) != 2 for i in range(n)):
+        return False, None
+    return True, np.sum(M * X)
+
+def assert_valid_tours(tours, costs, M):
+    """Checks that every row is a closed tour through all cities with the given cost."""
+    n, _ = M.shape
+    assert (tours[:, 0] == tours[:, -1]).all()
+    np.testing.assert_array_equal(np.sort(tours[:, :-1], axis=1), np.tile(np.arange(n), (len(tours), 1)))
+    expected = [sum(M[t[k], t[k + 1]] for k in range(n)) for t in tours]
+    np.testing.assert_allclose(costs, expected)
+
+@pytest.mark.parametrize("n", SIZES)
+def test_decode_eqats_matches_reference(n):
+    M = cost_matrix(n)
+    samples = one_hot_samples(np.random.default_rng(n), n - 1, n - 1, 50)
+    feasible, tours, costs = decode_eqats(samples, M)
+    for r, sample in enumerate(samples):
+        valid, path, cost = eqats_reference(sample, M)
+        assert feasible[r] == valid
+        if valid:
+            assert tours[r].tolist() == path
+            assert costs[r] == pytest.approx(cost)
+        else:
+            assert (tours[r] == -1).all() and costs[r] == np.inf
+    assert feasible.any() and not feasible.all()
+
+@pytest.mark.parametrize("n", SIZES)
+def test_decode_dwave_matches_reference(n):
+    M = cost_matrix(n)
+    samples = one_hot_samples(np.random.default_rng(n), n, n, 50)
+    feasible, tours, costs = decode_dwave(samples, M)
+    for r, sample in enumerate(samples):
+        valid, path, cost = dwave_reference(sample, M)
+        assert feasible[r] == valid
+        if valid:
+            assert tours[r].tolist() == path
+            assert costs[r] == pytest.approx(cost)
+        else:
+            assert costs[r] == np.inf
+    assert feasible.any() and not feasible.all()
+
+@pytest.mark.parametrize("n", SIZES)
+def test_decode_jain_matches_reference(n):
+    M = cost_matrix(n)
+    samples = jain_samples(np.random.default_rng(n), n, 50)
+    feasible, tours, costs = decode_jain(samples, M)
+    for r, sample in enumerate(samples):
+        valid, cost = jain_reference(sample, M)
+        assert feasible[r] == valid
+        if valid:
+            assert costs[r] == pytest.approx(cost)
+        else:
+            assert costs[r] == np.inf
+    usable = tours[:, 0] >= 0
+    assert (feasible[usable]).all()
+    assert_valid_tours(tours[usable], costs[usable] / 2, M)
+    if n >= 6:
+        assert (feasible & ~usable).any()
+
+@pytest.mark.parametrize("n", SIZES)
+def test_repair_eqats_returns_tours(n):
+    M = cost_matrix(n)
+    samples = one_hot_samples(np.random.default_rng(n), n - 1, n - 1, 50)
+    feasible, tours, costs = decode_eqats(samples, M)
+    repaired_tours, repaired_costs, repaired = repair_eqats(samples, M)
+    np.testing.assert_array_equal(repaired, ~feasible)
+    np.testing.assert_array_equal(repaired_tours[feasible], tours[feasible])
+    assert_valid_tours(repaired_tours, repaired_costs, M)
+    assert (repaired_tours[:, 0] == 0).all()
+
+@pytest.mark.parametrize("n", SIZES)
+def test_repair_jain_returns_tours(n):
+    M = cost_matrix(n)
+    samples = jain_samples(np.random.default_rng(n), n, 50)
+    _, tours, _ = decode_jain(samples, M)
+    repaired_tours, repaired_costs, repaired = repair_jain(samples, M)
+    np.testing.assert_array_equal(repaired, tours[:, 0] < 0)
+    np.testing.assert_array_equal(repaired_tours[~repaired], tours[~repaired])
+    assert_valid_tours(repaired_tours, repaired_costs / 2, M)
+    assert (repaired_tours[:, 0] == 0).all()
+
+def test_unique_samples_keeps_first_read_order():
+    samples = np.array([[1, 0], [0, 1], [1, 0], [0, 0], [0, 1]])
+    first, inverse, counts = unique_samples(samples, np.array([1, 2, 3, 4, 5]))
+    np.testing.assert_array_equal(first, [0, 1, 3])
+    np.testing.assert_array_equal(inverse, [0, 1, 0, 2, 1])
+    np.testing.assert_array_equal(counts, [4, 7, 4])
+
+def test_aggregate_sampleset_bookkeeping():
+    rng = np.random.default_rng(0)
+    distinct = rng.integers(0, 2, size=(6, 20))
+    picks = rng.integers(0, 6, size=200)
+    picks[:6] = rng.permutation(6)
+    bqm = dimod.BinaryQuadraticModel({v: rng.normal() for v in range(20)}, {}, 0.0, dimod.BINARY)
+    occurrences = rng.integers(1, 4, size=picks.size)
+    breaks = rng.uniform(0, 0.5, size=picks.size)
+    sampleset = dimod.SampleSet.from_samples_bqm((distinct[picks], range(20)), bqm, num_occurrences=occurrences,
+                                                 chain_break_fraction=breaks)
+    aggregated = aggregate_sampleset(sampleset)
+
+    assert len(aggregated) == 6
+    assert aggregated.record.num_occurrences.sum() == occurrences.sum()
+    np.testing.assert_array_equal(sample_matrix(aggregated, range(20)), distinct[picks[:6]])
+    for row, d in zip(aggregated.record, picks[:6]):
+        reads = picks == d
+        assert row.num_occurrences == occurrences[reads].sum()
+        assert row.energy == pytest.approx(bqm.energy(dict(enumerate(distinct[d]))))
+        weights = occurrences[reads]
+        assert row.chain_break_fraction == pytest.approx(np.average(breaks[reads], weights=weights))
+    assert aggregated.first.energy == sampleset.first.energy
+    assert aggregated.first.sample == sampleset.first.sample
+
+def test_aggregate_sampleset_without_duplicates():
+    sampleset = dimod.SampleSet.from_samples(([[0, 1], [1, 0]], "ab"), dimod.BINARY, [1.0, 2.0])
+    assert aggregate_sampleset(sampleset) is sampleset
@@ -0,0 +1,94 @@
+"""Checks the exact solvers against the recursive backtracking of `backtrack.py`.
+
+`tsp_branch_and_bound`, `tsp_parallel`, `tsp_iterative` and `held_karp` must find the same minimum
+cost as `tsp_backtracking` for n = 2 to 8, on symmetric and asymmetric costs, with some missing
+(zero-cost) edges and without any tour at all. Ties may be broken differently, so their tours are
+only checked to be valid tours of the minimum cost, except for `tsp_iterative`, which explores the
+tree in the same order and must return the same tour.
+"""
+
+import numpy as np
+import pytest
+from backtrack import tsp_backtracking, tsp_branch_and_bound, tsp_iterative, tsp_parallel
+from held_karp import held_karp
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+SIZES = range(2, 9)
+KINDS = ["symmetric", "asymmetric", "missing", "no tour"]
+
+def cost_matrix(n, kind, seed=0):
+    """Generates a random integer cost matrix with a zero diagonal.
+
+    Args:
+        n (int): The number of cities.
+        kind (str): "symmetric" or "asymmetric" costs, "missing" for symmetric costs with some
+            zero (missing) edges, or "no tour" for symmetric costs where city n-1 has a single edge.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        list: The n*n cost matrix as a 2D list.
+    """
+    rng = np.random.default_rng(seed + n)
+    M = rng.integers(1, 10, size=(n, n))
+    if kind != "asymmetric":
+        M = np.triu(M, 1)
+        M = M + M.T
+    if kind == "missing":
+        i, j = np.triu_indices(n, 1)
+        drop = rng.random(i.size) < 0.3
+        M[i[drop], j[drop]] = M[j[drop], i[drop]] = 0
+    if kind == "no tour":
+        M[n - 1, :n - 2] = M[:n - 2, n - 1] = 0
+    np.fill_diagonal(M, 0)
+    return M.tolist()
+
+def assert_tour(matrix, min_cost, path):
+    """Checks that a path is a tour from city 0 over positive-cost edges with the given cost."""
+    n = len(matrix)
+    if min_cost == float('inf'):
+        assert path == []
+        return
+    assert path[0] == path[-1] == 0
+    assert sorted(path[:-1]) == list(range(n))
+    edges = [matrix[a][b] for a, b in zip(path, path[1:])]
+    assert all(c > 0 for c in edges)
+    assert sum(edges) == min_cost
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", SIZES)
+def test_exact_solvers_match_backtracking(n, kind):
+    matrix = cost_matrix(n, kind)
+    expected, path = tsp_backtracking(matrix)
+    assert_tour(matrix, expected, path)
+    if kind == "no tour" and n > 3:
+        assert expected == float('inf')
+
+    for min_cost, tour in [tsp_branch_and_bound(matrix), held_karp(np.array(matrix))]:
+        assert min_cost == expected
+        assert_tour(matrix, min_cost, tour)
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", SIZES)
+def test_iterative_matches_backtracking(n, kind):
+    matrix = cost_matrix(n, kind)
+    expected = tsp_backtracking(matrix)
+    assert tsp_iterative(matrix) == expected
+    flat = (n, [c for row in matrix for c in row])
+    assert tsp_iterative(flat) == expected
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", SIZES)
+def test_parallel_matches_backtracking(n, kind):
+    matrix = cost_matrix(n, kind)
+    expected, _ = tsp_backtracking(matrix)
+    min_cost, path = tsp_parallel(matrix, workers=2)
+    assert min_cost == expected
+    assert_tour(matrix, min_cost, path)
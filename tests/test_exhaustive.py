@@ -0,0 +1,140 @@
+"""Checks the NumPy brute force of `exhaustive.py` against the loop of `brute-force-solver.py`.
+
+For n = 6 to 8, `brute_force`, `brute_force_parallel` and the score log must give the same best
+and second best scores, the same best tours in the same order and the same score for every
+enumeration index k as `solve_loop`. Small block sizes are used as well, so the tours are split
+over many blocks and shards.
+"""
+
+import importlib.util
+import io
+import os
+import numpy as np
+import pytest
+from exhaustive import brute_force, brute_force_parallel, export_scores, log_scores, open_score_log, score_dtype
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+SOLVER_PATH = os.path.join(os.path.dirname(__file__), "..", "code", "Jain_Solvers", "brute-force-solver.py")
+spec = importlib.util.spec_from_file_location("brute_force_solver", SOLVER_PATH)
+solver = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(solver)
+
+SIZES = range(6, 9)
+KINDS = ["symmetric", "asymmetric", "integer"]
+
+def cost_matrix(n, kind, seed=0):
+    """Generates a random cost matrix with a zero diagonal and integral costs.
+
+    Args:
+        n (int): The number of cities.
+        kind (str): "symmetric" or "asymmetric" float costs, as read by `np.loadtxt`, or
+            "integer" for asymmetric costs stored as integers.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        np.array: The n*n cost matrix.
+    """
+    rng = np.random.default_rng(seed + n)
+    # Few distinct costs, so there are ties for the best tour
+    M = rng.integers(1, 4, size=(n, n))
+    np.fill_diagonal(M, 0)
+    if kind == "symmetric":
+        M = np.triu(M) + np.triu(M).T
+    return M if kind == "integer" else M.astype(float)
+
+def loop_reference(M):
+    """Runs `solve_loop` and records the score of every tour."""
+    scores = []
+    best_score, second_best_score, solutions = solver.solve_loop(M, lambda k, score: scores.append((k, score)))
+    assert [k for k, _ in scores] == list(range(len(scores)))
+    return best_score, second_best_score, solutions, np.array([score for _, score in scores])
+
+def assert_same_result(result, expected):
+    """Compares an `ExhaustiveResult` with the output of `solve_loop`."""
+    best_score, second_best_score, solutions, scores = expected
+    assert result.best_score == best_score
+    assert result.second_best_score == second_best_score
+    assert result.count == scores.size
+    assert len(result.solutions) == len(solutions)
+    for nodes, A in zip(result.solutions, solutions):
+        np.testing.assert_array_equal(solver.ring(nodes), A)
+    np.testing.assert_array_equal(result.ranks, np.flatnonzero(scores == best_score))
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", SIZES)
+def test_brute_force_matches_loop(n, kind):
+    M = cost_matrix(n, kind)
+    expected = loop_reference(M)
+    for suffix in (3, 8):
+        blocks = []
+        result = brute_force(M, on_block=lambda start, scores: blocks.append((start, scores)), suffix=suffix)
+        assert_same_result(result, expected)
+        assert [start for start, _ in blocks] == np.cumsum([0] + [s.size for _, s in blocks[:-1]]).tolist()
+        np.testing.assert_array_equal(np.concatenate([s for _, s in blocks]), expected[3])
+
+# The solver reads the costs with np.loadtxt, so its text output is only compared for float costs
+@pytest.mark.parametrize("kind", ["symmetric", "asymmetric"])
+@pytest.mark.parametrize("n", SIZES)
+def test_solve_numpy_matches_solve_loop(n, kind):
+    M = cost_matrix(n, kind)
+    loop_text, numpy_text = io.StringIO(), io.StringIO()
+    best_score, second_best_score, solutions = solver.solve_loop(
+        M, lambda k, score: loop_text.write("{0} {1}\n".format(k, score)))
+    result = solver.solve_numpy(M, solver.write_scores(numpy_text))
+    assert result[:2] == (best_score, second_best_score)
+    np.testing.assert_array_equal(result[2], solutions)
+    assert numpy_text.getvalue() == loop_text.getvalue()
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", SIZES)
+def test_score_log_matches_loop(n, kind, tmp_path):
+    M = cost_matrix(n, kind)
+    expected = loop_reference(M)
+    path = str(tmp_path / "scores.npy")
+    log = open_score_log(path, n, score_dtype(M))
+    assert_same_result(brute_force(M, log_scores(log), suffix=3), expected)
+    log.flush()
+    del log
+
+    log = np.load(path, mmap_mode='r')
+    assert log.dtype == np.int32
+    np.testing.assert_array_equal(log, expected[3])
+    text = io.StringIO()
+    export_scores(log, text, M.dtype, chunk=100)
+    assert text.getvalue() == "".join("{0} {1}\n".format(k, s) for k, s in enumerate(M.dtype.type(expected[3])))
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", SIZES)
+def test_brute_force_parallel_matches_loop(n, kind, tmp_path):
+    M = cost_matrix(n, kind)
+    expected = loop_reference(M)
+    assert_same_result(brute_force_parallel(M, workers=2, suffix=3), expected)
+
+    path = str(tmp_path / "scores.npy")
+    shard_dir = str(tmp_path / "shards")
+    result = brute_force_parallel(M, workers=2, shards=5, shard_dir=shard_dir, log_path=path, suffix=3)
+    assert_same_result(result, expected)
+    np.testing.assert_array_equal(np.load(path), expected[3])
+    assert len(os.listdir(shard_dir)) == 5
+
+    # Resuming scores the missing shard again, loads the others and gives the same result
+    os.remove(os.path.join(shard_dir, sorted(os.listdir(shard_dir))[0]))
+    result = brute_force_parallel(M, workers=1, shards=5, shard_dir=shard_dir, log_path=path, suffix=3)
+    assert_same_result(result, expected)
+    np.testing.assert_array_equal(np.load(path), expected[3])
+
+def test_brute_force_parallel_warns_about_other_shards(tmp_path):
+    M = cost_matrix(7, "symmetric")
+    shard_dir = str(tmp_path / "shards")
+    brute_force_parallel(M, workers=1, shards=3, shard_dir=shard_dir, suffix=3)
+    with pytest.warns(UserWarning, match="another number of shards"):
+        result = brute_force_parallel(M, workers=1, shards=4, shard_dir=shard_dir, suffix=3)
+    assert_same_result(result, loop_reference(M))
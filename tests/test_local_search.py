@@ -0,0 +1,132 @@
+"""Checks the tour improvement heuristics of `local_search.py`.
+
+Every search must return a permutation of the cities, report the cost of the tour it returns and
+never make the starting tour worse. The 2-opt strategies must also stop at a 2-opt local optimum,
+and the best-improvement scans done by loops and by NumPy must make the same moves.
+"""
+
+import numpy as np
+import pytest
+from local_search import (improve, lin_kernighan, neighbour_lists, or_opt, tour_cost, two_opt, two_opt_matrix,
+                          two_opt_neighbours)
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+SIZES = [1, 2, 3, 4, 5, 8, 13, 30]
+KINDS = ["integer", "float"]
+
+def cost_matrix(n, kind, seed=0):
+    """Generates a random symmetric cost matrix with a zero diagonal.
+
+    Args:
+        n (int): The number of cities.
+        kind (str): "integer" or "float" costs.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        np.array: The n*n cost matrix.
+    """
+    rng = np.random.default_rng(seed + n)
+    if kind == "float":
+        M = np.triu(rng.uniform(0.5, 10.0, size=(n, n)), 1)
+    else:
+        M = np.triu(rng.integers(1, 20, size=(n, n)), 1)
+    return M + M.T
+
+def start_tour(n, seed=0):
+    """Generates a random starting tour."""
+    return np.random.default_rng(seed + n).permutation(n)
+
+def assert_improved(D, start, result):
+    """Checks that a search returned a valid tour, its cost, and no worse than the start."""
+    tour, cost, moves = result
+    n = len(D)
+    assert sorted(np.asarray(tour).tolist()) == list(range(n))
+    assert cost == pytest.approx(tour_cost(D, tour))
+    assert cost <= tour_cost(D, start) + 1e-9
+    assert moves >= 0
+
+def two_opt_gains(D, tour):
+    """Computes the gain of every valid 2-opt move of a tour with loops."""
+    n = len(tour)
+    return [D[tour[i], tour[i + 1]] + D[tour[j], tour[(j + 1) % n]] - D[tour[i], tour[j]]
+            - D[tour[i + 1], tour[(j + 1) % n]]
+            for i in range(n - 2) for j in range(i + 2, n if i else n - 1)]
+
+SEARCHES = {
+    "first": lambda D, t: two_opt(D, t, "first"),
+    "best": lambda D, t: two_opt(D, t, "best"),
+    "matrix": lambda D, t: two_opt(D, t, "matrix"),
+    "neighbours": lambda D, t: two_opt(D, t, "neighbours"),
+    "or_opt": lambda D, t: or_opt(D, t),
+    "lin_kernighan": lambda D, t: lin_kernighan(D, t),
+    "improve": lambda D, t: improve(D, t, time_limit=0.2),
+}
+
+@pytest.mark.parametrize("search", sorted(SEARCHES))
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", SIZES)
+def test_search_returns_valid_tour_no_worse(n, kind, search):
+    D = cost_matrix(n, kind)
+    start = start_tour(n)
+    assert_improved(D, start, SEARCHES[search](D, start))
+
+@pytest.mark.parametrize("search", sorted(SEARCHES))
+def test_search_defaults_to_index_order(search):
+    D = cost_matrix(13, "integer")
+    assert_improved(D, np.arange(13), SEARCHES[search](D, None))
+
+@pytest.mark.parametrize("strategy", ["first", "best", "matrix"])
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", [5, 8, 13, 30])
+def test_two_opt_reaches_local_optimum(n, kind, strategy):
+    D = cost_matrix(n, kind)
+    tour, _, _ = two_opt(D, start_tour(n), strategy)
+    assert max(two_opt_gains(D, tour)) <= 1e-9
+
+@pytest.mark.parametrize("n", [5, 8, 13, 30])
+def test_two_opt_matrix_matches_best_improvement(n):
+    D = cost_matrix(n, "integer")
+    start = start_tour(n)
+    tour, cost, moves = two_opt(D, start, "best")
+    matrix_tour, matrix_cost, matrix_moves = two_opt_matrix(D, start)
+    np.testing.assert_array_equal(matrix_tour, tour)
+    assert (matrix_cost, matrix_moves) == (cost, moves)
+
+@pytest.mark.parametrize("k", [1, 3, 8, 40])
+@pytest.mark.parametrize("n", [2, 5, 13, 30])
+def test_neighbour_lists(n, k):
+    D = cost_matrix(n, "float")
+    nearest = neighbour_lists(D, k)
+    assert nearest.shape == (n, min(k, n - 1))
+    for i in range(n):
+        others = np.delete(np.arange(n), i)
+        expected = others[np.argsort(D[i, others], kind='stable')][:nearest.shape[1]]
+        np.testing.assert_array_equal(nearest[i], expected)
+
+@pytest.mark.parametrize("n", [8, 30])
+def test_precomputed_neighbour_lists(n):
+    D = cost_matrix(n, "float")
+    start = start_tour(n)
+    nearest = neighbour_lists(D, 5)
+    for search in (two_opt_neighbours, or_opt, lin_kernighan):
+        expected = search(D, start, 5)
+        result = search(D, start, 5, nearest=nearest)
+        np.testing.assert_array_equal(result[0], expected[0])
+        assert result[1:] == expected[1:]
+    expected = two_opt(D, start, "neighbours", nearest=neighbour_lists(D, 8))
+    result = two_opt(D, start, "neighbours")
+    np.testing.assert_array_equal(result[0], expected[0])
+
+def test_improve_keeps_integer_costs():
+    D = cost_matrix(13, "integer")
+    tour, cost, _ = improve(D, start_tour(13), time_limit=0.2)
+    assert cost == tour_cost(D, tour)
+    assert np.issubdtype(type(cost), np.integer)
@@ -0,0 +1,157 @@
+"""Checks the vectorized QUBO builders of `qubo.py` against the loop builders they replace.
+
+Every builder is compared for n = 2 to 8 on symmetric integer costs (the matrices the solvers
+build from the data files), on asymmetric integer costs and on asymmetric float costs.
+`build_dwave_bqm` is compared with `dwave_networkx.traveling_salesperson_qubo`, including
+missing (zero-cost) edges and the default penalty weights.
+"""
+
+import warnings
+import dimod
+import networkx as nx
+import numpy as np
+import pytest
+from qubo import (build_dwave_bqm, build_eqats_bqm, build_eqats_coo, build_eqats_qubo, build_eqats_qubo_loop,
+                  build_jain_bqm, build_jain_constraint, build_jain_constraint_loop, build_jain_coo, coo_to_dense,
+                  dwave_defaults)
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    from dwave_networkx import traveling_salesperson_qubo
+
+__author__ = "Murhaf Alawir, Anas Alatasi"
+__copyright__ = "Global1A1"
+__credits__ = ["Murhaf Alawir", "Anas Alatasi"]
+__license__ = "Apache 2.0"
+__version__ = "1.0.0"
+__maintainer__ = "Murhaf Alawir"
+__email__ = "m.alawir@innopolis.university"
+__status__ = "Staging"
+
+SIZES = range(2, 9)
+KINDS = ["symmetric", "asymmetric", "float"]
+
+def cost_matrix(n, kind, seed=0):
+    """Generates a random cost matrix with a zero diagonal.
+
+    Args:
+        n (int): The number of cities.
+        kind (str): "symmetric" or "asymmetric" integer costs, or asymmetric "float" costs.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        np.array: The n*n cost matrix.
+    """
+    rng = np.random.default_rng(seed + n)
+    if kind == "float":
+        M = rng.uniform(0.5, 10.0, size=(n, n))
+    else:
+        M = rng.integers(1, 10, size=(n, n)).astype(float)
+    np.fill_diagonal(M, 0)
+    return M + M.T if kind == "symmetric" else M
+
+def bqm_to_dense(bqm, m):
+    """Writes a binary quadratic model over the variables 0..m-1 as an upper triangular matrix."""
+    Q = np.zeros((m, m))
+    for v, bias in bqm.linear.items():
+        Q[v, v] = bias
+    for (u, v), bias in bqm.quadratic.items():
+        Q[min(u, v), max(u, v)] = bias
+    return Q
+
+def jain_reference(M, lagrange_multiplier):
+    """Builds the upper triangular form of `Q + lagrange_multiplier * C` with the loop builders."""
+    n, _ = M.shape
+    i, j = np.triu_indices(n, 1)
+    Q = np.diag(M[i, j] + M[j, i])
+    C = build_jain_constraint_loop(n)
+    return Q + lagrange_multiplier * (np.diag(np.diag(C)) + 2 * np.triu(C, 1))
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", SIZES)
+def test_eqats_qubo_matches_loop(n, kind):
+    M = cost_matrix(n, kind)
+    _lambda = 2 * np.max(np.abs(M))
+    np.testing.assert_array_equal(build_eqats_qubo(M, _lambda), build_eqats_qubo_loop(M, _lambda))
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", SIZES)
+def test_eqats_sparse_matches_loop(n, kind):
+    M = cost_matrix(n, kind)
+    _lambda = 2 * np.max(np.abs(M))
+    m = (n - 1) ** 2
+    expected = build_eqats_qubo_loop(M, _lambda)
+    np.testing.assert_allclose(coo_to_dense(m, *build_eqats_coo(M, _lambda)), expected)
+    np.testing.assert_allclose(bqm_to_dense(build_eqats_bqm(M, _lambda), m), expected)
+
+@pytest.mark.parametrize("n", SIZES)
+def test_jain_constraint_matches_loop(n):
+    expected = build_jain_constraint_loop(n)
+    np.testing.assert_array_equal(build_jain_constraint(n), expected)
+    np.testing.assert_array_equal(build_jain_constraint(n, sparse=True).toarray(), expected)
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("n", SIZES)
+def test_jain_sparse_matches_loop(n, kind):
+    M = cost_matrix(n, kind)
+    lagrange_multiplier = 1.5 * np.max(np.abs(M))
+    m = n * (n - 1) // 2
+    expected = jain_reference(M, lagrange_multiplier)
+    np.testing.assert_allclose(coo_to_dense(m, *build_jain_coo(M, lagrange_multiplier)), expected)
+    np.testing.assert_allclose(bqm_to_dense(build_jain_bqm(M, lagrange_multiplier), m), expected)
+
+def symmetric_costs(n, kind, seed=0):
+    """Generates a symmetric cost matrix for `build_dwave_bqm`.
+
+    Args:
+        n (int): The number of cities.
+        kind (str): "integer" or "float" costs, "missing" for integer costs with some zero
+            (missing) edges, or "diagonal" for integer costs with nonzero self-loops.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        np.array: The n*n symmetric cost matrix.
+    """
+    rng = np.random.default_rng(seed + n)
+    if kind == "float":
+        M = np.triu(rng.uniform(0.5, 10.0, size=(n, n)), 1)
+    else:
+        M = np.triu(rng.integers(1, 10, size=(n, n)), 1).astype(float)
+    if kind == "missing":
+        M[0, 1] = M[1, n - 1] = 0
+    M = M + M.T
+    if kind == "diagonal":
+        M[np.arange(n), np.arange(n)] = rng.integers(1, 10, size=n)
+    return M
+
+def networkx_bqm(M, lagrange=None, missing_edge_weight=None):
+    """Builds the reference model the way `dwave_solver.py` used to."""
+    qubo = traveling_salesperson_qubo(nx.from_numpy_array(M), lagrange, missing_edge_weight=missing_edge_weight)
+    return dimod.BinaryQuadraticModel.from_qubo(qubo)
+
+DWAVE_KINDS = ["integer", "float", "missing", "diagonal"]
+
+@pytest.mark.parametrize("kind", DWAVE_KINDS)
+@pytest.mark.parametrize("n", range(3, 9))
+def test_dwave_defaults_match_networkx(n, kind):
+    M = symmetric_costs(n, kind)
+    G = nx.from_numpy_array(M)
+    lagrange, missing_edge_weight = dwave_defaults(M)
+    assert lagrange == pytest.approx(G.size(weight="weight") * G.number_of_nodes() / G.number_of_edges())
+    assert missing_edge_weight == pytest.approx(G.size(weight="weight"))
+
+def test_dwave_defaults_without_edges():
+    assert dwave_defaults(np.zeros((4, 4))) == (2, 0)
+
+@pytest.mark.parametrize("kind", DWAVE_KINDS)
+@pytest.mark.parametrize("n", range(3, 9))
+def test_dwave_bqm_matches_networkx(n, kind):
+    M = symmetric_costs(n, kind)
+    assert build_dwave_bqm(M).is_almost_equal(networkx_bqm(M))
+    assert build_dwave_bqm(M, 7.5, 3.25).is_almost_equal(networkx_bqm(M, 7.5, 3.25))
+    assert build_dwave_bqm(M, lagrange=7.5).is_almost_equal(networkx_bqm(M, lagrange=7.5))
+    assert build_dwave_bqm(M, missing_edge_weight=3.25).is_almost_equal(networkx_bqm(M, missing_edge_weight=3.25))
+
+def test_dwave_bqm_rejects_two_cities():
+    with pytest.raises(ValueError):
+        build_dwave_bqm(np.ones((2, 2)))